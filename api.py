@@ -1,30 +1,62 @@
 # api.py
-from flask import Flask, jsonify, request, render_template
-from flask_socketio import SocketIO, emit, disconnect
+# O monkey patch (eventlet/gevent) precisa vir antes de qualquer outro import
+from modo_async import aplicar_monkey_patch, ASYNC_MODE
+aplicar_monkey_patch()
+
+from flask import Flask, Response, g, jsonify, request, render_template
+from flask_socketio import SocketIO, emit, disconnect, join_room, leave_room
 import mysql.connector
 import jwt
-import bcrypt
+import hashlib
+import hmac
+import logging
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 import os
 from dotenv import load_dotenv
+from pool_conexoes import obter_pool, PoolEsgotadoError
+from erros_http import registrar_sobrecarga, servidor_ocupado
+from paginacao import ler_paginacao, montar_pagina
+from filtros import ler_periodo, ler_filtros_extrato
+from estatisticas import cache_estatisticas
+from saldos_diarios import GRANULARIDADES
+from armazenamento import armazenamento
+from motor_saldos import MotorIndisponivel, OperacaoIncerta
+from exportacao import exportar, FORMATOS
+from propriedade import indice_proprietarios
+from operacoes import executar_operacao, executar_lote, LOTE_TAMANHO_BLOCO
+from senhas import hash_senha, verificar_senha, executor_senhas
+from tokens import cache_tokens
+from idempotencia import armazem_idempotencia, ConflitoIdempotencia
+from fila_mensagens import opcoes_fila_mensagens
+from notificacoes import AgrupadorEventos
+from sessoes_socket import RegistroSessoes
+from metricas import metricas
+from consultas_lentas import consultas_lentas, ORDENACOES
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # A variável 'app' precisa ser definida antes de qualquer rota.
 app = Flask(__name__)
 
 # Configurar SocketIO para WebSocket
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Com SOCKETIO_MESSAGE_QUEUE, os emits chegam aos sockets de todos os processos
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE, **opcoes_fila_mensagens())
 
-# -----------------
-# Configuração do banco de dados MySQL
-# -----------------
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER', 'root')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_NAME = os.getenv('DB_NAME', 'SistemasCorporativos')
+# Eventos de uma mesma sala em rajada saem agrupados em um único frame 'eventos'
+agrupador_eventos = AgrupadorEventos(lambda sala, evento, dados: socketio.emit(evento, dados, room=sala))
+
+# Sessões dos sockets autenticados; token expirado encerra a conexão
+def encerrar_sessao_expirada(sid):
+    socketio.emit('erro', {'mensagem': 'Token expirado'}, to=sid)
+    socketio.server.disconnect(sid)
+
+sessoes_socket = RegistroSessoes(encerrar_sessao_expirada)
+indice_proprietarios.ao_invalidar(sessoes_socket.invalidar_usuario)
 
 # -----------------
 # Configuração JWT
@@ -33,14 +65,100 @@ JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'sua_chave_secreta_super_segura_aqu
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', '24'))
 
-# Função para conectar ao banco de dados
-def get_db_connection():
-    return mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+# E-mails com acesso às rotas administrativas, separados por vírgula
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', 'admin@teste.com').split(',') if email.strip()}
+
+# -----------------
+# Servidor ocupado (503)
+# -----------------
+# Pool esgotado ou fila de bcrypt cheia, com os mesmos handlers do simple_server.py
+registrar_sobrecarga(app)
+
+@app.errorhandler(MotorIndisponivel)
+def motor_indisponivel(ex):
+    """Responde 503 quando o log local do motor de saldos não confirma a operação"""
+    return servidor_ocupado(ex)
+
+@app.errorhandler(OperacaoIncerta)
+def operacao_incerta(ex):
+    """Responde 500 sem Retry-After: a operação pode ter sido aplicada e não deve ser repetida"""
+    return jsonify({"erro": f"{ex}. Consulte o extrato antes de repetir a operação"}), 500
+
+# -----------------
+# Métricas por rota
+# -----------------
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+METRICAS_SALAS_MAXIMO = int(os.getenv('METRICAS_SALAS_MAXIMO', '50'))
+
+if metricas.ativas:
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def registrar_medicao(resposta):
+        inicio = g.pop('inicio_requisicao', None)
+        if inicio is not None:
+            rota = request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+            metricas.observar_requisicao(request.method, rota, resposta.status_code, time.perf_counter() - inicio)
+        return resposta
+
+def salas_socket():
+    """{sala: sockets} deste processo, sem a sala individual de cada sid"""
+    salas = socketio.server.manager.rooms.get('/', {})
+    conectados = salas.get(None, {})
+    return {
+        sala: len(participantes)
+        for sala, participantes in list(salas.items())
+        if sala is not None and sala not in conectados
+    }
+
+def _medir_sockets():
+    salas = socketio.server.manager.rooms.get('/', {})
+    return [({}, len(salas.get(None, {})))]
+
+def _medir_salas():
+    # As maiores salas individualmente; o total por tipo (user, saldo) cobre as demais
+    salas = sorted(salas_socket().items(), key=lambda item: item[1], reverse=True)
+    return [({'sala': sala}, quantidade) for sala, quantidade in salas[:METRICAS_SALAS_MAXIMO]]
+
+def _medir_tipos_sala():
+    por_tipo = {}
+    for sala, quantidade in salas_socket().items():
+        tipo = sala.split('_', 1)[0]
+        salas, sockets = por_tipo.get(tipo, (0, 0))
+        por_tipo[tipo] = (salas + 1, sockets + quantidade)
+    return [({'tipo': tipo, 'medida': medida}, valor)
+            for tipo, (salas, sockets) in por_tipo.items()
+            for medida, valor in (('salas', salas), ('sockets', sockets))]
+
+def _medir_pool():
+    estatisticas = obter_pool().estatisticas()
+    return [({'estado': estado}, estatisticas[estado]) for estado in ('em_uso', 'livres', 'abertas', 'aguardando')]
+
+metricas.medidor('api_sockets_conectados', 'Sockets conectados a este processo', _medir_sockets)
+metricas.medidor('api_sockets_sala', 'Sockets em cada sala (as maiores)', _medir_salas)
+metricas.medidor('api_sockets_salas_tipo', 'Salas e sockets por tipo de sala', _medir_tipos_sala)
+metricas.medidor('api_sessoes_socket', 'Sessões de socket autenticadas', lambda: [({}, len(sessoes_socket))])
+metricas.medidor('db_conexoes', 'Conexões do pool MySQL por estado', _medir_pool)
+metricas.medidor('db_pool_timeouts_total', 'Esperas por conexão que estouraram o tempo limite',
+                 lambda: [({}, obter_pool().estatisticas()['timeouts'])], tipo='counter')
+metricas.medidor('api_notificacoes_pendentes', 'Eventos aguardando o fim da janela de agrupamento',
+                 lambda: [({}, agrupador_eventos.estatisticas()['pendentes'])])
+metricas.medidor('db_consultas_lentas_total', 'Consultas acima de CONSULTA_LENTA_MS',
+                 lambda: [({}, consultas_lentas.estatisticas()['ocorrencias'])], tipo='counter')
+metricas.medidor('api_senhas', 'Hashes bcrypt na fila e em execução',
+                 lambda: [({'estado': estado}, executor_senhas.estatisticas()[estado])
+                          for estado in ('na_fila', 'em_execucao')])
+
+if armazenamento.nome == 'motor':
+    metricas.medidor('motor_saldos_sequencia', 'Sequência do log local: acrescentada, em disco e aplicada no MySQL',
+                     lambda: [({'estado': estado}, armazenamento.situacao()[estado])
+                              for estado in ('sequencia', 'duravel', 'aplicado')])
+    metricas.medidor('motor_saldos_pendentes', 'Registros do log ainda não aplicados no MySQL',
+                     lambda: [({}, armazenamento.situacao()['pendentes'])])
+    metricas.medidor('motor_saldos_fsync_total', 'Gravações com fsync do log local (cada uma confirma um grupo)',
+                     lambda: [({}, armazenamento.situacao()['grupos'])], tipo='counter')
 
 # -----------------
 # Funções de Autenticação
@@ -57,31 +175,62 @@ def gerar_token(usuario_id, email):
 
 def verificar_token(token):
     """Verifica se o token JWT é válido"""
+    # A assinatura só é verificada quando o token não está no cache
+    payload = cache_tokens.obter(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
-
-def hash_senha(senha):
-    """Gera hash da senha"""
-    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verificar_senha(senha, hash_senha):
-    """Verifica se a senha confere com o hash"""
-    return bcrypt.checkpw(senha.encode('utf-8'), hash_senha.encode('utf-8'))
-
-def emitir_notificacao(usuario_id, tipo, mensagem, dados=None):
-    """Emite notificação em tempo real para um usuário específico"""
+    cache_tokens.definir(token, payload)
+    return payload
+
+def emitir_notificacao(usuario_id, tipo, mensagem, dados=None, movimentacoes=(), saldos=()):
+    """Emite notificação em tempo real para um usuário específico
+
+    `movimentacoes` ([(UsuarioID, linha)] das procedures) vão para a sala do
+    dono de cada conta, inclusive o beneficiário de uma transferência; o novo
+    saldo de cada conta vai para a sala saldo_<id>, dos sockets que o
+    assinaram; `saldos` são saldos finais já prontos (lote). Assim o cliente
+    não precisa consultar o banco de novo. O envio passa pelo agrupador: em
+    uma rajada, a sala recebe um frame por janela.
+    """
+    with metricas.fase('emitir_notificacao'):
+        _emitir_notificacao(usuario_id, tipo, mensagem, dados, movimentacoes, saldos)
+
+def _emitir_notificacao(usuario_id, tipo, mensagem, dados, movimentacoes, saldos):
     payload = {
         'tipo': tipo,
         'mensagem': mensagem,
         'timestamp': datetime.utcnow().isoformat(),
         'dados': dados or {}
     }
-    socketio.emit('notificacao', payload, room=f'user_{usuario_id}')
+    # Os eventos de cada sala saem juntos: numa sala ociosa, um único frame imediato
+    salas = {}
+    salas.setdefault(f'user_{usuario_id}', []).append(('notificacao', payload, None))
+
+    for saldo in saldos:
+        _acrescentar_saldo(salas, saldo)
+
+    for dono, linha in movimentacoes:
+        movimentacao = dict(linha)
+        _acrescentar_saldo(salas, {
+            'CorrentistaID': movimentacao['CorrentistaID'],
+            'NomeCorrentista': movimentacao['NomeCorrentista'],
+            'Saldo': movimentacao.pop('Saldo')
+        })
+        if dono is not None:
+            salas.setdefault(f'user_{dono}', []).append(('nova_movimentacao', movimentacao, None))
+
+    for sala, eventos in salas.items():
+        agrupador_eventos.enviar_juntos(sala, eventos)
+
+def _acrescentar_saldo(salas, saldo):
+    """O saldo vai só aos sockets que assinaram a conta (sala saldo_<id>)"""
+    salas.setdefault(f'saldo_{saldo["CorrentistaID"]}', []).append(('saldo_atualizado', saldo, 'saldo'))
 
 # -----------------
 # Decorador para proteger rotas
@@ -102,7 +251,8 @@ def token_required(f):
         if not token:
             return jsonify({'erro': 'Token de acesso necessário'}), 401
         
-        payload = verificar_token(token)
+        with metricas.fase('token_required'):
+            payload = verificar_token(token)
         if payload is None:
             return jsonify({'erro': 'Token inválido ou expirado'}), 401
         
@@ -115,6 +265,69 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorator
 
+# -----------------
+# Decorador para rotas administrativas (usar depois de token_required)
+# -----------------
+def admin_required(f):
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        if (request.usuario_atual.get('email') or '').lower() not in ADMIN_EMAILS:
+            return jsonify({'erro': 'Acesso restrito a administradores'}), 403
+        return f(*args, **kwargs)
+    return decorator
+
+# -----------------
+# Decorador para rotas de escrita com Idempotency-Key
+# -----------------
+def idempotente(f):
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        chave = request.headers.get('Idempotency-Key')
+        if not chave:
+            return f(*args, **kwargs)
+        
+        if len(chave) > 100:
+            return jsonify({'erro': 'Idempotency-Key deve ter no máximo 100 caracteres'}), 400
+        
+        usuario_id = request.usuario_atual['usuario_id']
+        impressao = hashlib.sha256(
+            request.method.encode() + request.path.encode() + b'\n' + request.get_data()
+        ).hexdigest()
+        
+        try:
+            armazenada = armazem_idempotencia.iniciar(usuario_id, chave, impressao)
+        except ConflitoIdempotencia as ex:
+            return jsonify({'erro': str(ex)}), ex.status
+        
+        # Repetição: devolver a resposta original sem tocar no banco
+        if armazenada is not None:
+            corpo, status = armazenada
+            resposta = jsonify(corpo)
+            resposta.headers['Idempotent-Replayed'] = 'true'
+            return resposta, status
+        
+        incerta = False
+        try:
+            resposta = app.make_response(f(*args, **kwargs))
+        except OperacaoIncerta as ex:
+            # A operação pode ter sido aplicada: a chave guarda a resposta para não repetir
+            resposta = app.make_response(operacao_incerta(ex))
+            incerta = True
+        except Exception:
+            armazem_idempotencia.abandonar(usuario_id, chave)
+            raise
+        
+        # Erros de servidor não são memorizados para permitir nova tentativa
+        try:
+            if resposta.status_code >= 500 and not incerta:
+                armazem_idempotencia.abandonar(usuario_id, chave)
+            else:
+                armazem_idempotencia.concluir(usuario_id, chave, resposta.get_json(), resposta.status_code)
+        except mysql.connector.Error:
+            logger.exception('Falha ao registrar Idempotency-Key %s', chave)
+        return resposta
+    return decorator
+
 # -----------------
 # Rotas de Autenticação
 # -----------------
@@ -133,27 +346,13 @@ def registro():
         if len(senha) < 6:
             return jsonify({"erro": "Senha deve ter pelo menos 6 caracteres"}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Verificar se email já existe
-        cursor.execute("SELECT UsuarioID FROM Usuarios WHERE Email = %s", (email,))
-        if cursor.fetchone():
-            cursor.close()
-            conn.close()
-            return jsonify({"erro": "Email já cadastrado"}), 409
-        
-        # Criar novo usuário
+        # Calcular o hash antes de ocupar uma conexão do pool
         senha_hash = hash_senha(senha)
-        cursor.execute(
-            "INSERT INTO Usuarios (Email, SenhaHash, Nome) VALUES (%s, %s, %s)",
-            (email, senha_hash, nome)
-        )
-        conn.commit()
-        usuario_id = cursor.lastrowid
         
-        cursor.close()
-        conn.close()
+        # Criar novo usuário (None se o email já existe)
+        usuario_id = armazenamento.criar_usuario(email, senha_hash, nome)
+        if usuario_id is None:
+            return jsonify({"erro": "Email já cadastrado"}), 409
         
         # Gerar token para o novo usuário
         token = gerar_token(usuario_id, email)
@@ -182,18 +381,8 @@ def login():
         if not all([email, senha]):
             return jsonify({"erro": "Email e senha são obrigatórios"}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Buscar usuário
-        cursor.execute(
-            "SELECT UsuarioID, Email, SenhaHash, Nome FROM Usuarios WHERE Email = %s AND Ativo = TRUE",
-            (email,)
-        )
-        usuario = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        usuario = armazenamento.buscar_usuario_por_email(email)
         
         if not usuario:
             return jsonify({"erro": "Email ou senha incorretos"}), 401
@@ -223,17 +412,7 @@ def login():
 def perfil():
     """Retorna informações do usuário logado"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute(
-            "SELECT UsuarioID, Email, Nome, DataCriacao FROM Usuarios WHERE UsuarioID = %s",
-            (request.usuario_atual['usuario_id'],)
-        )
-        usuario = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        usuario = armazenamento.buscar_usuario(request.usuario_atual['usuario_id'])
         
         if not usuario:
             return jsonify({"erro": "Usuário não encontrado"}), 404
@@ -250,6 +429,72 @@ def perfil():
     except mysql.connector.Error as ex:
         return jsonify({"erro": f"Erro ao buscar perfil: {ex}"}), 500
 
+# -----------------
+# Rota com as estatísticas do pool de conexões (PROTEGIDA)
+# -----------------
+@app.route('/status/pool', methods=['GET'])
+@token_required
+def status_pool():
+    return jsonify(obter_pool().estatisticas()), 200
+
+# -----------------
+# Rota com as métricas do executor de senhas (PROTEGIDA)
+# -----------------
+@app.route('/status/senhas', methods=['GET'])
+@token_required
+def status_senhas():
+    return jsonify(executor_senhas.estatisticas()), 200
+
+# -----------------
+# Rota com as estatísticas dos caches em memória (PROTEGIDA)
+# -----------------
+@app.route('/status/cache', methods=['GET'])
+@token_required
+def status_cache():
+    return jsonify({
+        'tokens': cache_tokens.estatisticas(),
+        'proprietarios': indice_proprietarios.estatisticas(),
+        'estatisticas': cache_estatisticas.estatisticas(),
+        'sessoes_socket': sessoes_socket.estatisticas()
+    }), 200
+
+# -----------------
+# Rota com os contadores do agrupamento de notificações (PROTEGIDA)
+# -----------------
+@app.route('/status/notificacoes', methods=['GET'])
+@token_required
+def status_notificacoes():
+    return jsonify(agrupador_eventos.estatisticas()), 200
+
+# -----------------
+# Rota com as consultas lentas e seus planos de execução (ADMINISTRATIVA)
+# -----------------
+@app.route('/status/consultas-lentas', methods=['GET'])
+@token_required
+@admin_required
+def status_consultas_lentas():
+    ordenar = request.args.get('ordenar', 'total')
+    if ordenar not in ORDENACOES:
+        return jsonify({"erro": f"ordenar deve ser um de: {', '.join(ORDENACOES)}"}), 400
+    try:
+        limite = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"erro": "limit deve ser um número inteiro"}), 400
+    if not 1 <= limite <= 500:
+        return jsonify({"erro": "limit deve estar entre 1 e 500"}), 400
+    return jsonify(consultas_lentas.consultar(ordenar, limite)), 200
+
+# -----------------
+# Métricas no formato do Prometheus (token próprio, opcional)
+# -----------------
+@app.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    if METRICAS_TOKEN:
+        autorizacao = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(autorizacao, f'Bearer {METRICAS_TOKEN}'):
+            return jsonify({'erro': 'Token de métricas inválido'}), 401
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # -----------------
 # Rota para a página de testes (página principal)
 # -----------------
@@ -264,21 +509,16 @@ def home():
 @token_required
 def get_movimentacoes():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Buscar apenas movimentações dos correntistas do usuário logado
-        cursor.execute("""
-            SELECT v.* FROM vwExtrato v
-            INNER JOIN Correntistas c ON v.CorrentistaID = c.CorrentistaID
-            WHERE c.UsuarioID = %s
-            ORDER BY v.DataOperacao DESC
-        """, (request.usuario_atual['usuario_id'],))
-        
-        movimentacoes = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(movimentacoes)
+        limite, cursor_pagina = ler_paginacao(request.args)
+        filtros = ler_filtros_extrato(request.args)
+    except ValueError as ex:
+        return jsonify({"erro": str(ex)}), 400
+
+    usuario_id = request.usuario_atual['usuario_id']
+    try:
+        correntistas = indice_proprietarios.correntistas_do_usuario(usuario_id)
+        movimentacoes = armazenamento.movimentacoes_usuario(usuario_id, correntistas, filtros, cursor_pagina, limite)
+        return jsonify(montar_pagina(movimentacoes, limite))
     except mysql.connector.Error as ex:
         return jsonify({"erro": f"Erro ao conectar ou consultar o banco de dados: {ex}"}), 500
 
@@ -289,229 +529,268 @@ def get_movimentacoes():
 @token_required
 def get_extrato(correntista_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
+        limite, cursor_pagina = ler_paginacao(request.args)
+        filtros = ler_filtros_extrato(request.args)
+    except ValueError as ex:
+        return jsonify({"erro": str(ex)}), 400
+
+    try:
         # Verificar se o correntista pertence ao usuário logado
-        cursor.execute(
-            "SELECT UsuarioID FROM Correntistas WHERE CorrentistaID = %s",
-            (correntista_id,)
-        )
-        correntista = cursor.fetchone()
-        
-        if not correntista or correntista['UsuarioID'] != request.usuario_atual['usuario_id']:
-            cursor.close()
-            conn.close()
+        if not verificar_correntista_usuario(correntista_id, request.usuario_atual['usuario_id']):
             return jsonify({"erro": "Correntista não encontrado ou não autorizado"}), 403
         
-        cursor.execute("SELECT * FROM vwExtrato WHERE CorrentistaID = %s ORDER BY DataOperacao DESC", (correntista_id,))
-        extrato = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(extrato)
+        extrato = armazenamento.extrato(correntista_id, filtros, cursor_pagina, limite)
+        return jsonify(montar_pagina(extrato, limite))
     except mysql.connector.Error as ex:
         return jsonify({"erro": f"Erro ao buscar extrato: {ex}"}), 500
 
 # -----------------
-# Rota para listar correntistas do usuário logado
+# Rota para exportar o extrato completo em streaming (PROTEGIDA)
 # -----------------
-@app.route('/correntistas', methods=['GET'])
+@app.route('/extrato/<int:correntista_id>/exportar', methods=['GET'])
 @token_required
-def get_correntistas():
+def exportar_extrato(correntista_id):
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato not in FORMATOS:
+        return jsonify({"erro": "Formato deve ser ndjson ou csv"}), 400
+    try:
+        filtros = ler_filtros_extrato(request.args)
+    except ValueError as ex:
+        return jsonify({"erro": str(ex)}), 400
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        # Verificar se o correntista pertence ao usuário logado
+        if not verificar_correntista_usuario(correntista_id, request.usuario_atual['usuario_id']):
+            return jsonify({"erro": "Correntista não encontrado ou não autorizado"}), 403
         
-        cursor.execute(
-            "SELECT CorrentistaID, NomeCorrentista, Saldo FROM Correntistas WHERE UsuarioID = %s",
-            (request.usuario_atual['usuario_id'],)
-        )
-        correntistas = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(correntistas)
+        conn, cursor = armazenamento.abrir_exportacao(correntista_id, filtros)
     except mysql.connector.Error as ex:
-        return jsonify({"erro": f"Erro ao buscar correntistas: {ex}"}), 500
+        return jsonify({"erro": f"Erro ao exportar extrato: {ex}"}), 500
 
-# -----------------
-# Função auxiliar para verificar se correntista pertence ao usuário
-# -----------------
-def verificar_correntista_usuario(correntista_id, usuario_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT UsuarioID FROM Correntistas WHERE CorrentistaID = %s",
-        (correntista_id,)
-    )
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return result and result[0] == usuario_id
+    resposta = Response(exportar(conn, cursor, formato), mimetype=FORMATOS[formato])
+    resposta.headers['Content-Disposition'] = f'attachment; filename=extrato_{correntista_id}.{formato}'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
 
 # -----------------
-# Rota para Operação de Pagamento (PROTEGIDA)
+# Rota com totais de créditos e débitos do usuário logado (PROTEGIDA)
 # -----------------
-@app.route('/pagamento', methods=['POST'])
+@app.route('/estatisticas', methods=['GET'])
 @token_required
-def pagar():
+def get_estatisticas():
     try:
-        data = request.get_json()
-        correntista_id = data.get('correntista_id')
-        valor = data.get('valor')
-        descricao = data.get('descricao')
+        inicio, fim = ler_periodo(request.args)
+    except ValueError as ex:
+        return jsonify({"erro": str(ex)}), 400
 
-        if not all([correntista_id, valor, descricao]):
-            return jsonify({"erro": "Dados incompletos"}), 400
+    usuario_id = request.usuario_atual['usuario_id']
+    periodo = (inicio, fim)
+    resultado = cache_estatisticas.obter(usuario_id, periodo)
+    if resultado is not None:
+        return jsonify(resultado)
 
-        if valor <= 0:
-            return jsonify({"erro": "Valor deve ser positivo"}), 400
+    try:
+        versao = cache_estatisticas.versao(usuario_id)
+        resultado = armazenamento.estatisticas(usuario_id, inicio, fim)
+        cache_estatisticas.definir(usuario_id, periodo, resultado, versao)
+        return jsonify(resultado)
+    except mysql.connector.Error as ex:
+        return jsonify({"erro": f"Erro ao calcular estatísticas: {ex}"}), 500
 
-        # Verificar se o correntista pertence ao usuário logado
-        if not verificar_correntista_usuario(correntista_id, request.usuario_atual['usuario_id']):
-            return jsonify({"erro": "Correntista não encontrado ou não autorizado"}), 403
+# -----------------
+# Rota de histórico de saldos pela consolidação diária (PROTEGIDA)
+# -----------------
+@app.route('/saldo/historico', methods=['GET'])
+@token_required
+def get_historico_saldo():
+    granularidade = request.args.get('granularidade', 'dia').lower()
+    if granularidade not in GRANULARIDADES:
+        return jsonify({"erro": "Granularidade deve ser dia ou mes"}), 400
+    try:
+        inicio, fim = ler_periodo(request.args)
+    except ValueError as ex:
+        return jsonify({"erro": str(ex)}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.callproc('spPagar', (correntista_id, valor, descricao))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        # Emitir notificação WebSocket
-        emitir_notificacao(
-            request.usuario_atual['usuario_id'],
-            'pagamento',
-            f'Pagamento de R$ {valor:.2f} realizado com sucesso',
-            {'valor': valor, 'descricao': descricao, 'correntista_id': correntista_id}
-        )
+    usuario_id = request.usuario_atual['usuario_id']
+    correntista_id = request.args.get('correntista_id')
+    try:
+        if correntista_id is not None:
+            try:
+                correntista_id = int(correntista_id)
+            except ValueError:
+                return jsonify({"erro": "Identificador de correntista inválido"}), 400
+            if not verificar_correntista_usuario(correntista_id, usuario_id):
+                return jsonify({"erro": "Correntista não encontrado ou não autorizado"}), 403
+            correntistas = [correntista_id]
+        else:
+            correntistas = sorted(indice_proprietarios.correntistas_do_usuario(usuario_id))
 
-        return jsonify({"mensagem": "Pagamento realizado com sucesso"}), 201
+        historico = armazenamento.historico_saldos(correntistas, granularidade, inicio, fim)
+        return jsonify({
+            "granularidade": granularidade,
+            "correntistas": [
+                {"correntista_id": c, "pontos": pontos} for c, pontos in historico.items()
+            ]
+        })
     except mysql.connector.Error as ex:
-        return jsonify({"erro": f"Erro ao realizar pagamento: {ex}"}), 500
+        return jsonify({"erro": f"Erro ao buscar histórico de saldo: {ex}"}), 500
 
 # -----------------
-# Rota para Operação de Transferência (PROTEGIDA)
+# Rota para listar correntistas do usuário logado
 # -----------------
-@app.route('/transferencia', methods=['POST'])
+@app.route('/correntistas', methods=['GET'])
 @token_required
-def transferir():
+def get_correntistas():
     try:
-        data = request.get_json()
-        origem_id = data.get('correntista_id_origem')
-        destino_id = data.get('correntista_id_destino')
-        valor = data.get('valor')
+        correntistas = armazenamento.listar_correntistas(request.usuario_atual['usuario_id'])
+        return jsonify(correntistas)
+    except mysql.connector.Error as ex:
+        return jsonify({"erro": f"Erro ao buscar correntistas: {ex}"}), 500
 
-        if not all([origem_id, destino_id, valor]):
-            return jsonify({"erro": "Dados incompletos"}), 400
+# -----------------
+# Função auxiliar para verificar se correntista pertence ao usuário
+# -----------------
+def verificar_correntista_usuario(correntista_id, usuario_id):
+    # Consulta o índice em memória; o armazenamento só é acessado na falha do cache
+    return indice_proprietarios.pertence(correntista_id, usuario_id)
 
-        if valor <= 0:
-            return jsonify({"erro": "Valor deve ser positivo"}), 400
+# -----------------
+# Execução comum das operações bancárias
+# -----------------
+def processar_operacao(tipo):
+    """Executa a operação pelo executor único e notifica o usuário via WebSocket"""
+    data = request.get_json(silent=True) or {}
+    usuario_id = request.usuario_atual['usuario_id']
 
-        if origem_id == destino_id:
-            return jsonify({"erro": "Não é possível transferir para a mesma conta"}), 400
+    resultado = executar_operacao(tipo, data, usuario_id)
+    if resultado.sucesso:
+        emitir_notificacao(usuario_id, tipo, resultado.notificacao, resultado.dados, resultado.movimentacoes)
 
-        # Verificar se o correntista de origem pertence ao usuário logado
-        if not verificar_correntista_usuario(origem_id, request.usuario_atual['usuario_id']):
-            return jsonify({"erro": "Correntista de origem não encontrado ou não autorizado"}), 403
+    return jsonify(resultado.corpo()), resultado.status
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.callproc('spTransferir', (origem_id, destino_id, valor))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        # Emitir notificação WebSocket
-        emitir_notificacao(
-            request.usuario_atual['usuario_id'],
-            'transferencia',
-            f'Transferência de R$ {valor:.2f} realizada com sucesso',
-            {'valor': valor, 'origem_id': origem_id, 'destino_id': destino_id}
-        )
+# -----------------
+# Rota para Operação de Pagamento (PROTEGIDA)
+# -----------------
+@app.route('/pagamento', methods=['POST'])
+@token_required
+@idempotente
+def pagar():
+    return processar_operacao('pagamento')
 
-        return jsonify({"mensagem": "Transferência realizada com sucesso"}), 201
-    except mysql.connector.Error as ex:
-        return jsonify({"erro": f"Erro ao realizar transferência: {ex}"}), 500
+# -----------------
+# Rota para Operação de Transferência (PROTEGIDA)
+# -----------------
+@app.route('/transferencia', methods=['POST'])
+@token_required
+@idempotente
+def transferir():
+    return processar_operacao('transferencia')
 
 # -----------------
 # Rota para Operação de Saque (PROTEGIDA)
 # -----------------
 @app.route('/saque', methods=['POST'])
 @token_required
+@idempotente
 def sacar():
-    try:
-        data = request.get_json()
-        correntista_id = data.get('correntista_id')
-        valor = data.get('valor')
-
-        if not all([correntista_id, valor]):
-            return jsonify({"erro": "Dados incompletos"}), 400
-
-        if valor <= 0:
-            return jsonify({"erro": "Valor deve ser positivo"}), 400
-
-        # Verificar se o correntista pertence ao usuário logado
-        if not verificar_correntista_usuario(correntista_id, request.usuario_atual['usuario_id']):
-            return jsonify({"erro": "Correntista não encontrado ou não autorizado"}), 403
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.callproc('spSacar', (correntista_id, valor))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        # Emitir notificação WebSocket
-        emitir_notificacao(
-            request.usuario_atual['usuario_id'],
-            'saque',
-            f'Saque de R$ {valor:.2f} realizado com sucesso',
-            {'valor': valor, 'correntista_id': correntista_id}
-        )
-
-        return jsonify({"mensagem": "Saque realizado com sucesso"}), 201
-    except mysql.connector.Error as ex:
-        return jsonify({"erro": f"Erro ao realizar saque: {ex}"}), 500
+    return processar_operacao('saque')
 
 # -----------------
 # Rota para Operação de Depósito (PROTEGIDA)
 # -----------------
 @app.route('/deposito', methods=['POST'])
 @token_required
+@idempotente
 def depositar():
-    try:
-        data = request.get_json()
-        correntista_id = data.get('correntista_id')
-        valor = data.get('valor')
+    return processar_operacao('deposito')
+
+# -----------------
+# Rota para Operações em Lote (PROTEGIDA)
+# -----------------
+LOTE_MAXIMO_OPERACOES = int(os.getenv('LOTE_MAXIMO_OPERACOES', '10000'))
 
-        if not all([correntista_id, valor]):
-            return jsonify({"erro": "Dados incompletos"}), 400
+@app.route('/lote', methods=['POST'])
+@token_required
+@idempotente
+def processar_lote():
+    data = request.get_json(silent=True) or {}
+    itens = data.get('operacoes')
+    tamanho_bloco = data.get('tamanho_bloco', LOTE_TAMANHO_BLOCO)
 
-        if valor <= 0:
-            return jsonify({"erro": "Valor deve ser positivo"}), 400
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"erro": "Informe a lista de operações"}), 400
 
-        # Verificar se o correntista pertence ao usuário logado
-        if not verificar_correntista_usuario(correntista_id, request.usuario_atual['usuario_id']):
-            return jsonify({"erro": "Correntista não encontrado ou não autorizado"}), 403
+    if len(itens) > LOTE_MAXIMO_OPERACOES:
+        return jsonify({"erro": f"Máximo de {LOTE_MAXIMO_OPERACOES} operações por lote"}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.callproc('spDepositar', (correntista_id, valor))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        # Emitir notificação WebSocket
+    if isinstance(tamanho_bloco, bool) or not isinstance(tamanho_bloco, int) or not 1 <= tamanho_bloco <= 1000:
+        return jsonify({"erro": "tamanho_bloco deve ser um inteiro entre 1 e 1000"}), 400
+
+    try:
+        resultados, afetados = executar_lote(itens, request.usuario_atual['usuario_id'], tamanho_bloco)
+    except mysql.connector.Error as ex:
+        # Só a consulta dos correntistas do usuário chega aqui: os blocos tratam os próprios erros
+        return jsonify({"erro": f"Erro ao processar lote: {ex}"}), 500
+
+    # Uma notificação resumida por usuário afetado, com o saldo final de cada conta
+    for usuario_id, resumo in afetados.items():
+        saldos = resumo.pop('saldos')
         emitir_notificacao(
-            request.usuario_atual['usuario_id'],
-            'deposito',
-            f'Depósito de R$ {valor:.2f} realizado com sucesso',
-            {'valor': valor, 'correntista_id': correntista_id}
+            usuario_id,
+            'lote',
+            f'{resumo["movimentacoes"]} movimentações processadas em lote',
+            resumo,
+            saldos=saldos
         )
 
-        return jsonify({"mensagem": "Depósito realizado com sucesso"}), 201
-    except mysql.connector.Error as ex:
-        return jsonify({"erro": f"Erro ao realizar depósito: {ex}"}), 500
+    sucesso = sum(1 for resultado in resultados if resultado.sucesso)
+    return jsonify({
+        "resultados": [
+            {"indice": indice, "status": resultado.status, **resultado.corpo()}
+            for indice, resultado in enumerate(resultados)
+        ],
+        "sucesso": sucesso,
+        "falhas": len(resultados) - sucesso
+    }), 200
+
+# -----------------
+# Sessões WebSocket
+# -----------------
+def abrir_sessao_socket(payload):
+    """Guarda usuário, expiração e correntistas do socket atual e entra na sala do usuário"""
+    usuario_id = payload['usuario_id']
+    try:
+        correntistas = indice_proprietarios.correntistas_do_usuario(usuario_id)
+    except (mysql.connector.Error, PoolEsgotadoError):
+        # Carregados na primeira autorização
+        correntistas = None
+    anterior = sessoes_socket.obter(request.sid)
+    if anterior is not None and anterior.usuario_id != usuario_id:
+        # O socket passou a ser de outro usuário: sair das salas do anterior
+        leave_room(f'user_{anterior.usuario_id}')
+        for correntista_id in anterior.assinaturas:
+            leave_room(f'saldo_{correntista_id}')
+    join_room(f'user_{usuario_id}')
+    return sessoes_socket.abrir(request.sid, payload, correntistas)
+
+def sessao_socket(data):
+    """Sessão do socket atual; sem 'autenticar' prévio, aceita o token da mensagem"""
+    sessao = sessoes_socket.obter(request.sid)
+    if sessao is None and isinstance(data, dict) and data.get('token'):
+        payload = verificar_token(data['token'])
+        if payload is not None:
+            sessao = abrir_sessao_socket(payload)
+    return sessao
+
+def socket_pode_acessar(sessao, correntista_id):
+    """Autoriza pela sessão; o índice só é consultado se a sessão foi invalidada"""
+    try:
+        correntista_id = int(correntista_id)
+    except (TypeError, ValueError):
+        return False
+    if sessao.correntistas is None:
+        sessao.correntistas = indice_proprietarios.correntistas_do_usuario(sessao.usuario_id)
+    return correntista_id in sessao.correntistas
 
 # -----------------
 # Eventos WebSocket
@@ -525,6 +804,7 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     """Evento disparado quando um cliente desconecta"""
+    sessoes_socket.fechar(request.sid)
     print('Cliente desconectado')
 
 @socketio.on('autenticar')
@@ -542,18 +822,17 @@ def handle_autenticar(data):
             disconnect()
             return
         
-        # Adicionar cliente à sala do usuário
-        from flask_socketio import join_room
-        usuario_id = payload['usuario_id']
-        join_room(f'user_{usuario_id}')
+        # Guardar a sessão e adicionar o cliente à sala do usuário
+        sessao = abrir_sessao_socket(payload)
         
         emit('autenticado', {
             'mensagem': 'Autenticado com sucesso',
-            'usuario_id': usuario_id,
-            'email': payload['email']
+            'usuario_id': sessao.usuario_id,
+            'email': sessao.email,
+            'expira_em': sessao.expira_em
         })
         
-        print(f'Usuário {usuario_id} autenticado no WebSocket')
+        print(f'Usuário {sessao.usuario_id} autenticado no WebSocket')
         
     except Exception as e:
         emit('erro', {'mensagem': f'Erro na autenticação: {str(e)}'})
@@ -563,35 +842,26 @@ def handle_autenticar(data):
 def handle_solicitar_saldo(data):
     """Retorna o saldo atualizado de um correntista"""
     try:
-        token = data.get('token')
-        correntista_id = data.get('correntista_id')
-        
-        if not token or not correntista_id:
-            emit('erro', {'mensagem': 'Token e correntista_id são obrigatórios'})
+        sessao = sessao_socket(data)
+        if sessao is None:
+            emit('erro', {'mensagem': 'Socket não autenticado'})
             return
         
-        payload = verificar_token(token)
-        if payload is None:
-            emit('erro', {'mensagem': 'Token inválido'})
+        correntista_id = data.get('correntista_id')
+        if not correntista_id:
+            emit('erro', {'mensagem': 'correntista_id é obrigatório'})
             return
         
-        # Verificar se o correntista pertence ao usuário
-        if not verificar_correntista_usuario(correntista_id, payload['usuario_id']):
+        # Verificar se o correntista pertence ao usuário (pela sessão, sem consultar o banco)
+        if not socket_pode_acessar(sessao, correntista_id):
             emit('erro', {'mensagem': 'Correntista não autorizado'})
             return
         
         # Buscar saldo atualizado
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT CorrentistaID, NomeCorrentista, Saldo FROM Correntistas WHERE CorrentistaID = %s",
-            (correntista_id,)
-        )
-        correntista = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        correntista = armazenamento.buscar_correntista(int(correntista_id))
         
         if correntista:
+            correntista['Saldo'] = float(correntista['Saldo'])
             emit('saldo_atualizado', correntista)
         else:
             emit('erro', {'mensagem': 'Correntista não encontrado'})
@@ -599,5 +869,65 @@ def handle_solicitar_saldo(data):
     except Exception as e:
         emit('erro', {'mensagem': f'Erro ao buscar saldo: {str(e)}'})
 
+ASSINATURAS_SALDO_MAXIMO = int(os.getenv('ASSINATURAS_SALDO_MAXIMO', '100'))
+
+def _ler_ids_correntistas(data):
+    ids = data.get('correntistas') if isinstance(data, dict) else None
+    if not isinstance(ids, list):
+        return None
+    try:
+        return [int(c) for c in ids]
+    except (TypeError, ValueError):
+        return None
+
+@socketio.on('assinar_saldo')
+def handle_assinar_saldo(data):
+    """Passa a receber 'saldo_atualizado' sempre que o saldo das contas mudar"""
+    sessao = sessao_socket(data)
+    if sessao is None:
+        emit('erro', {'mensagem': 'Socket não autenticado'})
+        return
+    
+    ids = _ler_ids_correntistas(data)
+    if ids is None:
+        emit('erro', {'mensagem': 'Informe a lista de correntistas'})
+        return
+    
+    try:
+        aceitos = [c for c in ids if socket_pode_acessar(sessao, c)]
+    except (mysql.connector.Error, PoolEsgotadoError) as ex:
+        emit('erro', {'mensagem': f'Erro ao assinar saldo: {ex}'})
+        return
+    
+    novos = [c for c in dict.fromkeys(aceitos) if c not in sessao.assinaturas]
+    if len(sessao.assinaturas) + len(novos) > ASSINATURAS_SALDO_MAXIMO:
+        emit('erro', {'mensagem': f'Máximo de {ASSINATURAS_SALDO_MAXIMO} assinaturas de saldo por conexão'})
+        return
+    
+    # A sala saldo_<id> é o índice conta -> sockets; o envio custa O(assinantes)
+    for correntista_id in novos:
+        join_room(f'saldo_{correntista_id}')
+        sessao.assinaturas.add(correntista_id)
+    
+    emit('saldo_assinado', {
+        'correntistas': sorted(sessao.assinaturas),
+        'recusados': sorted(set(ids) - set(aceitos))
+    })
+
+@socketio.on('cancelar_saldo')
+def handle_cancelar_saldo(data=None):
+    """Deixa de receber o saldo das contas informadas (todas, sem lista)"""
+    sessao = sessoes_socket.obter(request.sid)
+    if sessao is None:
+        return
+    
+    ids = _ler_ids_correntistas(data)
+    for correntista_id in list(sessao.assinaturas) if ids is None else ids:
+        if correntista_id in sessao.assinaturas:
+            leave_room(f'saldo_{correntista_id}')
+            sessao.assinaturas.discard(correntista_id)
+    
+    emit('saldo_assinado', {'correntistas': sorted(sessao.assinaturas), 'recusados': []})
+
 if __name__ == '__main__':
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
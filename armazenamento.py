@@ -0,0 +1,323 @@
+"""
+Camada de armazenamento da API: usuários, correntistas, leituras do extrato e
+as quatro operações bancárias
+
+Três backends, escolhidos por ARMAZENAMENTO_BACKEND:
+- mysql (padrão): as consultas da API e as stored procedures;
+- memoria: tudo no processo (armazenamento_memoria.py), com as mesmas
+  verificações de saldo e mensagens das procedures. Serve para benchmarks e
+  para rodar a API sem um servidor MySQL;
+- motor: saldos em memória com log local e gravação em lotes no MySQL
+  (motor_saldos.py), para contas com muitas operações por segundo.
+
+As linhas devolvidas têm as mesmas colunas e tipos em todos os backends (Saldo e
+ValorOperacao em Decimal, DataOperacao em datetime).
+"""
+import os
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from estatisticas import calcular_estatisticas
+from extrato import consulta_extrato, consulta_movimentacoes_usuario, EXTRATO_DESNORMALIZADO
+from paginacao import mesclar_paginas
+from pool_conexoes import get_db_connection
+from saldos_diarios import consultar_historico
+
+ARMAZENAMENTO_BACKEND = os.getenv('ARMAZENAMENTO_BACKEND', 'mysql').lower()
+BACKENDS = ('mysql', 'memoria', 'motor')
+
+
+# Erros causados pelos dados de um item do lote: desfeitos só até o savepoint do item
+# (texto longo demais, valor fora do DECIMAL, CHECK violada, valor inválido)
+ERROS_DADOS_ITEM = frozenset((
+    errorcode.ER_DATA_TOO_LONG,
+    errorcode.ER_WARN_DATA_OUT_OF_RANGE,
+    errorcode.ER_CHECK_CONSTRAINT_VIOLATED,
+    errorcode.ER_TRUNCATED_WRONG_VALUE_FOR_FIELD,
+))
+
+
+class OperacaoRecusada(Exception):
+    """Regra de negócio das procedures (422) ou conta de origem de outro usuário (403)"""
+
+    def __init__(self, mensagem, status):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# Consultas simples das rotas (também verificadas com EXPLAIN pelo check_procedures.py)
+SQL_USUARIO_POR_EMAIL = "SELECT UsuarioID, Email, SenhaHash, Nome FROM Usuarios WHERE Email = %s AND Ativo = TRUE"
+SQL_CORRENTISTAS_USUARIO = "SELECT CorrentistaID, NomeCorrentista, Saldo FROM Correntistas WHERE UsuarioID = %s"
+SQL_IDS_CORRENTISTAS = "SELECT CorrentistaID FROM Correntistas WHERE UsuarioID = %s"
+
+
+def consulta_bloqueio(contas):
+    """Retorna (sql, params) que trava as linhas das contas em ordem de ID"""
+    ids = sorted({int(c) for c in contas})
+    marcadores = ', '.join(['%s'] * len(ids))
+    return (
+        f"SELECT CorrentistaID, UsuarioID FROM Correntistas "
+        f"WHERE CorrentistaID IN ({marcadores}) ORDER BY CorrentistaID FOR UPDATE",
+        tuple(ids)
+    )
+
+
+def _bloquear_contas(cursor, contas):
+    """Trava as linhas das contas (em ordem de ID) e retorna {CorrentistaID: UsuarioID}"""
+    cursor.execute(*consulta_bloqueio(contas))
+    return dict(cursor.fetchall())
+
+
+def _ler_movimentacoes(cursor):
+    """Lê o resultado de spRetornarMovimentacoes após o callproc
+
+    Retorna [(UsuarioID, linha)] com as colunas do extrato e o Saldo da conta
+    já serializáveis em JSON.
+    """
+    movimentacoes = []
+    for resultado in cursor.stored_results():
+        for valores in resultado.fetchall():
+            linha = dict(zip(resultado.column_names, valores))
+            dono = linha.pop('UsuarioID')
+            linha['DataOperacao'] = linha['DataOperacao'].isoformat()
+            linha['ValorOperacao'] = float(linha['ValorOperacao'])
+            linha['Saldo'] = float(linha['Saldo'])
+            movimentacoes.append((dono, linha))
+    return movimentacoes
+
+
+class ArmazenamentoMySQL:
+    """Dados no MySQL; as operações executam as stored procedures"""
+
+    nome = 'mysql'
+
+    def _consultar(self, sql, params, uma=False):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(sql, params)
+            resultado = cursor.fetchone() if uma else cursor.fetchall()
+            cursor.close()
+            return resultado
+        finally:
+            conn.close()
+
+    # -----------------
+    # Usuários
+    # -----------------
+    def buscar_usuario_por_email(self, email):
+        """Usuário ativo com o e-mail (UsuarioID, Email, SenhaHash, Nome) ou None"""
+        return self._consultar(SQL_USUARIO_POR_EMAIL, (email,), uma=True)
+
+    def buscar_usuario(self, usuario_id):
+        """UsuarioID, Email, Nome e DataCriacao do usuário ou None"""
+        return self._consultar(
+            "SELECT UsuarioID, Email, Nome, DataCriacao FROM Usuarios WHERE UsuarioID = %s",
+            (usuario_id,), uma=True
+        )
+
+    def criar_usuario(self, email, senha_hash, nome):
+        """Retorna o UsuarioID criado ou None se o e-mail já está cadastrado"""
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT UsuarioID FROM Usuarios WHERE Email = %s", (email,))
+            if cursor.fetchone():
+                cursor.close()
+                return None
+            cursor.execute(
+                "INSERT INTO Usuarios (Email, SenhaHash, Nome) VALUES (%s, %s, %s)",
+                (email, senha_hash, nome)
+            )
+            conn.commit()
+            usuario_id = cursor.lastrowid
+            cursor.close()
+            return usuario_id
+        finally:
+            conn.close()
+
+    # -----------------
+    # Correntistas
+    # -----------------
+    def listar_correntistas(self, usuario_id):
+        return self._consultar(SQL_CORRENTISTAS_USUARIO, (usuario_id,))
+
+    def ids_correntistas(self, usuario_id):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_IDS_CORRENTISTAS, (usuario_id,))
+            ids = frozenset(linha[0] for linha in cursor.fetchall())
+            cursor.close()
+            return ids
+        finally:
+            conn.close()
+
+    def buscar_correntista(self, correntista_id):
+        return self._consultar(
+            "SELECT CorrentistaID, NomeCorrentista, Saldo FROM Correntistas WHERE CorrentistaID = %s",
+            (correntista_id,), uma=True
+        )
+
+    # -----------------
+    # Leituras do extrato
+    # -----------------
+    def extrato(self, correntista_id, filtros=None, cursor_pagina=None, limite=None):
+        """Movimentações do correntista, mais recentes primeiro (`limite + 1` linhas)"""
+        return self._consultar(*consulta_extrato(correntista_id, filtros, cursor_pagina, limite))
+
+    def movimentacoes_usuario(self, usuario_id, correntistas, filtros=None, cursor_pagina=None, limite=None):
+        """Movimentações de todos os `correntistas` do usuário, mais recentes primeiro"""
+        if EXTRATO_DESNORMALIZADO:
+            # A tabela desnormalizada já traz o UsuarioID, em ordem pelo índice (UsuarioID, DataOperacao)
+            return self._consultar(*consulta_movimentacoes_usuario(usuario_id, filtros, cursor_pagina, limite))
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            # Uma página por correntista, lida em ordem pelo índice (CorrentistaID, DataOperacao),
+            # e intercalada aqui: evita ordenar todo o histórico do usuário no banco
+            paginas = []
+            for correntista_id in sorted(correntistas):
+                cursor.execute(*consulta_extrato(correntista_id, filtros, cursor_pagina, limite))
+                paginas.append(cursor.fetchall())
+            cursor.close()
+        finally:
+            conn.close()
+        return mesclar_paginas(paginas, limite)
+
+    def abrir_exportacao(self, correntista_id, filtros=None):
+        """(conexão, cursor) do extrato completo para exportacao.exportar()"""
+        conn = get_db_connection()
+        try:
+            # Cursor sem buffer: as linhas são lidas do servidor à medida que o stream avança
+            cursor = conn.cursor(buffered=False)
+            cursor.execute(*consulta_extrato(correntista_id, filtros))
+        except mysql.connector.Error:
+            conn.close()
+            raise
+        return conn, cursor
+
+    def estatisticas(self, usuario_id, inicio=None, fim=None):
+        conn = get_db_connection()
+        try:
+            return calcular_estatisticas(conn, usuario_id, inicio, fim)
+        finally:
+            conn.close()
+
+    def historico_saldos(self, correntista_ids, granularidade='dia', inicio=None, fim=None):
+        conn = get_db_connection()
+        try:
+            return consultar_historico(conn, correntista_ids, granularidade, inicio, fim)
+        finally:
+            conn.close()
+
+    # -----------------
+    # Operações
+    # -----------------
+    def executar(self, spec, dados, usuario_id):
+        """Executa a procedure da operação em uma transação; retorna [(UsuarioID, linha)]
+
+        Levanta OperacaoRecusada para a conta de origem de outro usuário (403)
+        e para as regras sinalizadas pela procedure (422).
+        """
+        contas = spec.contas(dados)
+        conn = get_db_connection()
+        cursor = None
+        try:
+            conn.start_transaction()
+            cursor = conn.cursor()
+
+            # Confirmação autoritativa: a linha fica travada até o commit
+            donos = _bloquear_contas(cursor, contas)
+            if donos.get(int(contas[0])) != usuario_id:
+                conn.rollback()
+                raise OperacaoRecusada(spec.erro_autorizacao, 403)
+
+            cursor.callproc(spec.procedure, spec.argumentos(dados))
+            movimentacoes = _ler_movimentacoes(cursor)
+            conn.commit()
+            return movimentacoes
+        except mysql.connector.Error as ex:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+            if ex.errno == errorcode.ER_SIGNAL_EXCEPTION:
+                # Regras de negócio sinalizadas pelas procedures (ex.: saldo insuficiente)
+                raise OperacaoRecusada(ex.msg, 422)
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    def executar_bloco(self, bloco, usuario_id, recusar):
+        """Executa os itens [(indice, spec, item)] em uma transação, com um savepoint por item
+
+        Itens recusados são informados por `recusar(indice, status, erro)`,
+        inclusive os com erro nos próprios dados (ERROS_DADOS_ITEM).
+        Retorna ({CorrentistaID: UsuarioID}, [(indice, spec, item, movimentacoes)]).
+        Um erro de conexão ou do servidor desfaz o bloco inteiro e é propagado.
+        """
+        conn = get_db_connection()
+        cursor = None
+        concluidos = []
+        try:
+            conn.start_transaction()
+            cursor = conn.cursor()
+
+            # Uma única consulta trava todas as contas envolvidas no bloco
+            donos = _bloquear_contas(cursor, [c for _, spec, item in bloco for c in spec.contas(item)])
+
+            for indice, spec, item in bloco:
+                if donos.get(int(spec.contas(item)[0])) != usuario_id:
+                    recusar(indice, 403, spec.erro_autorizacao)
+                    continue
+
+                cursor.execute("SAVEPOINT item_lote")
+                try:
+                    cursor.callproc(spec.procedure, spec.argumentos(item))
+                    movimentacoes = _ler_movimentacoes(cursor)
+                except mysql.connector.Error as ex:
+                    if ex.errno == errorcode.ER_SIGNAL_EXCEPTION:
+                        cursor.execute("ROLLBACK TO SAVEPOINT item_lote")
+                        recusar(indice, 422, ex.msg)
+                        continue
+                    if ex.errno in ERROS_DADOS_ITEM:
+                        # Erro nos dados deste item: os demais itens do bloco seguem
+                        cursor.execute("ROLLBACK TO SAVEPOINT item_lote")
+                        recusar(indice, 500, f"{spec.erro}: {ex}")
+                        continue
+                    raise
+                concluidos.append((indice, spec, item, movimentacoes))
+
+            conn.commit()
+            return donos, concluidos
+        except mysql.connector.Error:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+
+def criar_armazenamento(backend=ARMAZENAMENTO_BACKEND):
+    """Cria o armazenamento configurado em ARMAZENAMENTO_BACKEND (mysql, memoria ou motor)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"ARMAZENAMENTO_BACKEND deve ser um de: {', '.join(BACKENDS)}")
+    if backend == 'memoria':
+        from armazenamento_memoria import ArmazenamentoMemoria
+        return ArmazenamentoMemoria.do_ambiente()
+    if backend == 'motor':
+        from motor_saldos import MotorSaldos
+        return MotorSaldos()
+    return ArmazenamentoMySQL()
+
+
+armazenamento = criar_armazenamento()
@@ -0,0 +1,535 @@
+"""
+Backend de armazenamento em memória (ARMAZENAMENTO_BACKEND=memoria)
+
+Reproduz as stored procedures no processo: as mesmas verificações de saldo e
+de beneficiário, as mesmas mensagens (devolvidas como 422), o arredondamento
+de DECIMAL(15, 2), o limite de 50 caracteres da descrição e a consolidação
+diária de SaldosDiarios. Os dados partem do script SistemasCorporativos.sql
+ou de um arquivo JSON gerado por `python benchmark.py semear --arquivo`.
+
+Os dados existem só neste processo: use um único processo da API.
+"""
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from mysql.connector import errors
+
+from armazenamento import OperacaoRecusada
+from estatisticas import resumir_estatisticas
+from paginacao import mesclar_paginas
+from saldos_diarios import montar_historico, periodo_em_dias
+
+ARMAZENAMENTO_MEMORIA_ARQUIVO = os.getenv('ARMAZENAMENTO_MEMORIA_ARQUIVO', '')
+
+CENTAVO = Decimal('0.01')
+ZERO = Decimal('0.00')
+# Maior valor de um DECIMAL(15, 2)
+DECIMAL_MAXIMO = Decimal('9999999999999.99')
+TAMANHO_DESCRICAO = 50
+
+ROTULOS_TIPO = {'C': 'Crédito', 'D': 'Débito'}
+
+# Mesmas colunas (e ordem) do extrato no MySQL
+COLUNAS_EXTRATO = (
+    'CorrentistaID', 'NomeCorrentista', 'TipoOperacao', 'MovimentacaoID', 'Descricao',
+    'DataOperacao', 'ValorOperacao', 'BeneficiarioID', 'NomeBeneficiario'
+)
+
+# Dados iniciais de database/SistemasCorporativos.sql
+USUARIOS_INICIAIS = [
+    {'Email': 'admin@teste.com',
+     'SenhaHash': '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewfTWBtqZ4H5QHKG',
+     'Nome': 'Administrador'},
+]
+CORRENTISTAS_INICIAIS = [
+    {'NomeCorrentista': 'João Silva', 'Saldo': '1000.00', 'UsuarioID': 1},
+    {'NomeCorrentista': 'Maria Santos', 'Saldo': '1500.00', 'UsuarioID': 1},
+]
+
+
+def _agora():
+    # DATETIME do MySQL: precisão de segundos
+    return datetime.now().replace(microsecond=0)
+
+
+def _decimal(valor, coluna):
+    """Converte como um parâmetro DECIMAL(15, 2) do MySQL (arredonda meio para cima)"""
+    try:
+        numero = Decimal(str(valor)).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise errors.DataError(msg=f"Incorrect decimal value: '{valor}' for column '{coluna}' at row 1",
+                               errno=1366, sqlstate='HY000')
+    if abs(numero) > DECIMAL_MAXIMO:
+        raise errors.DataError(msg=f"Out of range value for column '{coluna}' at row 1", errno=1264,
+                               sqlstate='22003')
+    return numero
+
+
+def _texto(valor, coluna, tamanho=TAMANHO_DESCRICAO):
+    texto = str(valor)
+    if len(texto) > tamanho:
+        raise errors.DataError(msg=f"Data too long for column '{coluna}' at row 1", errno=1406,
+                               sqlstate='22001')
+    return texto
+
+
+def _data(valor):
+    return valor if isinstance(valor, datetime) else datetime.fromisoformat(valor)
+
+
+def atende_filtros(linha, filtros, cursor_pagina=None):
+    """Aplica a uma linha do extrato os filtros de ler_filtros_extrato e o cursor da página"""
+    if cursor_pagina is not None and (linha['DataOperacao'], linha['MovimentacaoID']) >= tuple(cursor_pagina):
+        return False
+    if not filtros:
+        return True
+    if filtros.get('inicio') and linha['DataOperacao'] < filtros['inicio']:
+        return False
+    if filtros.get('fim') and linha['DataOperacao'] >= filtros['fim']:
+        return False
+    if filtros.get('tipo') and linha['TipoOperacao'] != ROTULOS_TIPO[filtros['tipo']]:
+        return False
+    if filtros.get('valor_min') is not None and linha['ValorOperacao'] < filtros['valor_min']:
+        return False
+    if filtros.get('valor_max') is not None and linha['ValorOperacao'] > filtros['valor_max']:
+        return False
+    return True
+
+
+class _CursorMemoria:
+    """O suficiente de um cursor para exportacao.exportar()"""
+
+    def __init__(self, colunas, linhas):
+        self.column_names = colunas
+        self._linhas = linhas
+        self._posicao = 0
+
+    def fetchmany(self, tamanho):
+        lote = self._linhas[self._posicao:self._posicao + tamanho]
+        self._posicao += len(lote)
+        return lote
+
+    def close(self):
+        self._linhas = []
+
+
+class _ConexaoMemoria:
+    def close(self):
+        pass
+
+    def descartar(self):
+        pass
+
+
+class ProcedimentosMemoria:
+    """As stored procedures de escrita aplicadas a self._correntistas
+
+    Cada procedure valida tudo antes de alterar qualquer coisa (não há
+    rollback em memória) e retorna as linhas do extrato criadas. As
+    subclasses definem o próximo MovimentacaoID, o destino de cada
+    movimentação e as travas.
+    """
+
+    _procedures = {
+        'spDepositar': '_depositar',
+        'spSacar': '_sacar',
+        'spPagar': '_pagar',
+        'spTransferir': '_transferir',
+    }
+
+    def _proximo_id(self):
+        raise NotImplementedError
+
+    def _registrar(self, linha):
+        """INSERT em Movimentacoes + spRegistrarExtrato"""
+
+    def _linha(self, movimentacao_id, tipo, conta, valor, data_operacao, descricao, beneficiario=None):
+        beneficiario = int(beneficiario) if beneficiario is not None else None
+        return {
+            'CorrentistaID': conta,
+            'NomeCorrentista': self._correntistas[conta]['NomeCorrentista'],
+            'TipoOperacao': ROTULOS_TIPO[tipo],
+            'MovimentacaoID': movimentacao_id,
+            'Descricao': descricao,
+            'DataOperacao': data_operacao,
+            'ValorOperacao': valor,
+            'BeneficiarioID': beneficiario,
+            'NomeBeneficiario': self._correntistas[beneficiario]['NomeCorrentista'] if beneficiario else None
+        }
+
+    def _movimentar(self, tipo, conta, valor, agora, descricao, beneficiario=None):
+        if valor <= 0:
+            raise errors.DatabaseError(
+                msg="Check constraint 'CK_Movimentacoes_ValorOperacao' is violated.", errno=3819, sqlstate='HY000'
+            )
+        linha = self._linha(self._proximo_id(), tipo, conta, valor, agora, descricao, beneficiario)
+        self._registrar(linha)
+        return linha
+
+    def _atualizar_saldo(self, conta, creditos, debitos, agora):
+        """UPDATE Correntistas; retorna o novo saldo"""
+        correntista = self._correntistas[conta]
+        saldo = correntista['Saldo'] + creditos - debitos
+        if saldo > DECIMAL_MAXIMO:
+            raise errors.DataError(msg="Out of range value for column 'Saldo' at row 1", errno=1264,
+                                   sqlstate='22003')
+        correntista['Saldo'] = saldo
+        return saldo
+
+    def _verificar_saldo_maximo(self, conta, credito):
+        if self._correntistas[conta]['Saldo'] + credito > DECIMAL_MAXIMO:
+            raise errors.DataError(msg="Out of range value for column 'Saldo' at row 1", errno=1264,
+                                   sqlstate='22003')
+
+    def _depositar(self, correntista_id, valor):
+        conta = int(correntista_id)
+        valor = _decimal(valor, 'p_ValorDeposito')
+        self._verificar_saldo_maximo(conta, valor)
+        agora = _agora()
+        linha = self._movimentar('C', conta, valor, agora, 'Depósito em conta')
+        self._atualizar_saldo(conta, valor, ZERO, agora)
+        return (linha,)
+
+    def _sacar(self, correntista_id, valor):
+        conta = int(correntista_id)
+        valor = _decimal(valor, 'p_ValorSaque')
+        if not self._correntistas[conta]['Saldo'] >= valor:
+            raise OperacaoRecusada('Saldo insuficiente para realizar o saque', 422)
+        agora = _agora()
+        linha = self._movimentar('D', conta, valor, agora, 'Saque')
+        self._atualizar_saldo(conta, ZERO, valor, agora)
+        return (linha,)
+
+    def _pagar(self, correntista_id, valor, descricao):
+        conta = int(correntista_id)
+        valor = _decimal(valor, 'p_ValorOperacao')
+        descricao = _texto(descricao, 'p_Descricao')
+        if not self._correntistas[conta]['Saldo'] >= valor:
+            raise OperacaoRecusada('Saldo insuficiente para realizar o pagamento', 422)
+        descricao = _texto(f'Pagamento: {descricao}', 'Descricao')
+        agora = _agora()
+        linha = self._movimentar('D', conta, valor, agora, descricao)
+        self._atualizar_saldo(conta, ZERO, valor, agora)
+        return (linha,)
+
+    def _transferir(self, correntista_id, valor, beneficiario_id):
+        conta = int(correntista_id)
+        beneficiario = int(beneficiario_id)
+        valor = _decimal(valor, 'p_ValorOperacao')
+        if beneficiario not in self._correntistas:
+            raise OperacaoRecusada('Correntista beneficiário não encontrado', 422)
+        if not self._correntistas[conta]['Saldo'] >= valor:
+            raise OperacaoRecusada('Saldo insuficiente para realizar a transferência', 422)
+        self._verificar_saldo_maximo(beneficiario, valor)
+        agora = _agora()
+        debito = self._movimentar('D', conta, valor, agora, 'Transferência', beneficiario)
+        credito = self._movimentar('C', beneficiario, valor, agora, 'Transferência recebida', conta)
+        self._atualizar_saldo(conta, ZERO, valor, agora)
+        self._atualizar_saldo(beneficiario, valor, ZERO, agora)
+        return (debito, credito)
+
+    def _executar_procedure(self, spec, dados):
+        return getattr(self, self._procedures[spec.procedure])(*spec.argumentos(dados))
+
+    def _retornar(self, *linhas):
+        """spRetornarMovimentacoes, no formato de armazenamento._ler_movimentacoes"""
+        movimentacoes = []
+        for linha in linhas:
+            correntista = self._correntistas[linha['CorrentistaID']]
+            movimentacoes.append((correntista['UsuarioID'], {
+                **linha,
+                'DataOperacao': linha['DataOperacao'].isoformat(),
+                'ValorOperacao': float(linha['ValorOperacao']),
+                'Saldo': float(correntista['Saldo'])
+            }))
+        return movimentacoes
+
+    def _dono(self, conta):
+        correntista = self._correntistas.get(int(conta))
+        return correntista['UsuarioID'] if correntista else None
+
+
+class ArmazenamentoMemoria(ProcedimentosMemoria):
+    """Usuários, correntistas e movimentações em dicionários protegidos por um lock"""
+
+    nome = 'memoria'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usuarios = {}
+        # E-mail em minúsculas -> UsuarioID (a coluna do MySQL não diferencia maiúsculas)
+        self._emails = {}
+        self._correntistas = {}
+        self._por_usuario = {}
+        # CorrentistaID -> chaves (DataOperacao, MovimentacaoID) ordenadas e as linhas na mesma ordem
+        self._chaves = {}
+        self._linhas = {}
+        # CorrentistaID -> {date: [creditos, debitos, quantidade, saldo de fechamento]}
+        self._diarios = {}
+        self._ultimo_usuario = 0
+        self._ultima_movimentacao = 0
+
+    @classmethod
+    def do_ambiente(cls, arquivo=ARMAZENAMENTO_MEMORIA_ARQUIVO):
+        """Carrega o arquivo de ARMAZENAMENTO_MEMORIA_ARQUIVO ou os dados iniciais do script SQL"""
+        armazenamento = cls()
+        if arquivo:
+            with open(arquivo, encoding='utf-8') as entrada:
+                armazenamento.carregar(json.load(entrada))
+        else:
+            armazenamento.carregar({'usuarios': USUARIOS_INICIAIS, 'correntistas': CORRENTISTAS_INICIAIS})
+        return armazenamento
+
+    def carregar(self, dados):
+        """Importa {'usuarios', 'correntistas', 'movimentacoes'}; o Saldo de cada correntista é o atual"""
+        with self._lock:
+            for usuario in dados.get('usuarios', []):
+                usuario_id = int(usuario.get('UsuarioID') or self._ultimo_usuario + 1)
+                self._ultimo_usuario = max(self._ultimo_usuario, usuario_id)
+                self._usuarios[usuario_id] = {
+                    'UsuarioID': usuario_id,
+                    'Email': usuario['Email'],
+                    'SenhaHash': usuario['SenhaHash'],
+                    'Nome': usuario['Nome'],
+                    'DataCriacao': _data(usuario['DataCriacao']) if usuario.get('DataCriacao') else _agora(),
+                    'Ativo': usuario.get('Ativo', True)
+                }
+                self._emails[usuario['Email'].lower()] = usuario_id
+
+            for correntista in dados.get('correntistas', []):
+                correntista_id = int(correntista.get('CorrentistaID') or max(self._correntistas, default=0) + 1)
+                usuario_id = correntista.get('UsuarioID')
+                self._correntistas[correntista_id] = {
+                    'CorrentistaID': correntista_id,
+                    'NomeCorrentista': correntista['NomeCorrentista'],
+                    'Saldo': _decimal(correntista['Saldo'], 'Saldo'),
+                    'UsuarioID': usuario_id
+                }
+                self._por_usuario.setdefault(usuario_id, set()).add(correntista_id)
+
+            contas = set()
+            for movimentacao in dados.get('movimentacoes', []):
+                movimentacao_id = int(movimentacao.get('MovimentacaoID') or self._ultima_movimentacao + 1)
+                self._ultima_movimentacao = max(self._ultima_movimentacao, movimentacao_id)
+                conta = int(movimentacao['CorrentistaID'])
+                self._registrar(self._linha(
+                    movimentacao_id, movimentacao['TipoOperacao'], conta,
+                    _decimal(movimentacao['ValorOperacao'], 'ValorOperacao'), _data(movimentacao['DataOperacao']),
+                    movimentacao['Descricao'], movimentacao.get('CorrentistaBeneficiarioID')
+                ))
+                contas.add(conta)
+            for conta in contas:
+                self._reconstruir_diario(conta)
+
+    def _reconstruir_diario(self, conta):
+        """Como saldos_diarios.reconstruir: o saldo anterior é o atual menos todo o líquido"""
+        dias = {}
+        for linha in self._linhas[conta]:
+            dia = dias.setdefault(linha['DataOperacao'].date(), [ZERO, ZERO, 0, ZERO])
+            if linha['TipoOperacao'] == ROTULOS_TIPO['C']:
+                dia[0] += linha['ValorOperacao']
+            else:
+                dia[1] += linha['ValorOperacao']
+            dia[2] += 1
+        fechamento = self._correntistas[conta]['Saldo'] - sum(c - d for c, d, _, _ in dias.values())
+        for dia in dias.values():
+            fechamento += dia[0] - dia[1]
+            dia[3] = fechamento
+        self._diarios[conta] = dias
+
+    # -----------------
+    # Usuários
+    # -----------------
+    def buscar_usuario_por_email(self, email):
+        with self._lock:
+            usuario = self._usuarios.get(self._emails.get(email.lower()))
+            if usuario is None or not usuario['Ativo']:
+                return None
+            return {chave: usuario[chave] for chave in ('UsuarioID', 'Email', 'SenhaHash', 'Nome')}
+
+    def buscar_usuario(self, usuario_id):
+        with self._lock:
+            usuario = self._usuarios.get(usuario_id)
+            if usuario is None:
+                return None
+            return {chave: usuario[chave] for chave in ('UsuarioID', 'Email', 'Nome', 'DataCriacao')}
+
+    def criar_usuario(self, email, senha_hash, nome):
+        with self._lock:
+            if email.lower() in self._emails:
+                return None
+            self._ultimo_usuario += 1
+            usuario_id = self._ultimo_usuario
+            self._usuarios[usuario_id] = {
+                'UsuarioID': usuario_id, 'Email': email, 'SenhaHash': senha_hash, 'Nome': nome,
+                'DataCriacao': _agora(), 'Ativo': True
+            }
+            self._emails[email.lower()] = usuario_id
+            return usuario_id
+
+    # -----------------
+    # Correntistas
+    # -----------------
+    def _resumo_correntista(self, correntista_id):
+        correntista = self._correntistas[correntista_id]
+        return {
+            'CorrentistaID': correntista_id,
+            'NomeCorrentista': correntista['NomeCorrentista'],
+            'Saldo': correntista['Saldo']
+        }
+
+    def listar_correntistas(self, usuario_id):
+        with self._lock:
+            return [self._resumo_correntista(c) for c in sorted(self._por_usuario.get(usuario_id, ()))]
+
+    def ids_correntistas(self, usuario_id):
+        with self._lock:
+            return frozenset(self._por_usuario.get(usuario_id, ()))
+
+    def buscar_correntista(self, correntista_id):
+        with self._lock:
+            if correntista_id not in self._correntistas:
+                return None
+            return self._resumo_correntista(correntista_id)
+
+    # -----------------
+    # Leituras do extrato
+    # -----------------
+    def _intervalo(self, conta, inicio, fim, cursor_pagina=None):
+        """Posições [primeira, ultima) das chaves no período e antes do cursor"""
+        chaves = self._chaves.get(conta, [])
+        primeira = bisect_left(chaves, (inicio, 0)) if inicio else 0
+        ultima = len(chaves)
+        if fim:
+            ultima = bisect_left(chaves, (fim, 0))
+        if cursor_pagina is not None:
+            ultima = min(ultima, bisect_left(chaves, tuple(cursor_pagina)))
+        return primeira, ultima
+
+    def _pagina(self, conta, filtros, cursor_pagina, limite):
+        """Linhas do correntista, mais recentes primeiro, como consulta_extrato (limite + 1)"""
+        filtros = filtros or {}
+        primeira, ultima = self._intervalo(conta, filtros.get('inicio'), filtros.get('fim'), cursor_pagina)
+        quantidade = None if limite is None else limite + 1
+
+        linhas = self._linhas.get(conta, [])
+        pagina = []
+        for posicao in range(ultima - 1, primeira - 1, -1):
+            linha = linhas[posicao]
+            if not atende_filtros(linha, filtros):
+                continue
+            pagina.append(dict(linha))
+            if quantidade is not None and len(pagina) == quantidade:
+                break
+        return pagina
+
+    def extrato(self, correntista_id, filtros=None, cursor_pagina=None, limite=None):
+        with self._lock:
+            return self._pagina(int(correntista_id), filtros, cursor_pagina, limite)
+
+    def movimentacoes_usuario(self, usuario_id, correntistas, filtros=None, cursor_pagina=None, limite=None):
+        with self._lock:
+            paginas = [self._pagina(c, filtros, cursor_pagina, limite) for c in sorted(correntistas)]
+        return mesclar_paginas(paginas, limite)
+
+    def abrir_exportacao(self, correntista_id, filtros=None):
+        linhas = [tuple(linha[c] for c in COLUNAS_EXTRATO) for linha in self.extrato(correntista_id, filtros)]
+        return _ConexaoMemoria(), _CursorMemoria(COLUNAS_EXTRATO, linhas)
+
+    def estatisticas(self, usuario_id, inicio=None, fim=None):
+        linhas = []
+        with self._lock:
+            for conta in sorted(self._por_usuario.get(usuario_id, ())):
+                correntista = self._resumo_correntista(conta)
+                primeira, ultima = self._intervalo(conta, inicio, fim)
+                totais = {}
+                for linha in self._linhas.get(conta, [])[primeira:ultima]:
+                    total = totais.setdefault(linha['TipoOperacao'], [0, ZERO])
+                    total[0] += 1
+                    total[1] += linha['ValorOperacao']
+                if not totais:
+                    # LEFT JOIN sem movimentações no período
+                    linhas.append({**correntista, 'TipoOperacao': None, 'Quantidade': 0, 'Total': ZERO})
+                for codigo, rotulo in ROTULOS_TIPO.items():
+                    if rotulo in totais:
+                        quantidade, total = totais[rotulo]
+                        linhas.append({**correntista, 'TipoOperacao': codigo, 'Quantidade': quantidade,
+                                       'Total': total})
+        return resumir_estatisticas(linhas, inicio, fim)
+
+    def historico_saldos(self, correntista_ids, granularidade='dia', inicio=None, fim=None):
+        historico = {int(c): [] for c in correntista_ids}
+        inicio_dia, fim_dia = periodo_em_dias(inicio, fim)
+        linhas = []
+        with self._lock:
+            for conta in sorted(historico):
+                for dia, (creditos, debitos, quantidade, fechamento) in sorted(self._diarios.get(conta, {}).items()):
+                    if (inicio_dia and dia < inicio_dia) or (fim_dia and dia >= fim_dia):
+                        continue
+                    linhas.append({
+                        'CorrentistaID': conta, 'Data': dia, 'TotalCreditos': creditos,
+                        'TotalDebitos': debitos, 'Quantidade': quantidade, 'SaldoFechamento': fechamento
+                    })
+        return montar_historico(historico, linhas, granularidade)
+
+    # -----------------
+    # Operações (equivalentes às stored procedures)
+    # -----------------
+    def _proximo_id(self):
+        self._ultima_movimentacao += 1
+        return self._ultima_movimentacao
+
+    def _registrar(self, linha):
+        chaves = self._chaves.setdefault(linha['CorrentistaID'], [])
+        linhas = self._linhas.setdefault(linha['CorrentistaID'], [])
+        chave = (linha['DataOperacao'], linha['MovimentacaoID'])
+        if not chaves or chaves[-1] < chave:
+            chaves.append(chave)
+            linhas.append(linha)
+        else:
+            posicao = bisect_left(chaves, chave)
+            insort(chaves, chave)
+            linhas.insert(posicao, linha)
+
+    def _atualizar_saldo(self, conta, creditos, debitos, agora):
+        """UPDATE Correntistas + spAtualizarSaldoDiario"""
+        saldo = super()._atualizar_saldo(conta, creditos, debitos, agora)
+        dia = self._diarios.setdefault(conta, {}).setdefault(agora.date(), [ZERO, ZERO, 0, ZERO])
+        dia[0] += creditos
+        dia[1] += debitos
+        dia[2] += 1
+        dia[3] = saldo
+        return saldo
+
+    def executar(self, spec, dados, usuario_id):
+        """Mesmo contrato de ArmazenamentoMySQL.executar"""
+        with self._lock:
+            if self._dono(spec.contas(dados)[0]) != usuario_id:
+                raise OperacaoRecusada(spec.erro_autorizacao, 403)
+            return self._retornar(*self._executar_procedure(spec, dados))
+
+    def executar_bloco(self, bloco, usuario_id, recusar):
+        """Mesmo contrato de ArmazenamentoMySQL.executar_bloco; cada item é atômico"""
+        concluidos = []
+        with self._lock:
+            donos = {int(c): self._dono(c) for _, spec, item in bloco for c in spec.contas(item)}
+            for indice, spec, item in bloco:
+                if donos.get(int(spec.contas(item)[0])) != usuario_id:
+                    recusar(indice, 403, spec.erro_autorizacao)
+                    continue
+                try:
+                    linhas = self._executar_procedure(spec, item)
+                except OperacaoRecusada as ex:
+                    recusar(indice, ex.status, str(ex))
+                    continue
+                except errors.Error as ex:
+                    # Como o ROLLBACK TO SAVEPOINT do MySQL: as procedures validam antes de
+                    # alterar a memória, então só este item falha
+                    recusar(indice, 500, f"{spec.erro}: {ex}")
+                    continue
+                concluidos.append((indice, spec, item, self._retornar(*linhas)))
+        return donos, concluidos
@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga da API e do Socket.IO
+
+Uso:
+    python benchmark.py semear [--usuarios 50] [--correntistas 2] [--historico 200] [--arquivo dados.json]
+    python benchmark.py executar [--url http://127.0.0.1:5000] [--duracao 30] [--clientes 16]
+                                 [--sockets 20] [--mix padrao] [--saida arquivo.json]
+    python benchmark.py comparar anterior.json atual.json
+    python benchmark.py limpar
+
+`semear` cria usuários bench<N>@benchmark.local (senha BENCH_SENHA), com
+correntistas e histórico de movimentações (com --arquivo, em um JSON para o
+backend em memória, ARMAZENAMENTO_BACKEND=memoria). `executar` dispara a mistura de
+rotas escolhida por --duracao segundos, com --clientes threads HTTP e
+--sockets clientes Socket.IO recebendo 'notificacao', e grava em JSON a
+latência (p50/p95/p99), vazão e erros de cada rota.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+BENCH_SENHA = os.getenv('BENCH_SENHA', 'benchmark123')
+BENCH_DOMINIO = 'benchmark.local'
+BENCH_SALDO_INICIAL = 1_000_000
+PASTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_resultados')
+
+# Peso de cada rota nas misturas pré-definidas
+MISTURAS = {
+    'padrao': {
+        'GET /correntistas': 20, 'GET /movimentacoes': 20, 'GET /extrato/<id>': 20,
+        'POST /deposito': 10, 'POST /saque': 10, 'POST /transferencia': 10, 'POST /pagamento': 8,
+        'POST /login': 2
+    },
+    'leitura': {
+        'GET /correntistas': 30, 'GET /movimentacoes': 30, 'GET /extrato/<id>': 35,
+        'POST /deposito': 2, 'POST /transferencia': 2, 'POST /login': 1
+    },
+    'escrita': {
+        'GET /correntistas': 5, 'GET /movimentacoes': 5,
+        'POST /deposito': 25, 'POST /saque': 20, 'POST /transferencia': 30, 'POST /pagamento': 15
+    },
+}
+
+
+# -----------------
+# Estatísticas
+# -----------------
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank sobre uma lista já ordenada"""
+    if not ordenados:
+        return None
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def resumo_latencias(latencias):
+    ordenados = sorted(latencias)
+    if not ordenados:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'media': None}
+    return {
+        'p50': round(percentil(ordenados, 50), 3),
+        'p95': round(percentil(ordenados, 95), 3),
+        'p99': round(percentil(ordenados, 99), 3),
+        'max': round(ordenados[-1], 3),
+        'media': round(sum(ordenados) / len(ordenados), 3)
+    }
+
+
+def resumo_rota(medicoes, duracao):
+    """medicoes: [(status, latência em ms)]; status 0 indica falha de conexão"""
+    erros = sum(1 for status, _ in medicoes if status == 0 or status >= 500)
+    por_status = {}
+    for status, _ in medicoes:
+        por_status[str(status)] = por_status.get(str(status), 0) + 1
+    return {
+        'requisicoes': len(medicoes),
+        'erros': erros,
+        'taxa_erro': round(erros / len(medicoes), 4) if medicoes else 0.0,
+        'rps': round(len(medicoes) / duracao, 2) if duracao else 0.0,
+        'latencia_ms': resumo_latencias([latencia for _, latencia in medicoes]),
+        'status': por_status
+    }
+
+
+# -----------------
+# Cliente HTTP
+# -----------------
+class ClienteHTTP:
+    """Conexão HTTP persistente de um thread, reaberta quando o servidor a fecha"""
+
+    def __init__(self, url, timeout=30):
+        partes = urlparse(url)
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.timeout = timeout
+        self._conexao = None
+
+    def requisitar(self, metodo, caminho, corpo=None, token=None):
+        """Retorna (status, corpo JSON ou None, latência em ms); status 0 em falha de conexão"""
+        cabecalhos = {'Content-Type': 'application/json'}
+        if token:
+            cabecalhos['Authorization'] = f'Bearer {token}'
+        dados = json.dumps(corpo).encode('utf-8') if corpo is not None else None
+        inicio = time.perf_counter()
+        try:
+            if self._conexao is None:
+                self._conexao = http.client.HTTPConnection(self.host, self.porta, timeout=self.timeout)
+            self._conexao.request(metodo, caminho, body=dados, headers=cabecalhos)
+            resposta = self._conexao.getresponse()
+            conteudo = resposta.read()
+            latencia = (time.perf_counter() - inicio) * 1000
+            if resposta.will_close:
+                self.fechar()
+        except (OSError, http.client.HTTPException):
+            self.fechar()
+            return 0, None, (time.perf_counter() - inicio) * 1000
+        try:
+            return resposta.status, json.loads(conteudo), latencia
+        except ValueError:
+            return resposta.status, None, latencia
+
+    def fechar(self):
+        if self._conexao is not None:
+            self._conexao.close()
+            self._conexao = None
+
+
+# -----------------
+# Carga de dados
+# -----------------
+def _ids_bench(cursor):
+    cursor.execute("SELECT UsuarioID FROM Usuarios WHERE Email LIKE %s", (f'bench%@{BENCH_DOMINIO}',))
+    usuarios = [linha[0] for linha in cursor.fetchall()]
+    if not usuarios:
+        return [], []
+    marcadores = ', '.join(['%s'] * len(usuarios))
+    cursor.execute(f"SELECT CorrentistaID FROM Correntistas WHERE UsuarioID IN ({marcadores})", tuple(usuarios))
+    return usuarios, [linha[0] for linha in cursor.fetchall()]
+
+
+def limpar():
+    """Remove os usuários do benchmark e tudo o que pertence a eles"""
+    from pool_conexoes import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        usuarios, correntistas = _ids_bench(cursor)
+        if correntistas:
+            marcadores = ', '.join(['%s'] * len(correntistas))
+            for tabela, filtro in (
+                ('ExtratoMovimentacoes', f'CorrentistaID IN ({marcadores}) OR BeneficiarioID IN ({marcadores})'),
+                ('SaldosDiarios', f'CorrentistaID IN ({marcadores})'),
+                ('Movimentacoes', f'CorrentistaID IN ({marcadores}) OR CorrentistaBeneficiarioID IN ({marcadores})'),
+                ('Correntistas', f'CorrentistaID IN ({marcadores})'),
+            ):
+                repeticoes = filtro.count('%s') // len(correntistas)
+                cursor.execute(f"DELETE FROM {tabela} WHERE {filtro}", tuple(correntistas) * repeticoes)
+        if usuarios:
+            marcadores = ', '.join(['%s'] * len(usuarios))
+            cursor.execute(f"DELETE FROM ChavesIdempotencia WHERE UsuarioID IN ({marcadores})", tuple(usuarios))
+            cursor.execute(f"DELETE FROM Usuarios WHERE UsuarioID IN ({marcadores})", tuple(usuarios))
+        conn.commit()
+        return len(usuarios), len(correntistas)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _gerar_historico(aleatorio, correntista_ids, historico, dias, agora):
+    """(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao) espalhados por `dias`"""
+    movimentacoes = []
+    for correntista_id in correntista_ids:
+        for _ in range(historico):
+            tipo = aleatorio.choice('CD')
+            movimentacoes.append((
+                tipo, correntista_id, round(aleatorio.uniform(1, 500), 2),
+                agora - timedelta(seconds=aleatorio.randint(0, dias * 86400)),
+                'Depósito em conta' if tipo == 'C' else 'Pagamento: benchmark'
+            ))
+    return movimentacoes
+
+
+def semear_arquivo(arquivo, usuarios, correntistas_por_usuario, historico, dias, semente):
+    """Grava os mesmos dados em JSON para ARMAZENAMENTO_MEMORIA_ARQUIVO, sem usar o MySQL"""
+    from armazenamento_memoria import USUARIOS_INICIAIS, CORRENTISTAS_INICIAIS
+    from senhas import hash_senha
+
+    aleatorio = random.Random(semente)
+    senha_hash = hash_senha(BENCH_SENHA)
+    agora = datetime.now().replace(microsecond=0)
+
+    # Os dados do script SQL primeiro, com os mesmos IDs que teriam no banco
+    dados_usuarios = [dict(u, UsuarioID=i) for i, u in enumerate(USUARIOS_INICIAIS, start=1)]
+    dados_correntistas = [dict(c, CorrentistaID=i) for i, c in enumerate(CORRENTISTAS_INICIAIS, start=1)]
+    correntista_ids = []
+    for i in range(usuarios):
+        usuario_id = len(dados_usuarios) + 1
+        dados_usuarios.append({
+            'UsuarioID': usuario_id, 'Email': f'bench{i}@{BENCH_DOMINIO}', 'SenhaHash': senha_hash,
+            'Nome': f'Benchmark {i}'
+        })
+        for c in range(correntistas_por_usuario):
+            correntista_id = len(dados_correntistas) + 1
+            dados_correntistas.append({
+                'CorrentistaID': correntista_id, 'NomeCorrentista': f'Bench {usuario_id}-{c}',
+                'Saldo': str(BENCH_SALDO_INICIAL), 'UsuarioID': usuario_id
+            })
+            correntista_ids.append(correntista_id)
+
+    movimentacoes = [
+        {'TipoOperacao': tipo, 'CorrentistaID': correntista_id, 'ValorOperacao': str(valor),
+         'DataOperacao': data_operacao.isoformat(), 'Descricao': descricao}
+        for tipo, correntista_id, valor, data_operacao, descricao
+        in _gerar_historico(aleatorio, correntista_ids, historico, dias, agora)
+    ]
+    # Como o AUTO_INCREMENT após os INSERTs: IDs em ordem de inserção, não de data
+    for movimentacao_id, movimentacao in enumerate(movimentacoes, start=1):
+        movimentacao['MovimentacaoID'] = movimentacao_id
+
+    with open(arquivo, 'w', encoding='utf-8') as saida:
+        json.dump({'usuarios': dados_usuarios, 'correntistas': dados_correntistas,
+                   'movimentacoes': movimentacoes}, saida, ensure_ascii=False)
+    return usuarios, len(correntista_ids), len(movimentacoes)
+
+
+def semear(usuarios, correntistas_por_usuario, historico, dias, semente):
+    """Recria os dados do benchmark; `historico` movimentações por correntista"""
+    from pool_conexoes import get_db_connection
+    from saldos_diarios import reconstruir
+    from senhas import hash_senha
+
+    limpar()
+    aleatorio = random.Random(semente)
+    # Um único hash serve para todos: o custo do bcrypt é medido no /login, não na carga
+    senha_hash = hash_senha(BENCH_SENHA)
+    agora = datetime.now().replace(microsecond=0)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(
+            "INSERT INTO Usuarios (Email, SenhaHash, Nome) VALUES (%s, %s, %s)",
+            [(f'bench{i}@{BENCH_DOMINIO}', senha_hash, f'Benchmark {i}') for i in range(usuarios)]
+        )
+        usuario_ids, _ = _ids_bench(cursor)
+        cursor.executemany(
+            "INSERT INTO Correntistas (NomeCorrentista, Saldo, UsuarioID) VALUES (%s, %s, %s)",
+            [(f'Bench {u}-{c}', BENCH_SALDO_INICIAL, u) for u in usuario_ids for c in range(correntistas_por_usuario)]
+        )
+        _, correntista_ids = _ids_bench(cursor)
+        conn.commit()
+
+        movimentacoes = _gerar_historico(aleatorio, correntista_ids, historico, dias, agora)
+        for inicio in range(0, len(movimentacoes), 1000):
+            cursor.executemany(
+                "INSERT INTO Movimentacoes (TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                movimentacoes[inicio:inicio + 1000]
+            )
+            conn.commit()
+
+        if correntista_ids:
+            marcadores = ', '.join(['%s'] * len(correntista_ids))
+            cursor.execute(f"""
+                INSERT IGNORE INTO ExtratoMovimentacoes (MovimentacaoID, UsuarioID, CorrentistaID, NomeCorrentista,
+                    TipoOperacao, ValorOperacao, ValorAssinado, DataOperacao, Descricao, BeneficiarioID, NomeBeneficiario)
+                SELECT M.MovimentacaoID, C.UsuarioID, C.CorrentistaID, C.NomeCorrentista, M.TipoOperacao,
+                    M.ValorOperacao,
+                    CASE M.TipoOperacao WHEN 'C' THEN M.ValorOperacao ELSE -M.ValorOperacao END,
+                    M.DataOperacao, M.Descricao, NULL, NULL
+                FROM Movimentacoes AS M
+                INNER JOIN Correntistas AS C
+                  ON C.CorrentistaID = M.CorrentistaID
+                WHERE M.CorrentistaID IN ({marcadores})
+            """, tuple(correntista_ids))
+            conn.commit()
+
+        # Consolidação diária coerente com o saldo atual
+        for correntista_id in correntista_ids:
+            reconstruir(conn, correntista_id)
+        return len(usuario_ids), len(correntista_ids), len(movimentacoes)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# -----------------
+# Execução da carga
+# -----------------
+class UsuarioVirtual:
+    """Sessão de um usuário do benchmark: token e contas"""
+
+    def __init__(self, email):
+        self.email = email
+        self.token = None
+        self.correntistas = []
+
+
+def _entrar(cliente, usuario):
+    status, corpo, latencia = cliente.requisitar('POST', '/login', {'email': usuario.email, 'senha': BENCH_SENHA})
+    if status == 200 and corpo:
+        usuario.token = corpo['token']
+    return status, latencia
+
+
+def preparar_usuarios(url, quantidade):
+    """Faz login e lista as contas de cada usuário virtual (fora da medição)"""
+    cliente = ClienteHTTP(url)
+    usuarios = []
+    for i in range(quantidade):
+        usuario = UsuarioVirtual(f'bench{i}@{BENCH_DOMINIO}')
+        status, _ = _entrar(cliente, usuario)
+        if status != 200:
+            continue
+        status, corpo, _ = cliente.requisitar('GET', '/correntistas', token=usuario.token)
+        if status == 200 and corpo:
+            usuario.correntistas = [c['CorrentistaID'] for c in corpo]
+            usuarios.append(usuario)
+    cliente.fechar()
+    return usuarios
+
+
+def _executar_rota(cliente, rota, usuario, todas_contas, aleatorio):
+    conta = aleatorio.choice(usuario.correntistas)
+    valor = round(aleatorio.uniform(1, 50), 2)
+    if rota == 'POST /login':
+        status, latencia = _entrar(cliente, usuario)
+        return status, latencia
+    if rota == 'GET /correntistas':
+        requisicao = ('GET', '/correntistas', None)
+    elif rota == 'GET /movimentacoes':
+        requisicao = ('GET', '/movimentacoes?limit=50', None)
+    elif rota == 'GET /extrato/<id>':
+        requisicao = ('GET', f'/extrato/{conta}?limit=50', None)
+    elif rota == 'POST /deposito':
+        requisicao = ('POST', '/deposito', {'correntista_id': conta, 'valor': valor})
+    elif rota == 'POST /saque':
+        requisicao = ('POST', '/saque', {'correntista_id': conta, 'valor': valor})
+    elif rota == 'POST /pagamento':
+        requisicao = ('POST', '/pagamento', {'correntista_id': conta, 'valor': valor, 'descricao': 'benchmark'})
+    elif rota == 'POST /transferencia':
+        destino = aleatorio.choice(todas_contas)
+        while destino == conta and len(todas_contas) > 1:
+            destino = aleatorio.choice(todas_contas)
+        requisicao = ('POST', '/transferencia', {
+            'correntista_id_origem': conta, 'correntista_id_destino': destino, 'valor': valor
+        })
+    else:
+        raise ValueError(f'Rota desconhecida: {rota}')
+    status, _, latencia = cliente.requisitar(*requisicao, token=usuario.token)
+    return status, latencia
+
+
+def trabalhador_http(url, usuarios, todas_contas, mistura, inicio_medicao, fim, semente, medicoes):
+    aleatorio = random.Random(semente)
+    rotas, pesos = zip(*mistura.items())
+    cliente = ClienteHTTP(url)
+    try:
+        while time.monotonic() < fim:
+            usuario = aleatorio.choice(usuarios)
+            rota = aleatorio.choices(rotas, pesos)[0]
+            status, latencia = _executar_rota(cliente, rota, usuario, todas_contas, aleatorio)
+            if time.monotonic() >= inicio_medicao:
+                medicoes.setdefault(rota, []).append((status, latencia))
+    finally:
+        cliente.fechar()
+
+
+class OuvinteSocket:
+    """Cliente Socket.IO que mede o atraso de cada 'notificacao' recebida"""
+
+    def __init__(self, url, token, inicio_medicao):
+        import socketio
+
+        self.inicio_medicao = inicio_medicao
+        self.latencias = []
+        self.erros = 0
+        self.conectado = False
+        self.cliente = socketio.Client(reconnection=False)
+        self.cliente.on('connect', lambda: self.cliente.emit('autenticar', {'token': token}))
+        self.cliente.on('notificacao', self._notificacao)
+        self.cliente.on('eventos', self._eventos)
+        self.cliente.on('erro', self._erro)
+        self.url = url
+
+    def _notificacao(self, dados):
+        if time.monotonic() < self.inicio_medicao:
+            return
+        # O servidor carimba a notificação com utcnow(); mesmo relógio quando rodam na mesma máquina
+        emitida = datetime.fromisoformat(dados['timestamp'])
+        self.latencias.append((datetime.utcnow() - emitida).total_seconds() * 1000)
+
+    def _eventos(self, eventos):
+        for item in eventos:
+            if item.get('evento') == 'notificacao':
+                self._notificacao(item['dados'])
+
+    def _erro(self, _dados):
+        self.erros += 1
+
+    def conectar(self):
+        try:
+            self.cliente.connect(self.url, transports=['websocket', 'polling'], wait_timeout=10)
+            self.conectado = True
+            return True
+        except Exception:
+            self.erros += 1
+            return False
+
+    def desconectar(self):
+        if self.cliente.connected:
+            self.cliente.disconnect()
+
+
+def executar(url, duracao, aquecimento, clientes, sockets, mistura, usuarios, semente):
+    """Executa a carga e retorna o relatório"""
+    virtuais = preparar_usuarios(url, usuarios)
+    if not virtuais:
+        raise RuntimeError('Nenhum usuário do benchmark conseguiu entrar; rode "python benchmark.py semear"')
+    todas_contas = [c for usuario in virtuais for c in usuario.correntistas]
+
+    inicio = time.monotonic()
+    inicio_medicao = inicio + aquecimento
+    fim = inicio_medicao + duracao
+
+    ouvintes = []
+    if sockets:
+        try:
+            import socketio  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Clientes Socket.IO exigem: pip install 'python-socketio[client]'")
+        # Os ouvintes entram como os mesmos usuários que recebem as operações
+        ouvintes = [OuvinteSocket(url, virtuais[i % len(virtuais)].token, inicio_medicao) for i in range(sockets)]
+        for ouvinte in ouvintes:
+            ouvinte.conectar()
+
+    medicoes_por_thread = [{} for _ in range(clientes)]
+    threads = [
+        threading.Thread(
+            target=trabalhador_http,
+            args=(url, virtuais, todas_contas, mistura, inicio_medicao, fim, semente + i, medicoes_por_thread[i]),
+            daemon=True
+        )
+        for i in range(clientes)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Dar tempo às últimas notificações agrupadas
+    time.sleep(0.5)
+    for ouvinte in ouvintes:
+        ouvinte.desconectar()
+
+    medicoes = {}
+    for parcial in medicoes_por_thread:
+        for rota, itens in parcial.items():
+            medicoes.setdefault(rota, []).extend(itens)
+    todas = [item for itens in medicoes.values() for item in itens]
+
+    latencias_socket = [latencia for ouvinte in ouvintes for latencia in ouvinte.latencias]
+    return {
+        'versao': 1,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'configuracao': {
+            'url': url, 'duracao_s': duracao, 'aquecimento_s': aquecimento, 'clientes_http': clientes,
+            'clientes_socket': sockets, 'usuarios': len(virtuais), 'correntistas': len(todas_contas),
+            'mistura': mistura, 'semente': semente
+        },
+        'rotas': {rota: resumo_rota(itens, duracao) for rota, itens in sorted(medicoes.items())},
+        'total': resumo_rota(todas, duracao),
+        'socket': {
+            'clientes': len(ouvintes),
+            'conectados': sum(1 for ouvinte in ouvintes if ouvinte.conectado),
+            'notificacoes': len(latencias_socket),
+            'notificacoes_por_s': round(len(latencias_socket) / duracao, 2) if duracao else 0.0,
+            'erros': sum(ouvinte.erros for ouvinte in ouvintes),
+            'latencia_ms': resumo_latencias(latencias_socket)
+        }
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# -----------------
+# Relatórios
+# -----------------
+def _ms(valor):
+    return f'{valor:9.1f}' if valor is not None else '        -'
+
+
+def imprimir(relatorio):
+    print(f"{'Rota':<24}{'Req':>8}{'Req/s':>9}{'Erros':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print('-' * 75)
+    for rota, dados in list(relatorio['rotas'].items()) + [('TOTAL', relatorio['total'])]:
+        latencia = dados['latencia_ms']
+        print(f"{rota:<24}{dados['requisicoes']:>8}{dados['rps']:>9.1f}{dados['erros']:>7}"
+              f"{_ms(latencia['p50'])}{_ms(latencia['p95'])}{_ms(latencia['p99'])}")
+    socket = relatorio['socket']
+    if socket['clientes']:
+        latencia = socket['latencia_ms']
+        print(f"{'socket notificacao':<24}{socket['notificacoes']:>8}{socket['notificacoes_por_s']:>9.1f}"
+              f"{socket['erros']:>7}{_ms(latencia['p50'])}{_ms(latencia['p95'])}{_ms(latencia['p99'])}")
+
+
+def _variacao(anterior, atual):
+    if anterior in (None, 0) or atual is None:
+        return '      -'
+    return f'{(atual - anterior) / anterior * 100:+6.1f}%'
+
+
+def comparar(anterior, atual):
+    """Imprime a variação de vazão e latência por rota entre dois relatórios"""
+    print(f"Anterior: {anterior['data']} ({anterior.get('commit')})  Atual: {atual['data']} ({atual.get('commit')})\n")
+    print(f"{'Rota':<24}{'Req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'Erros':>9}")
+    print('-' * 69)
+    rotas = sorted(set(anterior['rotas']) | set(atual['rotas']))
+    pares = [(r, anterior['rotas'].get(r), atual['rotas'].get(r)) for r in rotas]
+    pares.append(('TOTAL', anterior['total'], atual['total']))
+    for rota, antes, depois in pares:
+        if antes is None or depois is None:
+            print(f"{rota:<24}{'(só em um dos relatórios)':>45}")
+            continue
+        print(f"{rota:<24}{_variacao(antes['rps'], depois['rps']):>9}"
+              + ''.join(f"{_variacao(antes['latencia_ms'][p], depois['latencia_ms'][p]):>9}" for p in ('p50', 'p95', 'p99'))
+              + f"{depois['erros'] - antes['erros']:>+9}")
+
+
+def _ler_mistura(valor):
+    if valor in MISTURAS:
+        return MISTURAS[valor]
+    # Formato livre: "GET /correntistas=5,POST /deposito=1"
+    mistura = {}
+    for parte in valor.split(','):
+        rota, _, peso = parte.rpartition('=')
+        rota = rota.strip()
+        if rota not in MISTURAS['padrao'] or not peso.strip().isdigit():
+            raise argparse.ArgumentTypeError(f'Mistura inválida: {parte}')
+        mistura[rota] = int(peso)
+    return mistura
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga da API')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_semear = comandos.add_parser('semear', help='Recria os dados do benchmark no MySQL')
+    p_semear.add_argument('--usuarios', type=int, default=50)
+    p_semear.add_argument('--correntistas', type=int, default=2, help='Correntistas por usuário')
+    p_semear.add_argument('--historico', type=int, default=200, help='Movimentações por correntista')
+    p_semear.add_argument('--dias', type=int, default=365, help='Período coberto pelo histórico')
+    p_semear.add_argument('--semente', type=int, default=42)
+    p_semear.add_argument('--arquivo', help='Grava um JSON para ARMAZENAMENTO_MEMORIA_ARQUIVO em vez de usar o MySQL')
+
+    p_executar = comandos.add_parser('executar', help='Executa a carga e grava o relatório')
+    p_executar.add_argument('--url', default=os.getenv('BENCH_URL', 'http://127.0.0.1:5000'))
+    p_executar.add_argument('--duracao', type=float, default=30, help='Segundos medidos')
+    p_executar.add_argument('--aquecimento', type=float, default=5, help='Segundos descartados no início')
+    p_executar.add_argument('--clientes', type=int, default=16, help='Threads HTTP simultâneos')
+    p_executar.add_argument('--sockets', type=int, default=20, help='Clientes Socket.IO')
+    p_executar.add_argument('--usuarios', type=int, default=50, help='Usuários do benchmark usados')
+    p_executar.add_argument('--mix', type=_ler_mistura, default='padrao',
+                            help=f"{' | '.join(MISTURAS)} ou 'ROTA=peso,...'")
+    p_executar.add_argument('--semente', type=int, default=42)
+    p_executar.add_argument('--saida', help='Arquivo JSON (padrão: benchmark_resultados/<data>.json)')
+
+    p_comparar = comandos.add_parser('comparar', help='Compara dois relatórios')
+    p_comparar.add_argument('anterior')
+    p_comparar.add_argument('atual')
+
+    comandos.add_parser('limpar', help='Remove os dados do benchmark')
+
+    args = parser.parse_args()
+
+    if args.comando == 'semear' and args.arquivo:
+        usuarios, correntistas, movimentacoes = semear_arquivo(
+            args.arquivo, args.usuarios, args.correntistas, args.historico, args.dias, args.semente
+        )
+        print(f"✅ {usuarios} usuário(s), {correntistas} correntista(s), {movimentacoes} movimentação(ões)")
+        print(f"   Inicie a API com ARMAZENAMENTO_BACKEND=memoria ARMAZENAMENTO_MEMORIA_ARQUIVO={args.arquivo}")
+        print(f"   Senha dos usuários bench<N>@{BENCH_DOMINIO}: {BENCH_SENHA}")
+
+    elif args.comando == 'semear':
+        import mysql.connector
+        try:
+            usuarios, correntistas, movimentacoes = semear(
+                args.usuarios, args.correntistas, args.historico, args.dias, args.semente
+            )
+        except mysql.connector.Error as e:
+            print(f"❌ Erro ao semear: {e}")
+            sys.exit(1)
+        print(f"✅ {usuarios} usuário(s), {correntistas} correntista(s), {movimentacoes} movimentação(ões)")
+        print(f"   Senha dos usuários bench<N>@{BENCH_DOMINIO}: {BENCH_SENHA}")
+
+    elif args.comando == 'limpar':
+        import mysql.connector
+        try:
+            usuarios, correntistas = limpar()
+        except mysql.connector.Error as e:
+            print(f"❌ Erro ao limpar: {e}")
+            sys.exit(1)
+        print(f"✅ Removidos {usuarios} usuário(s) e {correntistas} correntista(s) do benchmark")
+
+    elif args.comando == 'executar':
+        print(f"🚀 {args.clientes} clientes HTTP, {args.sockets} sockets, {args.duracao:g}s contra {args.url}\n")
+        try:
+            relatorio = executar(args.url, args.duracao, args.aquecimento, args.clientes, args.sockets,
+                                 args.mix, args.usuarios, args.semente)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        imprimir(relatorio)
+        saida = args.saida or os.path.join(PASTA_RESULTADOS, datetime.now().strftime('%Y%m%d_%H%M%S') + '.json')
+        os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+        with open(saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"\n📄 Relatório: {saida}")
+
+    elif args.comando == 'comparar':
+        with open(args.anterior, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        with open(args.atual, encoding='utf-8') as arquivo:
+            atual = json.load(arquivo)
+        comparar(anterior, atual)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Cache LRU em memória com expiração e contadores de acerto
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """Cache LRU limitado por tamanho, com TTL opcional por entrada"""
+
+    def __init__(self, tamanho_maximo=1024, ttl=None):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._expiradas = 0
+        self._removidas = 0
+
+    def obter(self, chave, padrao=None):
+        """Retorna o valor armazenado ou `padrao` em caso de falha"""
+        with self._lock:
+            entrada = self._dados.get(chave, _AUSENTE)
+            if entrada is _AUSENTE:
+                self._falhas += 1
+                return padrao
+            valor, expira_em = entrada
+            if expira_em is not None and time.monotonic() >= expira_em:
+                del self._dados[chave]
+                self._expiradas += 1
+                self._falhas += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self._acertos += 1
+            return valor
+
+    def definir(self, chave, valor, ttl=None):
+        """Armazena um valor; `ttl` sobrepõe o TTL padrão do cache"""
+        ttl = self.ttl if ttl is None else ttl
+        expira_em = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+                self._removidas += 1
+
+    def invalidar(self, chave):
+        """Remove uma entrada, se existir"""
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+    def estatisticas(self):
+        """Retorna tamanho e contadores de acerto/falha"""
+        with self._lock:
+            consultas = self._acertos + self._falhas
+            return {
+                'tamanho': len(self._dados),
+                'tamanho_maximo': self.tamanho_maximo,
+                'acertos': self._acertos,
+                'falhas': self._falhas,
+                'taxa_acerto': round(self._acertos / consultas, 4) if consultas else 0.0,
+                'expiradas': self._expiradas,
+                'removidas': self._removidas
+            }
+
+
+class VersoesLimitadas:
+    """Versão por chave, para não armazenar no cache o que foi lido durante uma escrita
+
+    Guarda só as `tamanho_maximo` chaves alteradas mais recentemente. Ao
+    descartar uma, a geração avança e toda leitura em andamento deixa de ser
+    armazenada: no pior caso uma falha a mais no cache, nunca um valor velho.
+    Sem lock próprio: use sob o lock de quem a possui.
+    """
+
+    def __init__(self, tamanho_maximo=1024):
+        self.tamanho_maximo = tamanho_maximo
+        self._versoes = OrderedDict()
+        self._geracao = 0
+
+    def atual(self, chave):
+        """Versão a comparar antes de armazenar o que foi lido"""
+        return self._geracao, self._versoes.get(chave, 0)
+
+    def avancar(self, chave):
+        """Marca uma escrita em `chave`"""
+        self._versoes[chave] = self._versoes.get(chave, 0) + 1
+        self._versoes.move_to_end(chave)
+        while len(self._versoes) > self.tamanho_maximo:
+            self._versoes.popitem(last=False)
+            self._geracao += 1
+
+    def limpar(self):
+        self._geracao += 1
+        self._versoes.clear()
+
+    def __len__(self):
+        return len(self._versoes)
@@ -1,9 +1,21 @@
 """
-Script para verificar e criar as stored procedures necessárias
+Script para verificar o schema: stored procedures, índices e planos de execução
+das consultas mais frequentes da API
 """
 import mysql.connector
 from dotenv import load_dotenv
 import os
+from pool_conexoes import get_db_connection
+from datetime import datetime
+from decimal import Decimal
+from migrar import procedures_do_schema
+from extrato import consulta_extrato, consulta_movimentacoes_usuario
+from estatisticas import consulta_estatisticas
+from saldos_diarios import consulta_historico
+from armazenamento import (
+    SQL_USUARIO_POR_EMAIL, SQL_CORRENTISTAS_USUARIO, SQL_IDS_CORRENTISTAS, consulta_bloqueio
+)
+from consultas_lentas import problemas_do_plano
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -11,13 +23,7 @@ load_dotenv()
 def conectar_banco():
     """Conecta ao banco de dados"""
     try:
-        conexao = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'SistemasCorporativos')
-        )
-        return conexao
+        return get_db_connection()
     except mysql.connector.Error as e:
         print(f"Erro ao conectar: {e}")
         return None
@@ -43,7 +49,7 @@ def verificar_procedures():
         for proc in procedures:
             print(f"  - {proc[0]}")
         
-        procedures_necessarias = ['spDepositar', 'spSacar', 'spPagar', 'spTransferir']
+        procedures_necessarias = [nome for nome, _ in procedures_do_schema()]
         procedures_existentes = [proc[0] for proc in procedures]
         
         procedures_faltando = [proc for proc in procedures_necessarias if proc not in procedures_existentes]
@@ -70,121 +76,8 @@ def criar_procedures():
     
     cursor = conexao.cursor()
     
-    procedures = [
-        """
-        CREATE PROCEDURE spDepositar(
-            IN p_CorrentistaID INT,
-            IN p_ValorDeposito DECIMAL(15, 2)
-        )
-        BEGIN
-            -- Inserir movimentação de crédito
-            INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
-            VALUES ('C', p_CorrentistaID, p_ValorDeposito, NOW(), 'Depósito em conta');
-            
-            -- Atualizar saldo do correntista
-            UPDATE Correntistas 
-            SET Saldo = Saldo + p_ValorDeposito 
-            WHERE CorrentistaID = p_CorrentistaID;
-        END
-        """,
-        """
-        CREATE PROCEDURE spSacar(
-            IN p_CorrentistaID INT,
-            IN p_ValorSaque DECIMAL(15, 2)
-        )
-        BEGIN
-            -- Verificar se há saldo suficiente
-            DECLARE saldo_atual DECIMAL(15, 2);
-            SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
-            
-            IF saldo_atual >= p_ValorSaque THEN
-                -- Inserir movimentação de débito
-                INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
-                VALUES ('D', p_CorrentistaID, p_ValorSaque, NOW(), 'Saque');
-                
-                -- Atualizar saldo do correntista
-                UPDATE Correntistas 
-                SET Saldo = Saldo - p_ValorSaque 
-                WHERE CorrentistaID = p_CorrentistaID;
-            ELSE
-                SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o saque';
-            END IF;
-        END
-        """,
-        """
-        CREATE PROCEDURE spPagar(
-            IN p_CorrentistaID INT,
-            IN p_ValorOperacao DECIMAL(15, 2),
-            IN p_Descricao VARCHAR(50)
-        )
-        BEGIN
-            -- Verificar se há saldo suficiente
-            DECLARE saldo_atual DECIMAL(15, 2);
-            SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
-            
-            IF saldo_atual >= p_ValorOperacao THEN
-                -- Inserir movimentação de débito
-                INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
-                VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), CONCAT('Pagamento: ', p_Descricao));
-                
-                -- Atualizar saldo do correntista
-                UPDATE Correntistas 
-                SET Saldo = Saldo - p_ValorOperacao 
-                WHERE CorrentistaID = p_CorrentistaID;
-            ELSE
-                SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o pagamento';
-            END IF;
-        END
-        """,
-        """
-        CREATE PROCEDURE spTransferir(
-            IN p_CorrentistaID INT,
-            IN p_ValorOperacao DECIMAL(15, 2),
-            IN p_CorrentistaBeneficiarioID INT
-        )
-        BEGIN
-            DECLARE saldo_atual DECIMAL(15, 2);
-            DECLARE beneficiario_existe INT DEFAULT 0;
-            
-            -- Verificar se há saldo suficiente
-            SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
-            
-            -- Verificar se o beneficiário existe
-            SELECT COUNT(*) INTO beneficiario_existe FROM Correntistas WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
-            
-            IF beneficiario_existe = 0 THEN
-                SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Correntista beneficiário não encontrado';
-            ELSEIF saldo_atual >= p_ValorOperacao THEN
-                -- Débito do pagador
-                INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
-                VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), 'Transferência', p_CorrentistaBeneficiarioID);
-                
-                -- Crédito do beneficiário
-                INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
-                VALUES ('C', p_CorrentistaBeneficiarioID, p_ValorOperacao, NOW(), 'Transferência recebida', p_CorrentistaID);
-                
-                -- Atualizar saldo do pagador
-                UPDATE Correntistas 
-                SET Saldo = Saldo - p_ValorOperacao 
-                WHERE CorrentistaID = p_CorrentistaID;
-                
-                -- Atualizar saldo do beneficiário
-                UPDATE Correntistas 
-                SET Saldo = Saldo + p_ValorOperacao 
-                WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
-            ELSE
-                SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar a transferência';
-            END IF;
-        END
-        """
-    ]
-    
-    procedure_names = ['spDepositar', 'spSacar', 'spPagar', 'spTransferir']
-    
     try:
-        for i, procedure_sql in enumerate(procedures):
-            procedure_name = procedure_names[i]
-            
+        for procedure_name, procedure_sql in procedures_do_schema():
             # Remover procedure se existir
             cursor.execute(f"DROP PROCEDURE IF EXISTS {procedure_name}")
             print(f"Removendo procedure existente: {procedure_name}")
@@ -205,8 +98,132 @@ def criar_procedures():
         cursor.close()
         conexao.close()
 
+# Índices esperados: (tabela, colunas iniciais, migração que os cria)
+INDICES_NECESSARIOS = [
+    ('Movimentacoes', ('CorrentistaID', 'DataOperacao', 'MovimentacaoID'), '003_indices'),
+    ('Movimentacoes', ('CorrentistaID', 'TipoOperacao', 'DataOperacao', 'MovimentacaoID', 'ValorOperacao'),
+     '004_indice_tipo_ordenado'),
+    ('Correntistas', ('UsuarioID', 'CorrentistaID'), '003_indices'),
+    ('Usuarios', ('Email',), 'SistemasCorporativos.sql'),
+    ('SaldosDiarios', ('CorrentistaID', 'Data'), '002_saldos_diarios'),
+    ('ExtratoMovimentacoes', ('CorrentistaID', 'DataOperacao', 'MovimentacaoID'), '005_extrato_desnormalizado'),
+    ('ExtratoMovimentacoes', ('UsuarioID', 'DataOperacao', 'MovimentacaoID'), '005_extrato_desnormalizado'),
+]
+
+# Consultas das rotas da API: (rota, função que recebe UsuarioID e CorrentistaID e retorna (sql, params))
+CURSOR_EXEMPLO = (datetime(2100, 1, 1), 2147483647)
+FILTROS_EXEMPLO = {
+    'inicio': datetime(2000, 1, 1), 'fim': datetime(2100, 1, 1),
+    'tipo': 'C', 'valor_min': Decimal('0.01'), 'valor_max': Decimal('1000000')
+}
+
+# Montadas pelas mesmas funções e constantes que a API usa, para o plano verificado ser o de produção
+CONSULTAS_QUENTES = [
+    ('/login', lambda u, c: (SQL_USUARIO_POR_EMAIL, ('admin@teste.com',))),
+    ('/correntistas', lambda u, c: (SQL_CORRENTISTAS_USUARIO, (u,))),
+    ('índice de propriedade', lambda u, c: (SQL_IDS_CORRENTISTAS, (u,))),
+    ('/extrato/<id> e /movimentacoes', lambda u, c: consulta_extrato(c, limite=50, desnormalizado=False)),
+    ('/extrato/<id> e /movimentacoes (com cursor)',
+     lambda u, c: consulta_extrato(c, cursor_pagina=CURSOR_EXEMPLO, limite=50, desnormalizado=False)),
+    ('/extrato/<id> e /movimentacoes (com filtros)',
+     lambda u, c: consulta_extrato(c, FILTROS_EXEMPLO, limite=50, desnormalizado=False)),
+    ('/extrato/<id>/exportar', lambda u, c: consulta_extrato(c, desnormalizado=False)),
+    ('/extrato/<id> (desnormalizado)', lambda u, c: consulta_extrato(c, limite=50, desnormalizado=True)),
+    ('/extrato/<id> (desnormalizado, com filtros)',
+     lambda u, c: consulta_extrato(c, FILTROS_EXEMPLO, CURSOR_EXEMPLO, 50, desnormalizado=True)),
+    ('/movimentacoes (desnormalizado)', lambda u, c: consulta_movimentacoes_usuario(u, limite=50)),
+    ('/estatisticas', lambda u, c: consulta_estatisticas(u)),
+    ('/estatisticas (com período)',
+     lambda u, c: consulta_estatisticas(u, FILTROS_EXEMPLO['inicio'], FILTROS_EXEMPLO['fim'])),
+    ('/saldo/historico', lambda u, c: consulta_historico([c])),
+    ('/saldo/historico (com período)',
+     lambda u, c: consulta_historico([c], FILTROS_EXEMPLO['inicio'], FILTROS_EXEMPLO['fim'])),
+    ('operações (bloqueio das contas)', lambda u, c: consulta_bloqueio([c])),
+]
+
+
+def verificar_indices(cursor):
+    """Retorna a lista de índices esperados que não existem"""
+    cursor.execute("""
+        SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """, (os.getenv('DB_NAME', 'SistemasCorporativos'),))
+
+    existentes = {}
+    for linha in cursor.fetchall():
+        existentes.setdefault((linha['TABLE_NAME'], linha['INDEX_NAME']), []).append(linha['COLUMN_NAME'])
+
+    faltando = []
+    for tabela, colunas, origem in INDICES_NECESSARIOS:
+        atendido = any(
+            t == tabela and tuple(cols[:len(colunas)]) == colunas
+            for (t, _), cols in existentes.items()
+        )
+        print(f"  {'✅' if atendido else '❌'} {tabela} ({', '.join(colunas)})")
+        if not atendido:
+            faltando.append(f"{tabela} ({', '.join(colunas)}) - aplicar {origem}")
+    return faltando
+
+
+def verificar_planos(cursor):
+    """Executa EXPLAIN nas consultas quentes e retorna as que degradaram"""
+    # Usar um correntista real para que o otimizador veja dados representativos
+    cursor.execute("""
+        SELECT c.UsuarioID, c.CorrentistaID
+        FROM Correntistas c
+        WHERE c.UsuarioID IS NOT NULL
+        ORDER BY (SELECT COUNT(*) FROM Movimentacoes m WHERE m.CorrentistaID = c.CorrentistaID) DESC
+        LIMIT 1
+    """)
+    exemplo = cursor.fetchone()
+    usuario_id, correntista_id = (exemplo['UsuarioID'], exemplo['CorrentistaID']) if exemplo else (1, 1)
+
+    degradadas = []
+    for rota, consulta in CONSULTAS_QUENTES:
+        sql, params = consulta(usuario_id, correntista_id)
+        cursor.execute("EXPLAIN " + sql, params)
+        problemas = problemas_do_plano(cursor.fetchall())
+        print(f"  {'❌' if problemas else '✅'} {rota}")
+        for problema in problemas:
+            print(f"      - {problema}")
+        if problemas:
+            degradadas.append(rota)
+    return degradadas
+
+
+def verificar_schema():
+    """Confere índices e planos; retorna True se estiver tudo certo"""
+    conexao = conectar_banco()
+    if not conexao:
+        return False
+
+    cursor = conexao.cursor(dictionary=True)
+    try:
+        print("\nÍndices:")
+        faltando = verificar_indices(cursor)
+
+        print("\nPlanos de execução:")
+        degradadas = verificar_planos(cursor)
+
+        if faltando:
+            print(f"\nÍndices faltando: {faltando}")
+            print("Execute: python migrar.py")
+        if degradadas:
+            print(f"\nConsultas com varredura completa ou filesort: {degradadas}")
+            print("Em tabelas quase vazias o otimizador pode preferir varreduras; verifique com dados representativos.")
+        return not faltando and not degradadas
+
+    except mysql.connector.Error as e:
+        print(f"Erro ao verificar schema: {e}")
+        return False
+    finally:
+        cursor.close()
+        conexao.close()
+
 if __name__ == "__main__":
-    print("=== Verificador e Criador de Stored Procedures ===\n")
+    print("=== Verificador do Schema (procedures, índices e planos) ===\n")
     
     procedures_faltando = verificar_procedures()
     
@@ -221,4 +238,9 @@ if __name__ == "__main__":
         else:
             print("Operação cancelada.")
     else:
-        print("\n✅ Sistema está funcionando corretamente!")
\ No newline at end of file
+        print("\n✅ Procedures conferidas!")
+
+    if not verificar_schema():
+        print("\n❌ Schema com problemas de índices ou planos de execução.")
+        exit(1)
+    print("\n✅ Índices e planos de execução conferidos!")
@@ -0,0 +1,278 @@
+"""
+Registro das consultas lentas, com o plano de execução capturado na primeira vez
+
+Os cursores do pool medem cada execute/executemany/callproc. O que passa de
+CONSULTA_LENTA_MS é registrado com o SQL normalizado (literais e marcadores
+viram ?), o formato dos parâmetros (tipos, nunca os valores), as linhas
+afetadas ou lidas e a rota que chamou. Na primeira ocorrência de cada SQL
+normalizado roda um EXPLAIN em uma conexão própria. O EXPLAIN e a escrita no
+arquivo ficam em um thread separado, fora do caminho da requisição.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import mysql.connector
+
+CONSULTA_LENTA_MS = float(os.getenv('CONSULTA_LENTA_MS', '200'))
+CONSULTA_LENTA_ARQUIVO = os.getenv('CONSULTA_LENTA_ARQUIVO', os.path.join('logs', 'consultas_lentas.log'))
+CONSULTA_LENTA_ARQUIVO_MB = float(os.getenv('CONSULTA_LENTA_ARQUIVO_MB', '10'))
+CONSULTA_LENTA_ARQUIVOS = int(os.getenv('CONSULTA_LENTA_ARQUIVOS', '5'))
+CONSULTA_LENTA_EXPLAIN = os.getenv('CONSULTA_LENTA_EXPLAIN', 'true').lower() in ('1', 'true', 'sim', 'yes')
+CONSULTA_LENTA_RECENTES = int(os.getenv('CONSULTA_LENTA_RECENTES', '200'))
+CONSULTA_LENTA_FILA = 1000
+
+ORDENACOES = ('total', 'max', 'ocorrencias', 'recentes')
+
+logger = logging.getLogger(__name__)
+
+_RE_TEXTO = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_RE_MARCADOR = re.compile(r'%\(\w+\)s|%s')
+_RE_NUMERO = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_RE_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_ESPACOS = re.compile(r'\s+')
+
+# Comandos aceitos pelo EXPLAIN; CALL não tem plano
+_EXPLICAVEIS = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+
+def normalizar_sql(sql):
+    """SQL sem literais e com espaços e listas IN (...) colapsados"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _RE_TEXTO.sub('?', sql)
+    sql = _RE_MARCADOR.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_ESPACOS.sub(' ', sql).strip()
+    return _RE_LISTA.sub('(?+)', sql)
+
+
+def _tipo(valor):
+    return 'null' if valor is None else type(valor).__name__
+
+
+def formato_parametros(params):
+    """Tipos dos parâmetros, com repetições agrupadas (ex.: ['int', 'datetime×2'])"""
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {nome: _tipo(valor) for nome, valor in params.items()}
+    tipos = []
+    for valor in params:
+        tipo = _tipo(valor)
+        if tipos and tipos[-1][0] == tipo:
+            tipos[-1][1] += 1
+        else:
+            tipos.append([tipo, 1])
+    return [tipo if quantidade == 1 else f'{tipo}×{quantidade}' for tipo, quantidade in tipos]
+
+
+def problemas_do_plano(plano):
+    """Lista varreduras completas e ordenações em arquivo de um EXPLAIN"""
+    problemas = []
+    for linha in plano:
+        tabela = linha.get('table') or '-'
+        extra = linha.get('Extra') or ''
+        if linha.get('type') == 'ALL':
+            problemas.append(f"varredura completa em {tabela}")
+        elif linha.get('type') == 'index':
+            problemas.append(f"varredura completa do índice {linha.get('key')} em {tabela}")
+        if 'Using filesort' in extra:
+            problemas.append(f"filesort em {tabela}")
+    return problemas
+
+
+class _Consulta:
+    __slots__ = ('sql', 'tipo', 'ocorrencias', 'total_ms', 'max_ms', 'ultima', 'rotas', 'plano', 'problemas')
+
+    def __init__(self, sql, tipo):
+        self.sql = sql
+        self.tipo = tipo
+        self.ocorrencias = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.ultima = None
+        self.rotas = {}
+        self.plano = None
+        self.problemas = []
+
+    def resumo(self, impressao):
+        return {
+            'impressao': impressao,
+            'sql': self.sql,
+            'tipo': self.tipo,
+            'ocorrencias': self.ocorrencias,
+            'total_ms': round(self.total_ms, 3),
+            'media_ms': round(self.total_ms / self.ocorrencias, 3) if self.ocorrencias else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'ultima': self.ultima,
+            'rotas': dict(self.rotas),
+            'plano': self.plano,
+            'problemas': self.problemas
+        }
+
+
+class RegistroConsultasLentas:
+    """Agrega as consultas lentas por SQL normalizado e grava cada ocorrência em log rotativo"""
+
+    def __init__(self, limite_ms=CONSULTA_LENTA_MS, arquivo=CONSULTA_LENTA_ARQUIVO, explain=CONSULTA_LENTA_EXPLAIN,
+                 recentes=CONSULTA_LENTA_RECENTES):
+        self.limite = limite_ms / 1000
+        self.ativo = limite_ms > 0
+        self.arquivo = arquivo
+        self.explain = explain
+        self._fila = queue.Queue(CONSULTA_LENTA_FILA)
+        self._lock = threading.Lock()
+        self._consultas = {}
+        self._recentes = deque(maxlen=recentes)
+        self._descartadas = 0
+        self._thread = None
+        self._log = None
+        self._conexao_explain = None
+
+    def registrar(self, tipo, operacao, params, duracao, linhas, rota):
+        """Chamado pelo cursor; só enfileira, o resto acontece no thread do registro"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._executar, name='consultas-lentas', daemon=True)
+                    self._thread.start()
+        try:
+            self._fila.put_nowait((tipo, operacao, params, duracao, linhas, rota, datetime.now()))
+        except queue.Full:
+            with self._lock:
+                self._descartadas += 1
+
+    def _executar(self):
+        while True:
+            item = self._fila.get()
+            try:
+                self._processar(*item)
+            except Exception:
+                logger.exception('Falha ao registrar consulta lenta')
+
+    def _processar(self, tipo, operacao, params, duracao, linhas, rota, momento):
+        if tipo == 'callproc':
+            sql = f"CALL {operacao}({', '.join('?' * len(params or ()))})"
+            lote = None
+        else:
+            sql = normalizar_sql(operacao)
+            lote = len(params) if tipo == 'executemany' and params is not None else None
+            params = params[0] if lote else params
+        impressao = hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]
+        duracao_ms = duracao * 1000
+
+        with self._lock:
+            consulta = self._consultas.get(impressao)
+            primeira = consulta is None
+            if primeira:
+                consulta = self._consultas[impressao] = _Consulta(sql, tipo)
+            consulta.ocorrencias += 1
+            consulta.total_ms += duracao_ms
+            consulta.max_ms = max(consulta.max_ms, duracao_ms)
+            consulta.ultima = momento.isoformat(timespec='milliseconds')
+            consulta.rotas[rota] = consulta.rotas.get(rota, 0) + 1
+
+        plano = None
+        if primeira and self.explain and tipo != 'callproc':
+            plano = self._explicar(operacao, params)
+            with self._lock:
+                consulta.plano = plano
+                consulta.problemas = problemas_do_plano(plano) if plano else []
+
+        registro = {
+            'data': momento.isoformat(timespec='milliseconds'),
+            'impressao': impressao,
+            'duracao_ms': round(duracao_ms, 3),
+            'rota': rota,
+            'tipo': tipo,
+            'sql': sql,
+            'parametros': formato_parametros(params),
+            'linhas': linhas
+        }
+        if lote is not None:
+            registro['lote'] = lote
+        if plano is not None:
+            registro['plano'] = plano
+            registro['problemas'] = consulta.problemas
+        with self._lock:
+            self._recentes.append(registro)
+        self._gravar(registro)
+
+    def _explicar(self, operacao, params):
+        """EXPLAIN com os mesmos parâmetros, em uma conexão fora do pool"""
+        texto = operacao.decode('utf-8', 'replace') if isinstance(operacao, (bytes, bytearray)) else operacao
+        if not texto.lstrip().upper().startswith(_EXPLICAVEIS):
+            return None
+        try:
+            if self._conexao_explain is None or not self._conexao_explain.is_connected():
+                from pool_conexoes import obter_pool
+                self._conexao_explain = mysql.connector.connect(**obter_pool().params_conexao)
+            cursor = self._conexao_explain.cursor(dictionary=True)
+            try:
+                cursor.execute('EXPLAIN ' + texto, params)
+                plano = cursor.fetchall()
+            finally:
+                cursor.close()
+                self._conexao_explain.rollback()
+        except mysql.connector.Error as ex:
+            return [{'erro': str(ex)}]
+        return [{chave: _json(valor) for chave, valor in linha.items()} for linha in plano]
+
+    def _gravar(self, registro):
+        if not self.arquivo:
+            return
+        if self._log is None:
+            pasta = os.path.dirname(os.path.abspath(self.arquivo))
+            os.makedirs(pasta, exist_ok=True)
+            self._log = RotatingFileHandler(
+                self.arquivo, maxBytes=int(CONSULTA_LENTA_ARQUIVO_MB * 1024 * 1024),
+                backupCount=CONSULTA_LENTA_ARQUIVOS, encoding='utf-8'
+            )
+        self._log.emit(logging.makeLogRecord({'msg': json.dumps(registro, ensure_ascii=False), 'args': None}))
+
+    def consultar(self, ordenar='total', limite=50):
+        """Consultas agregadas (por total, máximo, ocorrências ou mais recentes) e as últimas ocorrências"""
+        chaves = {
+            'total': lambda item: item[1].total_ms,
+            'max': lambda item: item[1].max_ms,
+            'ocorrencias': lambda item: item[1].ocorrencias,
+            'recentes': lambda item: item[1].ultima,
+        }
+        with self._lock:
+            ordenadas = sorted(self._consultas.items(), key=chaves[ordenar], reverse=True)[:limite]
+            return {
+                'limite_ms': round(self.limite * 1000, 3),
+                'consultas': [consulta.resumo(impressao) for impressao, consulta in ordenadas],
+                'recentes': list(self._recentes)[-limite:][::-1],
+                'descartadas': self._descartadas
+            }
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'ativo': self.ativo,
+                'limite_ms': round(self.limite * 1000, 3),
+                'consultas_distintas': len(self._consultas),
+                'ocorrencias': sum(consulta.ocorrencias for consulta in self._consultas.values()),
+                'pendentes': self._fila.qsize(),
+                'descartadas': self._descartadas
+            }
+
+
+def _json(valor):
+    if valor is None or isinstance(valor, (int, float, str)):
+        return valor
+    if isinstance(valor, (bytes, bytearray)):
+        return valor.decode('utf-8', 'replace')
+    return str(valor)
+
+
+consultas_lentas = RegistroConsultasLentas()
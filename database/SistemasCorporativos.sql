@@ -27,6 +27,38 @@ CREATE TABLE Movimentacoes (
     CONSTRAINT CK_Movimentacoes_ValorOperacao CHECK (ValorOperacao > 0)
 );
 
+-- Criar a Tabela 'SaldosDiarios' (consolidação diária por correntista)
+CREATE TABLE SaldosDiarios (
+    CorrentistaID INT NOT NULL,
+    Data DATE NOT NULL,
+    TotalCreditos DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    TotalDebitos DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    Quantidade INT NOT NULL DEFAULT 0,
+    SaldoFechamento DECIMAL(15, 2) NOT NULL,
+    CONSTRAINT PK_SaldosDiarios PRIMARY KEY (CorrentistaID, Data),
+    CONSTRAINT FK_SaldosDiarios_Correntistas FOREIGN KEY (CorrentistaID) REFERENCES Correntistas (CorrentistaID)
+);
+
+-- Criar a Tabela 'ExtratoMovimentacoes' (extrato desnormalizado para leitura)
+-- Mantida pelas procedures na mesma transação de Movimentacoes
+CREATE TABLE ExtratoMovimentacoes (
+    MovimentacaoID INT NOT NULL,
+    UsuarioID INT NULL,
+    CorrentistaID INT NOT NULL,
+    NomeCorrentista VARCHAR(50) NOT NULL,
+    TipoOperacao CHAR(1) NOT NULL,
+    ValorOperacao DECIMAL(15, 2) NOT NULL,
+    ValorAssinado DECIMAL(15, 2) NOT NULL,
+    DataOperacao DATETIME NOT NULL,
+    Descricao VARCHAR(50) NOT NULL,
+    BeneficiarioID INT NULL,
+    NomeBeneficiario VARCHAR(50) NULL,
+    CONSTRAINT PK_ExtratoMovimentacoes PRIMARY KEY (MovimentacaoID),
+    INDEX IX_ExtratoMovimentacoes_Correntista_Data (CorrentistaID, DataOperacao, MovimentacaoID),
+    INDEX IX_ExtratoMovimentacoes_Correntista_Tipo_Data (CorrentistaID, TipoOperacao, DataOperacao, MovimentacaoID),
+    INDEX IX_ExtratoMovimentacoes_Usuario_Data (UsuarioID, DataOperacao, MovimentacaoID)
+);
+
 -- Criar a View 'vwExtrato'
 CREATE VIEW vwExtrato AS
 SELECT
@@ -51,20 +83,91 @@ LEFT JOIN Correntistas AS B
 -- Criar os Procedures com validações de saldo e atualização automática
 -- O MySQL usa a sintaxe DELIMITER para procedures
 
+DELIMITER $$
+CREATE PROCEDURE spAtualizarSaldoDiario(
+    IN p_CorrentistaID INT,
+    IN p_Creditos DECIMAL(15, 2),
+    IN p_Debitos DECIMAL(15, 2)
+)
+BEGIN
+    -- Acumular o dia corrente com o saldo já atualizado do correntista
+    INSERT INTO SaldosDiarios (CorrentistaID, Data, TotalCreditos, TotalDebitos, Quantidade, SaldoFechamento)
+    SELECT CorrentistaID, CURDATE(), p_Creditos, p_Debitos, 1, Saldo
+    FROM Correntistas
+    WHERE CorrentistaID = p_CorrentistaID
+    ON DUPLICATE KEY UPDATE
+        TotalCreditos = TotalCreditos + VALUES(TotalCreditos),
+        TotalDebitos = TotalDebitos + VALUES(TotalDebitos),
+        Quantidade = Quantidade + 1,
+        SaldoFechamento = VALUES(SaldoFechamento);
+END$$
+DELIMITER ;
+
+DELIMITER $$
+CREATE PROCEDURE spRegistrarExtrato(
+    IN p_MovimentacaoID INT
+)
+BEGIN
+    -- Copiar a movimentação com os nomes e o dono já resolvidos
+    INSERT INTO ExtratoMovimentacoes (MovimentacaoID, UsuarioID, CorrentistaID, NomeCorrentista, TipoOperacao,
+        ValorOperacao, ValorAssinado, DataOperacao, Descricao, BeneficiarioID, NomeBeneficiario)
+    SELECT M.MovimentacaoID, C.UsuarioID, C.CorrentistaID, C.NomeCorrentista, M.TipoOperacao,
+        M.ValorOperacao,
+        CASE M.TipoOperacao WHEN 'C' THEN M.ValorOperacao ELSE -M.ValorOperacao END,
+        M.DataOperacao, M.Descricao, B.CorrentistaID, B.NomeCorrentista
+    FROM Movimentacoes AS M
+    INNER JOIN Correntistas AS C
+      ON C.CorrentistaID = M.CorrentistaID
+    LEFT JOIN Correntistas AS B
+      ON B.CorrentistaID = M.CorrentistaBeneficiarioID
+    WHERE M.MovimentacaoID = p_MovimentacaoID;
+END$$
+DELIMITER ;
+
+DELIMITER $$
+CREATE PROCEDURE spRetornarMovimentacoes(
+    IN p_MovimentacaoID INT,
+    IN p_MovimentacaoBeneficiarioID INT
+)
+BEGIN
+    -- Devolver as linhas novas do extrato com o saldo resultante de cada conta
+    SELECT E.UsuarioID, E.CorrentistaID, E.NomeCorrentista,
+        CASE E.TipoOperacao WHEN 'C' THEN 'Crédito' ELSE 'Débito' END AS TipoOperacao,
+        E.MovimentacaoID, E.Descricao, E.DataOperacao, E.ValorOperacao,
+        E.BeneficiarioID, E.NomeBeneficiario, C.Saldo
+    FROM ExtratoMovimentacoes AS E
+    INNER JOIN Correntistas AS C
+      ON C.CorrentistaID = E.CorrentistaID
+    WHERE E.MovimentacaoID IN (p_MovimentacaoID, p_MovimentacaoBeneficiarioID)
+    ORDER BY E.MovimentacaoID;
+END$$
+DELIMITER ;
+
 DELIMITER $$
 CREATE PROCEDURE spDepositar(
     IN p_CorrentistaID INT,
     IN p_ValorDeposito DECIMAL(15, 2)
 )
 BEGIN
+    DECLARE movimentacao_id INT;
+    
     -- Inserir movimentação de crédito
     INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
     VALUES ('C', p_CorrentistaID, p_ValorDeposito, NOW(), 'Depósito em conta');
+    SET movimentacao_id = LAST_INSERT_ID();
+    -- Registrar no extrato de leitura
+    CALL spRegistrarExtrato(movimentacao_id);
     
     -- Atualizar saldo do correntista
     UPDATE Correntistas 
     SET Saldo = Saldo + p_ValorDeposito 
     WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Atualizar consolidação diária
+    CALL spAtualizarSaldoDiario(p_CorrentistaID, p_ValorDeposito, 0);
+    
+    -- Devolver a movimentação e o novo saldo
+    CALL spRetornarMovimentacoes(movimentacao_id, NULL);
 END$$
 DELIMITER ;
 
@@ -76,17 +179,27 @@ CREATE PROCEDURE spSacar(
 BEGIN
     -- Verificar se há saldo suficiente
     DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE movimentacao_id INT;
     SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
     
     IF saldo_atual >= p_ValorSaque THEN
         -- Inserir movimentação de débito
         INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
         VALUES ('D', p_CorrentistaID, p_ValorSaque, NOW(), 'Saque');
+        SET movimentacao_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_id);
         
         -- Atualizar saldo do correntista
         UPDATE Correntistas 
         SET Saldo = Saldo - p_ValorSaque 
         WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorSaque);
+        
+        -- Devolver a movimentação e o novo saldo
+        CALL spRetornarMovimentacoes(movimentacao_id, NULL);
     ELSE
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o saque';
     END IF;
@@ -102,17 +215,27 @@ CREATE PROCEDURE spPagar(
 BEGIN
     -- Verificar se há saldo suficiente
     DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE movimentacao_id INT;
     SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
     
     IF saldo_atual >= p_ValorOperacao THEN
         -- Inserir movimentação de débito
         INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
         VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), CONCAT('Pagamento: ', p_Descricao));
+        SET movimentacao_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_id);
         
         -- Atualizar saldo do correntista
         UPDATE Correntistas 
         SET Saldo = Saldo - p_ValorOperacao 
         WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+        
+        -- Devolver a movimentação e o novo saldo
+        CALL spRetornarMovimentacoes(movimentacao_id, NULL);
     ELSE
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o pagamento';
     END IF;
@@ -128,6 +251,8 @@ CREATE PROCEDURE spTransferir(
 BEGIN
     DECLARE saldo_atual DECIMAL(15, 2);
     DECLARE beneficiario_existe INT DEFAULT 0;
+    DECLARE movimentacao_id INT;
+    DECLARE movimentacao_beneficiario_id INT;
     
     -- Verificar se há saldo suficiente
     SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
@@ -141,10 +266,16 @@ BEGIN
         -- Débito do pagador
         INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
         VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), 'Transferência', p_CorrentistaBeneficiarioID);
+        SET movimentacao_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_id);
         
         -- Crédito do beneficiário
         INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
         VALUES ('C', p_CorrentistaBeneficiarioID, p_ValorOperacao, NOW(), 'Transferência recebida', p_CorrentistaID);
+        SET movimentacao_beneficiario_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_beneficiario_id);
         
         -- Atualizar saldo do pagador
         UPDATE Correntistas 
@@ -155,6 +286,13 @@ BEGIN
         UPDATE Correntistas 
         SET Saldo = Saldo + p_ValorOperacao 
         WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+        
+        -- Atualizar consolidação diária das duas contas
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+        CALL spAtualizarSaldoDiario(p_CorrentistaBeneficiarioID, p_ValorOperacao, 0);
+        
+        -- Devolver as duas movimentações e os novos saldos
+        CALL spRetornarMovimentacoes(movimentacao_id, movimentacao_beneficiario_id);
     ELSE
         SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar a transferência';
     END IF;
@@ -183,4 +321,53 @@ ALTER TABLE Correntistas ADD CONSTRAINT FK_Correntistas_Usuarios FOREIGN KEY (Us
 -- Inserir correntistas de exemplo vinculados ao usuário admin
 INSERT INTO Correntistas (NomeCorrentista, Saldo, UsuarioID) VALUES 
 ('João Silva', 1000.00, 1),
-('Maria Santos', 1500.00, 1);
\ No newline at end of file
+('Maria Santos', 1500.00, 1);
+
+-- Criar os índices das consultas mais frequentes da API
+-- (Usuarios por Email já é atendido pela restrição UNIQUE da coluna)
+CREATE INDEX IX_Movimentacoes_Correntista_Data
+    ON Movimentacoes (CorrentistaID, DataOperacao, MovimentacaoID);
+CREATE INDEX IX_Movimentacoes_Correntista_Tipo_Data
+    ON Movimentacoes (CorrentistaID, TipoOperacao, DataOperacao, MovimentacaoID, ValorOperacao);
+CREATE INDEX IX_Correntistas_Usuario
+    ON Correntistas (UsuarioID, CorrentistaID);
+
+-- Criar a Tabela 'ChavesIdempotencia' (usada com IDEMPOTENCIA_BACKEND=mysql)
+CREATE TABLE ChavesIdempotencia (
+    UsuarioID INT NOT NULL,
+    Chave VARCHAR(100) NOT NULL,
+    Impressao CHAR(64) NOT NULL,
+    Status SMALLINT NULL,
+    Resposta TEXT NULL,
+    DataCriacao DATETIME NOT NULL,
+    ExpiraEm DATETIME NOT NULL,
+    CONSTRAINT PK_ChavesIdempotencia PRIMARY KEY (UsuarioID, Chave),
+    CONSTRAINT FK_ChavesIdempotencia_Usuarios FOREIGN KEY (UsuarioID) REFERENCES Usuarios (UsuarioID)
+);
+
+-- Criar a Tabela 'MotorSaldos' (usada com ARMAZENAMENTO_BACKEND=motor)
+CREATE TABLE MotorSaldos (
+    MotorID TINYINT NOT NULL,
+    Sequencia BIGINT NOT NULL,
+    DataAtualizacao DATETIME NOT NULL,
+    CONSTRAINT PK_MotorSaldos PRIMARY KEY (MotorID)
+);
+
+INSERT INTO MotorSaldos (MotorID, Sequencia, DataAtualizacao) VALUES (1, 0, NOW());
+
+-- Criar a Tabela 'MigracoesAplicadas' (controle do migrar.py)
+-- Um banco criado por este script já contém todas as migrações de database/migracoes
+CREATE TABLE MigracoesAplicadas (
+    Versao VARCHAR(100) NOT NULL,
+    DataAplicacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT PK_MigracoesAplicadas PRIMARY KEY (Versao)
+);
+
+INSERT INTO MigracoesAplicadas (Versao) VALUES
+('001_chaves_idempotencia'),
+('002_saldos_diarios'),
+('003_indices'),
+('004_indice_tipo_ordenado'),
+('005_extrato_desnormalizado'),
+('006_retorno_operacoes'),
+('007_motor_saldos');
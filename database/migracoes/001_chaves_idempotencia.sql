@@ -0,0 +1,12 @@
+-- Tabela de Idempotency-Key (IDEMPOTENCIA_BACKEND=mysql)
+CREATE TABLE IF NOT EXISTS ChavesIdempotencia (
+    UsuarioID INT NOT NULL,
+    Chave VARCHAR(100) NOT NULL,
+    Impressao CHAR(64) NOT NULL,
+    Status SMALLINT NULL,
+    Resposta TEXT NULL,
+    DataCriacao DATETIME NOT NULL,
+    ExpiraEm DATETIME NOT NULL,
+    CONSTRAINT PK_ChavesIdempotencia PRIMARY KEY (UsuarioID, Chave),
+    CONSTRAINT FK_ChavesIdempotencia_Usuarios FOREIGN KEY (UsuarioID) REFERENCES Usuarios (UsuarioID)
+);
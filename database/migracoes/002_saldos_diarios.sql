@@ -0,0 +1,166 @@
+-- Consolidação diária de saldos mantida pelas procedures
+CREATE TABLE IF NOT EXISTS SaldosDiarios (
+    CorrentistaID INT NOT NULL,
+    Data DATE NOT NULL,
+    TotalCreditos DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    TotalDebitos DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    Quantidade INT NOT NULL DEFAULT 0,
+    SaldoFechamento DECIMAL(15, 2) NOT NULL,
+    CONSTRAINT PK_SaldosDiarios PRIMARY KEY (CorrentistaID, Data),
+    CONSTRAINT FK_SaldosDiarios_Correntistas FOREIGN KEY (CorrentistaID) REFERENCES Correntistas (CorrentistaID)
+);
+
+DROP PROCEDURE IF EXISTS spAtualizarSaldoDiario;
+
+DELIMITER $$
+CREATE PROCEDURE spAtualizarSaldoDiario(
+    IN p_CorrentistaID INT,
+    IN p_Creditos DECIMAL(15, 2),
+    IN p_Debitos DECIMAL(15, 2)
+)
+BEGIN
+    -- Acumular o dia corrente com o saldo já atualizado do correntista
+    INSERT INTO SaldosDiarios (CorrentistaID, Data, TotalCreditos, TotalDebitos, Quantidade, SaldoFechamento)
+    SELECT CorrentistaID, CURDATE(), p_Creditos, p_Debitos, 1, Saldo
+    FROM Correntistas
+    WHERE CorrentistaID = p_CorrentistaID
+    ON DUPLICATE KEY UPDATE
+        TotalCreditos = TotalCreditos + VALUES(TotalCreditos),
+        TotalDebitos = TotalDebitos + VALUES(TotalDebitos),
+        Quantidade = Quantidade + 1,
+        SaldoFechamento = VALUES(SaldoFechamento);
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spDepositar;
+
+DELIMITER $$
+CREATE PROCEDURE spDepositar(
+    IN p_CorrentistaID INT,
+    IN p_ValorDeposito DECIMAL(15, 2)
+)
+BEGIN
+    -- Inserir movimentação de crédito
+    INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+    VALUES ('C', p_CorrentistaID, p_ValorDeposito, NOW(), 'Depósito em conta');
+    
+    -- Atualizar saldo do correntista
+    UPDATE Correntistas 
+    SET Saldo = Saldo + p_ValorDeposito 
+    WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Atualizar consolidação diária
+    CALL spAtualizarSaldoDiario(p_CorrentistaID, p_ValorDeposito, 0);
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spSacar;
+
+DELIMITER $$
+CREATE PROCEDURE spSacar(
+    IN p_CorrentistaID INT,
+    IN p_ValorSaque DECIMAL(15, 2)
+)
+BEGIN
+    -- Verificar se há saldo suficiente
+    DECLARE saldo_atual DECIMAL(15, 2);
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    IF saldo_atual >= p_ValorSaque THEN
+        -- Inserir movimentação de débito
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+        VALUES ('D', p_CorrentistaID, p_ValorSaque, NOW(), 'Saque');
+        
+        -- Atualizar saldo do correntista
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorSaque 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorSaque);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o saque';
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spPagar;
+
+DELIMITER $$
+CREATE PROCEDURE spPagar(
+    IN p_CorrentistaID INT,
+    IN p_ValorOperacao DECIMAL(15, 2),
+    IN p_Descricao VARCHAR(50)
+)
+BEGIN
+    -- Verificar se há saldo suficiente
+    DECLARE saldo_atual DECIMAL(15, 2);
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    IF saldo_atual >= p_ValorOperacao THEN
+        -- Inserir movimentação de débito
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+        VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), CONCAT('Pagamento: ', p_Descricao));
+        
+        -- Atualizar saldo do correntista
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o pagamento';
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spTransferir;
+
+DELIMITER $$
+CREATE PROCEDURE spTransferir(
+    IN p_CorrentistaID INT,
+    IN p_ValorOperacao DECIMAL(15, 2),
+    IN p_CorrentistaBeneficiarioID INT
+)
+BEGIN
+    DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE beneficiario_existe INT DEFAULT 0;
+    
+    -- Verificar se há saldo suficiente
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Verificar se o beneficiário existe
+    SELECT COUNT(*) INTO beneficiario_existe FROM Correntistas WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+    
+    IF beneficiario_existe = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Correntista beneficiário não encontrado';
+    ELSEIF saldo_atual >= p_ValorOperacao THEN
+        -- Débito do pagador
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
+        VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), 'Transferência', p_CorrentistaBeneficiarioID);
+        
+        -- Crédito do beneficiário
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
+        VALUES ('C', p_CorrentistaBeneficiarioID, p_ValorOperacao, NOW(), 'Transferência recebida', p_CorrentistaID);
+        
+        -- Atualizar saldo do pagador
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar saldo do beneficiário
+        UPDATE Correntistas 
+        SET Saldo = Saldo + p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+        
+        -- Atualizar consolidação diária das duas contas
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+        CALL spAtualizarSaldoDiario(p_CorrentistaBeneficiarioID, p_ValorOperacao, 0);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar a transferência';
+    END IF;
+END$$
+DELIMITER ;
+
+-- Reconstruir o histórico existente com: python saldos_diarios.py
@@ -0,0 +1,14 @@
+-- Índices das consultas mais frequentes da API
+-- (Usuarios por Email já é atendido pela restrição UNIQUE da coluna)
+
+-- Extrato e movimentações: filtro por correntista em ordem de data, sem filesort
+CREATE INDEX IX_Movimentacoes_Correntista_Data
+    ON Movimentacoes (CorrentistaID, DataOperacao, MovimentacaoID);
+
+-- Estatísticas e consolidação: SUM/COUNT por tipo e período lidos só do índice
+CREATE INDEX IX_Movimentacoes_Correntista_Tipo_Data
+    ON Movimentacoes (CorrentistaID, TipoOperacao, DataOperacao, ValorOperacao);
+
+-- Correntistas do usuário (listagem e índice de propriedade)
+CREATE INDEX IX_Correntistas_Usuario
+    ON Correntistas (UsuarioID, CorrentistaID);
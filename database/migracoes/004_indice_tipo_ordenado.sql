@@ -0,0 +1,6 @@
+-- Extrato filtrado por tipo: incluir MovimentacaoID antes de ValorOperacao para
+-- que o índice também entregue a ordem (DataOperacao, MovimentacaoID) sem filesort
+DROP INDEX IX_Movimentacoes_Correntista_Tipo_Data ON Movimentacoes;
+
+CREATE INDEX IX_Movimentacoes_Correntista_Tipo_Data
+    ON Movimentacoes (CorrentistaID, TipoOperacao, DataOperacao, MovimentacaoID, ValorOperacao);
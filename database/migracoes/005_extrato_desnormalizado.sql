@@ -0,0 +1,197 @@
+-- Extrato desnormalizado para leitura (EXTRATO_DESNORMALIZADO=true)
+CREATE TABLE IF NOT EXISTS ExtratoMovimentacoes (
+    MovimentacaoID INT NOT NULL,
+    UsuarioID INT NULL,
+    CorrentistaID INT NOT NULL,
+    NomeCorrentista VARCHAR(50) NOT NULL,
+    TipoOperacao CHAR(1) NOT NULL,
+    ValorOperacao DECIMAL(15, 2) NOT NULL,
+    ValorAssinado DECIMAL(15, 2) NOT NULL,
+    DataOperacao DATETIME NOT NULL,
+    Descricao VARCHAR(50) NOT NULL,
+    BeneficiarioID INT NULL,
+    NomeBeneficiario VARCHAR(50) NULL,
+    CONSTRAINT PK_ExtratoMovimentacoes PRIMARY KEY (MovimentacaoID),
+    INDEX IX_ExtratoMovimentacoes_Correntista_Data (CorrentistaID, DataOperacao, MovimentacaoID),
+    INDEX IX_ExtratoMovimentacoes_Correntista_Tipo_Data (CorrentistaID, TipoOperacao, DataOperacao, MovimentacaoID),
+    INDEX IX_ExtratoMovimentacoes_Usuario_Data (UsuarioID, DataOperacao, MovimentacaoID)
+);
+
+-- Procedures passam a gravar o extrato na mesma transação da movimentação
+
+DROP PROCEDURE IF EXISTS spRegistrarExtrato;
+
+DELIMITER $$
+CREATE PROCEDURE spRegistrarExtrato(
+    IN p_MovimentacaoID INT
+)
+BEGIN
+    -- Copiar a movimentação com os nomes e o dono já resolvidos
+    INSERT INTO ExtratoMovimentacoes (MovimentacaoID, UsuarioID, CorrentistaID, NomeCorrentista, TipoOperacao,
+        ValorOperacao, ValorAssinado, DataOperacao, Descricao, BeneficiarioID, NomeBeneficiario)
+    SELECT M.MovimentacaoID, C.UsuarioID, C.CorrentistaID, C.NomeCorrentista, M.TipoOperacao,
+        M.ValorOperacao,
+        CASE M.TipoOperacao WHEN 'C' THEN M.ValorOperacao ELSE -M.ValorOperacao END,
+        M.DataOperacao, M.Descricao, B.CorrentistaID, B.NomeCorrentista
+    FROM Movimentacoes AS M
+    INNER JOIN Correntistas AS C
+      ON C.CorrentistaID = M.CorrentistaID
+    LEFT JOIN Correntistas AS B
+      ON B.CorrentistaID = M.CorrentistaBeneficiarioID
+    WHERE M.MovimentacaoID = p_MovimentacaoID;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spDepositar;
+
+DELIMITER $$
+CREATE PROCEDURE spDepositar(
+    IN p_CorrentistaID INT,
+    IN p_ValorDeposito DECIMAL(15, 2)
+)
+BEGIN
+    -- Inserir movimentação de crédito
+    INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+    VALUES ('C', p_CorrentistaID, p_ValorDeposito, NOW(), 'Depósito em conta');
+    -- Registrar no extrato de leitura
+    CALL spRegistrarExtrato(LAST_INSERT_ID());
+    
+    -- Atualizar saldo do correntista
+    UPDATE Correntistas 
+    SET Saldo = Saldo + p_ValorDeposito 
+    WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Atualizar consolidação diária
+    CALL spAtualizarSaldoDiario(p_CorrentistaID, p_ValorDeposito, 0);
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spSacar;
+
+DELIMITER $$
+CREATE PROCEDURE spSacar(
+    IN p_CorrentistaID INT,
+    IN p_ValorSaque DECIMAL(15, 2)
+)
+BEGIN
+    -- Verificar se há saldo suficiente
+    DECLARE saldo_atual DECIMAL(15, 2);
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    IF saldo_atual >= p_ValorSaque THEN
+        -- Inserir movimentação de débito
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+        VALUES ('D', p_CorrentistaID, p_ValorSaque, NOW(), 'Saque');
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(LAST_INSERT_ID());
+        
+        -- Atualizar saldo do correntista
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorSaque 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorSaque);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o saque';
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spPagar;
+
+DELIMITER $$
+CREATE PROCEDURE spPagar(
+    IN p_CorrentistaID INT,
+    IN p_ValorOperacao DECIMAL(15, 2),
+    IN p_Descricao VARCHAR(50)
+)
+BEGIN
+    -- Verificar se há saldo suficiente
+    DECLARE saldo_atual DECIMAL(15, 2);
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    IF saldo_atual >= p_ValorOperacao THEN
+        -- Inserir movimentação de débito
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+        VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), CONCAT('Pagamento: ', p_Descricao));
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(LAST_INSERT_ID());
+        
+        -- Atualizar saldo do correntista
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o pagamento';
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spTransferir;
+
+DELIMITER $$
+CREATE PROCEDURE spTransferir(
+    IN p_CorrentistaID INT,
+    IN p_ValorOperacao DECIMAL(15, 2),
+    IN p_CorrentistaBeneficiarioID INT
+)
+BEGIN
+    DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE beneficiario_existe INT DEFAULT 0;
+    
+    -- Verificar se há saldo suficiente
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Verificar se o beneficiário existe
+    SELECT COUNT(*) INTO beneficiario_existe FROM Correntistas WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+    
+    IF beneficiario_existe = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Correntista beneficiário não encontrado';
+    ELSEIF saldo_atual >= p_ValorOperacao THEN
+        -- Débito do pagador
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
+        VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), 'Transferência', p_CorrentistaBeneficiarioID);
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(LAST_INSERT_ID());
+        
+        -- Crédito do beneficiário
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
+        VALUES ('C', p_CorrentistaBeneficiarioID, p_ValorOperacao, NOW(), 'Transferência recebida', p_CorrentistaID);
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(LAST_INSERT_ID());
+        
+        -- Atualizar saldo do pagador
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar saldo do beneficiário
+        UPDATE Correntistas 
+        SET Saldo = Saldo + p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+        
+        -- Atualizar consolidação diária das duas contas
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+        CALL spAtualizarSaldoDiario(p_CorrentistaBeneficiarioID, p_ValorOperacao, 0);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar a transferência';
+    END IF;
+END$$
+DELIMITER ;
+
+-- Copiar o histórico existente (linhas já gravadas pelas novas procedures são ignoradas)
+INSERT IGNORE INTO ExtratoMovimentacoes (MovimentacaoID, UsuarioID, CorrentistaID, NomeCorrentista, TipoOperacao,
+    ValorOperacao, ValorAssinado, DataOperacao, Descricao, BeneficiarioID, NomeBeneficiario)
+SELECT M.MovimentacaoID, C.UsuarioID, C.CorrentistaID, C.NomeCorrentista, M.TipoOperacao,
+    M.ValorOperacao,
+    CASE M.TipoOperacao WHEN 'C' THEN M.ValorOperacao ELSE -M.ValorOperacao END,
+    M.DataOperacao, M.Descricao, B.CorrentistaID, B.NomeCorrentista
+FROM Movimentacoes AS M
+INNER JOIN Correntistas AS C
+  ON C.CorrentistaID = M.CorrentistaID
+LEFT JOIN Correntistas AS B
+  ON B.CorrentistaID = M.CorrentistaBeneficiarioID;
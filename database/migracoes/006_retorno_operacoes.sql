@@ -0,0 +1,186 @@
+-- Procedures de escrita passam a devolver as movimentações criadas e o saldo resultante
+
+DROP PROCEDURE IF EXISTS spRetornarMovimentacoes;
+
+DELIMITER $$
+CREATE PROCEDURE spRetornarMovimentacoes(
+    IN p_MovimentacaoID INT,
+    IN p_MovimentacaoBeneficiarioID INT
+)
+BEGIN
+    -- Devolver as linhas novas do extrato com o saldo resultante de cada conta
+    SELECT E.UsuarioID, E.CorrentistaID, E.NomeCorrentista,
+        CASE E.TipoOperacao WHEN 'C' THEN 'Crédito' ELSE 'Débito' END AS TipoOperacao,
+        E.MovimentacaoID, E.Descricao, E.DataOperacao, E.ValorOperacao,
+        E.BeneficiarioID, E.NomeBeneficiario, C.Saldo
+    FROM ExtratoMovimentacoes AS E
+    INNER JOIN Correntistas AS C
+      ON C.CorrentistaID = E.CorrentistaID
+    WHERE E.MovimentacaoID IN (p_MovimentacaoID, p_MovimentacaoBeneficiarioID)
+    ORDER BY E.MovimentacaoID;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spDepositar;
+
+DELIMITER $$
+CREATE PROCEDURE spDepositar(
+    IN p_CorrentistaID INT,
+    IN p_ValorDeposito DECIMAL(15, 2)
+)
+BEGIN
+    DECLARE movimentacao_id INT;
+    
+    -- Inserir movimentação de crédito
+    INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+    VALUES ('C', p_CorrentistaID, p_ValorDeposito, NOW(), 'Depósito em conta');
+    SET movimentacao_id = LAST_INSERT_ID();
+    -- Registrar no extrato de leitura
+    CALL spRegistrarExtrato(movimentacao_id);
+    
+    -- Atualizar saldo do correntista
+    UPDATE Correntistas 
+    SET Saldo = Saldo + p_ValorDeposito 
+    WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Atualizar consolidação diária
+    CALL spAtualizarSaldoDiario(p_CorrentistaID, p_ValorDeposito, 0);
+    
+    -- Devolver a movimentação e o novo saldo
+    CALL spRetornarMovimentacoes(movimentacao_id, NULL);
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spSacar;
+
+DELIMITER $$
+CREATE PROCEDURE spSacar(
+    IN p_CorrentistaID INT,
+    IN p_ValorSaque DECIMAL(15, 2)
+)
+BEGIN
+    -- Verificar se há saldo suficiente
+    DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE movimentacao_id INT;
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    IF saldo_atual >= p_ValorSaque THEN
+        -- Inserir movimentação de débito
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+        VALUES ('D', p_CorrentistaID, p_ValorSaque, NOW(), 'Saque');
+        SET movimentacao_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_id);
+        
+        -- Atualizar saldo do correntista
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorSaque 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorSaque);
+        
+        -- Devolver a movimentação e o novo saldo
+        CALL spRetornarMovimentacoes(movimentacao_id, NULL);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o saque';
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spPagar;
+
+DELIMITER $$
+CREATE PROCEDURE spPagar(
+    IN p_CorrentistaID INT,
+    IN p_ValorOperacao DECIMAL(15, 2),
+    IN p_Descricao VARCHAR(50)
+)
+BEGIN
+    -- Verificar se há saldo suficiente
+    DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE movimentacao_id INT;
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    IF saldo_atual >= p_ValorOperacao THEN
+        -- Inserir movimentação de débito
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao)
+        VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), CONCAT('Pagamento: ', p_Descricao));
+        SET movimentacao_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_id);
+        
+        -- Atualizar saldo do correntista
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar consolidação diária
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+        
+        -- Devolver a movimentação e o novo saldo
+        CALL spRetornarMovimentacoes(movimentacao_id, NULL);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar o pagamento';
+    END IF;
+END$$
+DELIMITER ;
+
+DROP PROCEDURE IF EXISTS spTransferir;
+
+DELIMITER $$
+CREATE PROCEDURE spTransferir(
+    IN p_CorrentistaID INT,
+    IN p_ValorOperacao DECIMAL(15, 2),
+    IN p_CorrentistaBeneficiarioID INT
+)
+BEGIN
+    DECLARE saldo_atual DECIMAL(15, 2);
+    DECLARE beneficiario_existe INT DEFAULT 0;
+    DECLARE movimentacao_id INT;
+    DECLARE movimentacao_beneficiario_id INT;
+    
+    -- Verificar se há saldo suficiente
+    SELECT Saldo INTO saldo_atual FROM Correntistas WHERE CorrentistaID = p_CorrentistaID;
+    
+    -- Verificar se o beneficiário existe
+    SELECT COUNT(*) INTO beneficiario_existe FROM Correntistas WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+    
+    IF beneficiario_existe = 0 THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Correntista beneficiário não encontrado';
+    ELSEIF saldo_atual >= p_ValorOperacao THEN
+        -- Débito do pagador
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
+        VALUES ('D', p_CorrentistaID, p_ValorOperacao, NOW(), 'Transferência', p_CorrentistaBeneficiarioID);
+        SET movimentacao_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_id);
+        
+        -- Crédito do beneficiário
+        INSERT INTO Movimentacoes(TipoOperacao, CorrentistaID, ValorOperacao, DataOperacao, Descricao, CorrentistaBeneficiarioID)
+        VALUES ('C', p_CorrentistaBeneficiarioID, p_ValorOperacao, NOW(), 'Transferência recebida', p_CorrentistaID);
+        SET movimentacao_beneficiario_id = LAST_INSERT_ID();
+        -- Registrar no extrato de leitura
+        CALL spRegistrarExtrato(movimentacao_beneficiario_id);
+        
+        -- Atualizar saldo do pagador
+        UPDATE Correntistas 
+        SET Saldo = Saldo - p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaID;
+        
+        -- Atualizar saldo do beneficiário
+        UPDATE Correntistas 
+        SET Saldo = Saldo + p_ValorOperacao 
+        WHERE CorrentistaID = p_CorrentistaBeneficiarioID;
+        
+        -- Atualizar consolidação diária das duas contas
+        CALL spAtualizarSaldoDiario(p_CorrentistaID, 0, p_ValorOperacao);
+        CALL spAtualizarSaldoDiario(p_CorrentistaBeneficiarioID, p_ValorOperacao, 0);
+        
+        -- Devolver as duas movimentações e os novos saldos
+        CALL spRetornarMovimentacoes(movimentacao_id, movimentacao_beneficiario_id);
+    ELSE
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Saldo insuficiente para realizar a transferência';
+    END IF;
+END$$
+DELIMITER ;
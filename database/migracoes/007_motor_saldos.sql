@@ -0,0 +1,11 @@
+-- Ponto de aplicação do log local do motor de saldos (ARMAZENAMENTO_BACKEND=motor)
+-- Gravado na mesma transação que as movimentações de cada lote: o que tem
+-- Sequencia maior que a registrada ainda precisa ser reaplicado
+CREATE TABLE IF NOT EXISTS MotorSaldos (
+    MotorID TINYINT NOT NULL,
+    Sequencia BIGINT NOT NULL,
+    DataAtualizacao DATETIME NOT NULL,
+    CONSTRAINT PK_MotorSaldos PRIMARY KEY (MotorID)
+);
+
+INSERT IGNORE INTO MotorSaldos (MotorID, Sequencia, DataAtualizacao) VALUES (1, 0, NOW());
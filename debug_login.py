@@ -1,27 +1,15 @@
 #!/usr/bin/env python3
 # Script para debugar e corrigir o problema de login
 
-import mysql.connector
 import bcrypt
 from dotenv import load_dotenv
-import os
+from pool_conexoes import get_db_connection
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Configurações do banco
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER', 'root')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_NAME = os.getenv('DB_NAME', 'SistemasCorporativos')
-
 def conectar_banco():
-    return mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+    return get_db_connection()
 
 def verificar_usuario():
     """Verifica se o usuário admin existe no banco"""
@@ -93,6 +93,7 @@ try:
     load_dotenv()
     
     import mysql.connector
+    from pool_conexoes import get_db_connection
     
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_USER = os.getenv('DB_USER', 'root')
@@ -101,12 +102,7 @@ try:
     
     print(f"Tentando conectar em {DB_USER}@{DB_HOST}/{DB_NAME}...")
     
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+    conn = get_db_connection()
     
     print("✓ Conexão com MySQL estabelecida!")
     
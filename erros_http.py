@@ -0,0 +1,20 @@
+"""
+Respostas de erro comuns às aplicações Flask (api.py e simple_server.py)
+"""
+from flask import jsonify
+
+from pool_conexoes import PoolEsgotadoError
+from senhas import SenhaSobrecarregadaError
+
+
+def servidor_ocupado(ex):
+    """Responde 503 com Retry-After: a requisição pode ser repetida em seguida"""
+    resposta = jsonify({"erro": f"Servidor ocupado, tente novamente: {ex}"})
+    resposta.headers['Retry-After'] = '1'
+    return resposta, 503
+
+
+def registrar_sobrecarga(app):
+    """Responde 503 rapidamente com o pool de conexões esgotado ou a fila de bcrypt cheia"""
+    app.register_error_handler(PoolEsgotadoError, servidor_ocupado)
+    app.register_error_handler(SenhaSobrecarregadaError, servidor_ocupado)
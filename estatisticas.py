@@ -0,0 +1,119 @@
+"""
+Estatísticas de movimentações calculadas no banco e mantidas em cache por usuário
+"""
+import os
+import threading
+
+from cache import CacheLRU, VersoesLimitadas
+from filtros import filtro_periodo
+
+ESTATISTICAS_CACHE_TAMANHO = int(os.getenv('ESTATISTICAS_CACHE_TAMANHO', '10000'))
+ESTATISTICAS_CACHE_TTL = int(os.getenv('ESTATISTICAS_CACHE_TTL', '300'))
+
+
+def consulta_estatisticas(usuario_id, inicio=None, fim=None):
+    """Retorna (sql, params) da agregação por correntista e tipo de operação"""
+    filtro, params = filtro_periodo(inicio, fim, 'm.DataOperacao')
+    sql = f"""
+        SELECT c.CorrentistaID, c.NomeCorrentista, c.Saldo, m.TipoOperacao,
+               COUNT(m.MovimentacaoID) AS Quantidade,
+               COALESCE(SUM(m.ValorOperacao), 0) AS Total
+        FROM Correntistas c
+        LEFT JOIN Movimentacoes m
+          ON m.CorrentistaID = c.CorrentistaID {filtro}
+        WHERE c.UsuarioID = %s
+        GROUP BY c.CorrentistaID, c.NomeCorrentista, c.Saldo, m.TipoOperacao
+    """
+    return sql, (*params, usuario_id)
+
+
+def calcular_estatisticas(conn, usuario_id, inicio=None, fim=None):
+    """Agrega créditos, débitos e quantidade por correntista do usuário"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(*consulta_estatisticas(usuario_id, inicio, fim))
+    linhas = cursor.fetchall()
+    cursor.close()
+    return resumir_estatisticas(linhas, inicio, fim)
+
+
+def resumir_estatisticas(linhas, inicio=None, fim=None):
+    """Monta a resposta a partir das linhas (correntista, tipo, quantidade, total)"""
+    correntistas = {}
+    for linha in linhas:
+        item = correntistas.setdefault(linha['CorrentistaID'], {
+            'correntista_id': linha['CorrentistaID'],
+            'nome': linha['NomeCorrentista'],
+            'saldo': float(linha['Saldo']),
+            'total_creditos': 0.0,
+            'total_debitos': 0.0,
+            'quantidade': 0
+        })
+        if linha['TipoOperacao'] == 'C':
+            item['total_creditos'] = float(linha['Total'])
+        elif linha['TipoOperacao'] == 'D':
+            item['total_debitos'] = float(linha['Total'])
+        item['quantidade'] += linha['Quantidade']
+
+    itens = list(correntistas.values())
+    return {
+        'usuario': {
+            'saldo_total': sum(item['saldo'] for item in itens),
+            'total_creditos': sum(item['total_creditos'] for item in itens),
+            'total_debitos': sum(item['total_debitos'] for item in itens),
+            'quantidade': sum(item['quantidade'] for item in itens)
+        },
+        'correntistas': itens,
+        'periodo': {
+            'data_inicio': inicio.isoformat() if inicio else None,
+            'data_fim': fim.isoformat() if fim else None
+        }
+    }
+
+
+class CacheEstatisticas:
+    """Cache por usuário, invalidado quando uma conta do usuário recebe escrita
+
+    Quem escreve já sabe o dono de cada conta alterada (o UsuarioID vem com as
+    movimentações), então o cache não guarda um mapa conta -> usuário.
+    """
+
+    def __init__(self, tamanho_maximo=ESTATISTICAS_CACHE_TAMANHO, ttl=ESTATISTICAS_CACHE_TTL):
+        self._cache = CacheLRU(tamanho_maximo, ttl)
+        self._lock = threading.Lock()
+        self._versoes = VersoesLimitadas(tamanho_maximo)
+
+    def versao(self, usuario_id):
+        """Versão atual do usuário; leia antes de consultar o banco"""
+        with self._lock:
+            return self._versoes.atual(usuario_id)
+
+    def obter(self, usuario_id, periodo):
+        por_periodo = self._cache.obter(usuario_id)
+        if por_periodo is None:
+            return None
+        return por_periodo.get(periodo)
+
+    def definir(self, usuario_id, periodo, resultado, versao):
+        """Armazena o resultado se nenhuma escrita ocorreu desde `versao`"""
+        with self._lock:
+            if self._versoes.atual(usuario_id) != versao:
+                return
+            por_periodo = self._cache.obter(usuario_id) or {}
+            por_periodo = {**por_periodo, periodo: resultado}
+            self._cache.definir(usuario_id, por_periodo)
+
+    def invalidar_usuario(self, usuario_id):
+        with self._lock:
+            self._versoes.avancar(usuario_id)
+            self._cache.invalidar(usuario_id)
+
+    def invalidar_usuarios(self, *usuario_ids):
+        """Invalida os donos das contas que receberam escrita (contas sem dono são ignoradas)"""
+        for usuario_id in set(usuario_ids) - {None}:
+            self.invalidar_usuario(usuario_id)
+
+    def estatisticas(self):
+        return self._cache.estatisticas()
+
+
+cache_estatisticas = CacheEstatisticas()
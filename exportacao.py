@@ -0,0 +1,72 @@
+"""
+Exportação do extrato em streaming (NDJSON ou CSV) a partir de um cursor sem buffer
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+EXPORTACAO_LOTE = int(os.getenv('EXPORTACAO_LOTE', '500'))
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8'
+}
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _linhas(cursor, lote):
+    """Percorre o cursor em lotes, sem carregar o resultado inteiro"""
+    while True:
+        linhas = cursor.fetchmany(lote)
+        if not linhas:
+            return
+        yield linhas
+
+
+def gerar_ndjson(cursor, lote=EXPORTACAO_LOTE):
+    colunas = cursor.column_names
+    for linhas in _linhas(cursor, lote):
+        yield ''.join(
+            json.dumps({c: _serializar(v) for c, v in zip(colunas, linha)}, ensure_ascii=False) + '\n'
+            for linha in linhas
+        )
+
+
+def gerar_csv(cursor, lote=EXPORTACAO_LOTE):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(cursor.column_names)
+    for linhas in _linhas(cursor, lote):
+        escritor.writerows([_serializar(v) for v in linha] for linha in linhas)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Cabeçalho de um extrato vazio
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def exportar(conn, cursor, formato):
+    """Gera os blocos da resposta e devolve a conexão ao final do stream"""
+    gerador = gerar_ndjson if formato == 'ndjson' else gerar_csv
+    concluido = False
+    try:
+        yield from gerador(cursor)
+        concluido = True
+    finally:
+        if concluido:
+            cursor.close()
+            conn.close()
+        else:
+            # Cliente desconectou: descartar a conexão em vez de ler o restante
+            conn.descartar()
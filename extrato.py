@@ -0,0 +1,85 @@
+"""
+Consultas do extrato direto nas tabelas base ou na tabela desnormalizada
+
+Produzem as mesmas colunas de vwExtrato, mas com o filtro por correntista,
+período, tipo e valor aplicado onde os índices atendem. Com
+EXTRATO_DESNORMALIZADO=true as leituras usam ExtratoMovimentacoes, gravada
+pelas procedures, e dispensam os joins com Correntistas.
+"""
+import os
+
+from filtros import filtro_extrato
+from paginacao import filtro_cursor
+
+EXTRATO_DESNORMALIZADO = os.getenv('EXTRATO_DESNORMALIZADO', 'false').lower() in ('1', 'true', 'sim', 'yes')
+
+_SELECT_TABELAS = """
+        SELECT
+            m.CorrentistaID,
+            c.NomeCorrentista,
+            CASE m.TipoOperacao
+                WHEN 'C' THEN 'Crédito'
+                ELSE 'Débito'
+            END AS TipoOperacao,
+            m.MovimentacaoID,
+            m.Descricao,
+            m.DataOperacao,
+            m.ValorOperacao,
+            b.CorrentistaID AS BeneficiarioID,
+            b.NomeCorrentista AS NomeBeneficiario
+        FROM Movimentacoes m
+        INNER JOIN Correntistas c
+          ON c.CorrentistaID = m.CorrentistaID
+        LEFT JOIN Correntistas b
+          ON b.CorrentistaID = m.CorrentistaBeneficiarioID
+"""
+
+_SELECT_DESNORMALIZADO = """
+        SELECT
+            m.CorrentistaID,
+            m.NomeCorrentista,
+            CASE m.TipoOperacao
+                WHEN 'C' THEN 'Crédito'
+                ELSE 'Débito'
+            END AS TipoOperacao,
+            m.MovimentacaoID,
+            m.Descricao,
+            m.DataOperacao,
+            m.ValorOperacao,
+            m.BeneficiarioID,
+            m.NomeBeneficiario
+        FROM ExtratoMovimentacoes m
+"""
+
+
+def _consulta(select, coluna, valor, filtros, cursor_pagina, limite):
+    filtro, params = filtro_extrato(filtros, 'm.')
+    continuacao, params_cursor = filtro_cursor(cursor_pagina, 'm.')
+    sql = select + f"""        WHERE m.{coluna} = %s {filtro} {continuacao}
+        ORDER BY m.DataOperacao DESC, m.MovimentacaoID DESC
+"""
+    params = (valor, *params, *params_cursor)
+    if limite is not None:
+        sql += "        LIMIT %s\n"
+        params += (limite + 1,)
+    return sql, params
+
+
+def consulta_extrato(correntista_id, filtros=None, cursor_pagina=None, limite=None,
+                     desnormalizado=EXTRATO_DESNORMALIZADO):
+    """Retorna (sql, params) das movimentações do correntista, mais recentes primeiro
+
+    Com `limite`, busca `limite + 1` linhas para montar_pagina saber se há
+    próxima página.
+    """
+    select = _SELECT_DESNORMALIZADO if desnormalizado else _SELECT_TABELAS
+    return _consulta(select, 'CorrentistaID', correntista_id, filtros, cursor_pagina, limite)
+
+
+def consulta_movimentacoes_usuario(usuario_id, filtros=None, cursor_pagina=None, limite=None):
+    """Movimentações de todos os correntistas do usuário em uma só consulta
+
+    Só existe na tabela desnormalizada, que guarda o UsuarioID de cada linha
+    e tem índice (UsuarioID, DataOperacao, MovimentacaoID).
+    """
+    return _consulta(_SELECT_DESNORMALIZADO, 'UsuarioID', usuario_id, filtros, cursor_pagina, limite)
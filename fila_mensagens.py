@@ -0,0 +1,204 @@
+"""
+Fila de mensagens do Socket.IO para vários processos de trabalho
+
+Com SOCKETIO_MESSAGE_QUEUE definido, cada emit é publicado na fila e entregue
+por todos os processos aos sockets das suas salas. Aceita as URLs suportadas
+pelo Flask-SocketIO (redis://, amqp://, kafka://, zmq+tcp://) e a fila local
+deste módulo (local://host:porta), um pequeno broker TCP que roda no processo
+principal do servidor_producao.py e não depende de serviços externos.
+"""
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+import socketio
+
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+FILA_LOCAL_PENDENTES = int(os.getenv('FILA_LOCAL_PENDENTES', '10000'))
+
+_CABECALHO = struct.Struct('!I')
+
+logger = logging.getLogger(__name__)
+
+
+def _endereco(url):
+    """'local://host:porta' -> (host, porta)"""
+    partes = urlparse(url)
+    if partes.scheme != 'local' or not partes.port:
+        raise ValueError(f'URL de fila local inválida: {url}')
+    return partes.hostname or '127.0.0.1', partes.port
+
+
+def _enviar_quadro(conexao, dados):
+    conexao.sendall(_CABECALHO.pack(len(dados)) + dados)
+
+
+def _ler_exato(conexao, tamanho):
+    partes = []
+    while tamanho:
+        parte = conexao.recv(tamanho)
+        if not parte:
+            raise ConnectionError('Conexão com a fila encerrada')
+        partes.append(parte)
+        tamanho -= len(parte)
+    return b''.join(partes)
+
+
+def _ler_quadro(conexao):
+    (tamanho,) = _CABECALHO.unpack(_ler_exato(conexao, _CABECALHO.size))
+    return _ler_exato(conexao, tamanho)
+
+
+class _Assinante:
+    """Conexão de um processo com o broker, com fila de saída própria"""
+
+    def __init__(self, conexao, pendentes):
+        self.conexao = conexao
+        self.saida = queue.Queue(pendentes)
+
+    def escrever(self):
+        try:
+            while True:
+                quadro = self.saida.get()
+                if quadro is None:
+                    return
+                _enviar_quadro(self.conexao, quadro)
+        except OSError:
+            pass
+        finally:
+            self.conexao.close()
+
+
+class BrokerLocal:
+    """Repassa cada quadro recebido a todos os processos conectados
+
+    Um processo lento tem a própria fila de saída; se ela enche, ele é
+    desconectado (e reconecta) em vez de atrasar os demais.
+    """
+
+    def __init__(self, url, pendentes=FILA_LOCAL_PENDENTES):
+        self.endereco = _endereco(url)
+        self.pendentes = pendentes
+        self._assinantes = set()
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def iniciar(self):
+        self._servidor = socket.create_server(self.endereco)
+        threading.Thread(target=self._aceitar, name='fila-local', daemon=True).start()
+
+    def _aceitar(self):
+        while True:
+            try:
+                conexao, _ = self._servidor.accept()
+            except OSError:
+                return
+            conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            assinante = _Assinante(conexao, self.pendentes)
+            with self._lock:
+                self._assinantes.add(assinante)
+            threading.Thread(target=assinante.escrever, daemon=True).start()
+            threading.Thread(target=self._ler, args=(assinante,), daemon=True).start()
+
+    def _ler(self, assinante):
+        try:
+            while True:
+                self._repassar(_ler_quadro(assinante.conexao))
+        except (OSError, ConnectionError, struct.error):
+            pass
+        finally:
+            self._remover(assinante)
+
+    def _repassar(self, quadro):
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for assinante in assinantes:
+            try:
+                assinante.saida.put_nowait(quadro)
+            except queue.Full:
+                logger.warning('Processo não acompanha a fila local; desconectando')
+                self._remover(assinante)
+
+    def _remover(self, assinante):
+        with self._lock:
+            if assinante not in self._assinantes:
+                return
+            self._assinantes.discard(assinante)
+        try:
+            assinante.saida.put_nowait(None)
+        except queue.Full:
+            assinante.conexao.close()
+
+    def fechar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for assinante in assinantes:
+            self._remover(assinante)
+
+
+class GerenciadorFilaLocal(socketio.PubSubManager):
+    """Client manager do python-socketio que publica no BrokerLocal"""
+
+    name = 'local'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None, json=None):
+        self.endereco = _endereco(url)
+        self._conexao_publicacao = None
+        self._lock_publicacao = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+
+    def _conectar(self):
+        conexao = socket.create_connection(self.endereco)
+        conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conexao
+
+    def _publish(self, data):
+        quadro = self.json.dumps({'canal': self.channel, 'dados': data}).encode('utf-8')
+        with self._lock_publicacao:
+            for tentativa in range(2):
+                try:
+                    if self._conexao_publicacao is None:
+                        self._conexao_publicacao = self._conectar()
+                    _enviar_quadro(self._conexao_publicacao, quadro)
+                    return
+                except OSError:
+                    if self._conexao_publicacao is not None:
+                        self._conexao_publicacao.close()
+                    self._conexao_publicacao = None
+            self._get_logger().error('Não foi possível publicar na fila local')
+
+    def _listen(self):
+        espera = 0.1
+        while True:
+            try:
+                conexao = self._conectar()
+            except OSError:
+                time.sleep(espera)
+                espera = min(espera * 2, 5)
+                continue
+            espera = 0.1
+            try:
+                while True:
+                    mensagem = self.json.loads(_ler_quadro(conexao))
+                    if mensagem.get('canal') == self.channel:
+                        yield mensagem['dados']
+            except (OSError, ConnectionError, ValueError, struct.error):
+                self._get_logger().warning('Conexão com a fila local perdida; reconectando')
+            finally:
+                conexao.close()
+
+
+def opcoes_fila_mensagens(url=SOCKETIO_MESSAGE_QUEUE):
+    """Argumentos do SocketIO() para a fila configurada (vazio: processo único)"""
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': GerenciadorFilaLocal(url)}
+    return {'message_queue': url}
@@ -0,0 +1,104 @@
+"""
+Leitura e validação dos filtros de consulta recebidos na query string
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+
+def _ler_data(valor, nome, fim_do_dia=False):
+    """Aceita 'AAAA-MM-DD' ou data/hora ISO 8601"""
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f'Parâmetro {nome} deve estar no formato AAAA-MM-DD')
+    # Uma data sem horário no fim do período inclui o dia inteiro
+    if fim_do_dia and len(valor) == 10:
+        data += timedelta(days=1)
+    return data
+
+
+def ler_periodo(args):
+    """Retorna (inicio, fim) com fim exclusivo; ambos podem ser None"""
+    inicio = args.get('data_inicio')
+    fim = args.get('data_fim')
+    inicio = _ler_data(inicio, 'data_inicio') if inicio else None
+    fim = _ler_data(fim, 'data_fim', fim_do_dia=True) if fim else None
+    if inicio and fim and inicio >= fim:
+        raise ValueError('data_inicio deve ser anterior a data_fim')
+    return inicio, fim
+
+
+def filtro_periodo(inicio, fim, coluna='DataOperacao'):
+    """Trecho de SQL (iniciado por AND) para o período informado"""
+    filtro = ''
+    params = ()
+    if inicio:
+        filtro += f' AND {coluna} >= %s'
+        params += (inicio,)
+    if fim:
+        filtro += f' AND {coluna} < %s'
+        params += (fim,)
+    return filtro, params
+
+
+# Aceita o código da tabela (C/D) ou o nome exibido no extrato
+TIPOS_MOVIMENTACAO = {
+    'c': 'C', 'credito': 'C', 'crédito': 'C',
+    'd': 'D', 'debito': 'D', 'débito': 'D'
+}
+
+
+def _ler_valor(valor, nome):
+    """Valor como Decimal (o mesmo tipo de ValorOperacao); NaN e infinito são recusados"""
+    try:
+        numero = Decimal(valor.strip())
+    except InvalidOperation:
+        raise ValueError(f'Parâmetro {nome} deve ser numérico')
+    if not numero.is_finite():
+        raise ValueError(f'Parâmetro {nome} deve ser numérico')
+    if numero < 0:
+        raise ValueError(f'Parâmetro {nome} não pode ser negativo')
+    return numero
+
+
+def ler_filtros_extrato(args):
+    """Lê período, tipo e faixa de valor do extrato; ausentes ficam None"""
+    inicio, fim = ler_periodo(args)
+
+    tipo = args.get('tipo')
+    if tipo:
+        tipo = TIPOS_MOVIMENTACAO.get(tipo.strip().lower())
+        if tipo is None:
+            raise ValueError('Parâmetro tipo deve ser credito ou debito')
+
+    valor_min = args.get('valor_min')
+    valor_max = args.get('valor_max')
+    valor_min = _ler_valor(valor_min, 'valor_min') if valor_min else None
+    valor_max = _ler_valor(valor_max, 'valor_max') if valor_max else None
+    if valor_min is not None and valor_max is not None and valor_min > valor_max:
+        raise ValueError('valor_min deve ser menor ou igual a valor_max')
+
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'tipo': tipo or None,
+        'valor_min': valor_min,
+        'valor_max': valor_max
+    }
+
+
+def filtro_extrato(filtros, prefixo=''):
+    """Trecho de SQL (iniciado por AND) com os filtros de ler_filtros_extrato"""
+    if not filtros:
+        return '', ()
+    filtro, params = filtro_periodo(filtros['inicio'], filtros['fim'], f'{prefixo}DataOperacao')
+    if filtros['tipo']:
+        filtro += f' AND {prefixo}TipoOperacao = %s'
+        params += (filtros['tipo'],)
+    if filtros['valor_min'] is not None:
+        filtro += f' AND {prefixo}ValorOperacao >= %s'
+        params += (filtros['valor_min'],)
+    if filtros['valor_max'] is not None:
+        filtro += f' AND {prefixo}ValorOperacao <= %s'
+        params += (filtros['valor_max'],)
+    return filtro, params
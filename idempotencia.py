@@ -0,0 +1,175 @@
+"""
+Armazenamento de respostas por Idempotency-Key para as rotas de escrita
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from pool_conexoes import get_db_connection
+
+IDEMPOTENCIA_BACKEND = os.getenv('IDEMPOTENCIA_BACKEND', 'memoria')
+IDEMPOTENCIA_TTL = int(os.getenv('IDEMPOTENCIA_TTL', '86400'))
+IDEMPOTENCIA_MAXIMO = int(os.getenv('IDEMPOTENCIA_MAXIMO', '100000'))
+IDEMPOTENCIA_ESPERA = float(os.getenv('IDEMPOTENCIA_ESPERA', '30'))
+
+
+class ConflitoIdempotencia(Exception):
+    """A chave já foi usada com outro conteúdo ou ainda está em processamento"""
+
+    def __init__(self, mensagem, status):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _conteudo_diferente():
+    return ConflitoIdempotencia('Idempotency-Key já utilizada com outro conteúdo', 422)
+
+
+def _ainda_processando():
+    return ConflitoIdempotencia('Requisição com a mesma Idempotency-Key ainda em processamento', 409)
+
+
+class _Entrada:
+    def __init__(self, impressao, expira_em):
+        self.impressao = impressao
+        self.expira_em = expira_em
+        self.resposta = None
+        self.concluida = threading.Event()
+
+
+class ArmazemMemoria:
+    """Armazém em memória do processo, com expiração por TTL"""
+
+    def __init__(self, ttl=IDEMPOTENCIA_TTL, maximo=IDEMPOTENCIA_MAXIMO, espera=IDEMPOTENCIA_ESPERA):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.espera = espera
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expurgar(self, agora):
+        # Todas as entradas têm o mesmo TTL: as mais antigas estão no início
+        while self._entradas:
+            chave, entrada = next(iter(self._entradas.items()))
+            expirada = entrada.expira_em <= agora
+            excedente = len(self._entradas) > self.maximo and entrada.concluida.is_set()
+            if not (expirada or excedente):
+                break
+            del self._entradas[chave]
+
+    def iniciar(self, usuario_id, chave, impressao):
+        """Retorna a resposta armazenada ou None se o chamador deve executar"""
+        chave = (usuario_id, chave)
+        limite = time.monotonic() + self.espera
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._expurgar(agora)
+                entrada = self._entradas.get(chave)
+                if entrada is None:
+                    self._entradas[chave] = _Entrada(impressao, agora + self.ttl)
+                    return None
+            if entrada.impressao != impressao:
+                raise _conteudo_diferente()
+            # Duplicata concorrente: aguardar a primeira execução terminar
+            if not entrada.concluida.wait(max(0.0, limite - time.monotonic())):
+                raise _ainda_processando()
+            if entrada.resposta is not None:
+                return entrada.resposta
+            # A primeira execução foi abandonada; tentar assumir a chave
+
+    def concluir(self, usuario_id, chave, corpo, status):
+        with self._lock:
+            entrada = self._entradas.get((usuario_id, chave))
+        if entrada is not None:
+            entrada.resposta = (corpo, status)
+            entrada.concluida.set()
+
+    def abandonar(self, usuario_id, chave):
+        with self._lock:
+            entrada = self._entradas.pop((usuario_id, chave), None)
+        if entrada is not None:
+            entrada.concluida.set()
+
+
+class ArmazemMySQL:
+    """Armazém na tabela ChavesIdempotencia, compartilhado entre processos"""
+
+    def __init__(self, ttl=IDEMPOTENCIA_TTL, espera=IDEMPOTENCIA_ESPERA, intervalo=0.05):
+        self.ttl = ttl
+        self.espera = espera
+        self.intervalo = intervalo
+
+    def _executar(self, sql, params, buscar=False):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            linha = cursor.fetchone() if buscar else None
+            conn.commit()
+            cursor.close()
+            return linha
+        finally:
+            conn.close()
+
+    def iniciar(self, usuario_id, chave, impressao):
+        limite = time.monotonic() + self.espera
+        while True:
+            # Chaves expiradas ou abandonadas há mais que o tempo de espera são liberadas
+            self._executar("""
+                DELETE FROM ChavesIdempotencia
+                WHERE UsuarioID = %s AND Chave = %s
+                  AND (ExpiraEm < NOW()
+                       OR (Status IS NULL AND DataCriacao < NOW() - INTERVAL %s SECOND))
+            """, (usuario_id, chave, int(self.espera * 2)))
+            try:
+                self._executar("""
+                    INSERT INTO ChavesIdempotencia (UsuarioID, Chave, Impressao, DataCriacao, ExpiraEm)
+                    VALUES (%s, %s, %s, NOW(), NOW() + INTERVAL %s SECOND)
+                """, (usuario_id, chave, impressao, self.ttl))
+                return None
+            except mysql.connector.IntegrityError as ex:
+                if ex.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+
+            linha = self._executar(
+                "SELECT Impressao, Status, Resposta FROM ChavesIdempotencia WHERE UsuarioID = %s AND Chave = %s",
+                (usuario_id, chave), buscar=True
+            )
+            if linha is None:
+                continue
+            impressao_salva, status, resposta = linha
+            if impressao_salva != impressao:
+                raise _conteudo_diferente()
+            if status is not None:
+                return json.loads(resposta), status
+            if time.monotonic() >= limite:
+                raise _ainda_processando()
+            time.sleep(self.intervalo)
+
+    def concluir(self, usuario_id, chave, corpo, status):
+        self._executar(
+            "UPDATE ChavesIdempotencia SET Status = %s, Resposta = %s WHERE UsuarioID = %s AND Chave = %s",
+            (status, json.dumps(corpo, ensure_ascii=False, default=str), usuario_id, chave)
+        )
+
+    def abandonar(self, usuario_id, chave):
+        self._executar(
+            "DELETE FROM ChavesIdempotencia WHERE UsuarioID = %s AND Chave = %s AND Status IS NULL",
+            (usuario_id, chave)
+        )
+
+
+def criar_armazem(backend=IDEMPOTENCIA_BACKEND):
+    """Cria o armazém configurado em IDEMPOTENCIA_BACKEND (memoria ou mysql)"""
+    if backend == 'mysql':
+        return ArmazemMySQL()
+    return ArmazemMemoria()
+
+
+armazem_idempotencia = criar_armazem()
@@ -0,0 +1,247 @@
+"""
+Log local de escrita antecipada (write-ahead log) do motor de saldos
+
+Cada registro recebe uma sequência crescente e vira uma linha
+`<crc32> <sequencia> <json>` no segmento atual (MOTOR_WAL_PASTA/<inicio>.log).
+Um único thread grava e faz o fsync do que chegou enquanto o fsync anterior
+rodava (group commit): com muitas operações simultâneas, um fsync confirma
+várias de uma vez. Quem acrescenta um registro espera por `aguardar(seq)`.
+
+Na abertura, os segmentos são lidos de volta; uma linha incompleta ou com CRC
+errado no fim (queda no meio de uma gravação) é descartada junto com o que
+vier depois. Os registros com sequência acima do ponto já aplicado voltam
+como pendentes. Segmentos inteiros já aplicados são apagados em `confirmar`.
+"""
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import deque
+
+from modo_async import executar_em_thread_real
+
+logger = logging.getLogger(__name__)
+
+EXTENSAO = '.log'
+
+
+class LogIndisponivel(Exception):
+    """O log não conseguiu gravar; nada novo é aceito até reiniciar o processo"""
+
+
+def _codificar(seq, registro):
+    corpo = f"{seq} {json.dumps(registro, ensure_ascii=False, separators=(',', ':'))}"
+    return f"{zlib.crc32(corpo.encode('utf-8')):08x} {corpo}\n".encode('utf-8')
+
+
+def _decodificar(linha):
+    """(seq, registro) ou None se a linha está incompleta ou corrompida"""
+    if not linha.endswith(b'\n'):
+        return None
+    try:
+        crc, corpo = linha[:-1].split(b' ', 1)
+        if int(crc, 16) != zlib.crc32(corpo):
+            return None
+        seq, registro = corpo.split(b' ', 1)
+        return int(seq), json.loads(registro)
+    except ValueError:
+        return None
+
+
+def _sincronizar_pasta(pasta):
+    """Torna durável a criação ou remoção de um segmento (sem efeito no Windows)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    descritor = os.open(pasta, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descritor)
+    finally:
+        os.close(descritor)
+
+
+class LogEscrita:
+    """Log em segmentos com fsync agrupado"""
+
+    def __init__(self, pasta, segmento_bytes):
+        self.pasta = pasta
+        self.segmento_bytes = segmento_bytes
+        self._cond = threading.Condition()
+        self._aberto = False
+        self._arquivo = None
+        # Sequência inicial de cada segmento, em ordem
+        self._segmentos = []
+        self._proxima = 1
+        self._duravel = 0
+        self._gravando = []
+        # (seq, registro) ainda não confirmados, em ordem de sequência
+        self._pendentes = deque()
+        self._falha = None
+        self._grupos = 0
+
+    def _caminho(self, inicio):
+        return os.path.join(self.pasta, f'{inicio:020d}{EXTENSAO}')
+
+    # -----------------
+    # Abertura e recuperação
+    # -----------------
+    def abrir(self, aplicado):
+        """Lê os segmentos, descarta um fim corrompido e inicia o thread de gravação
+
+        Os registros com sequência maior que `aplicado` ficam pendentes, para
+        serem reaplicados antes de qualquer operação nova.
+        """
+        with self._cond:
+            if self._aberto:
+                return
+            os.makedirs(self.pasta, exist_ok=True)
+            inicios = sorted(
+                int(nome[:-len(EXTENSAO)]) for nome in os.listdir(self.pasta)
+                if nome.endswith(EXTENSAO) and nome[:-len(EXTENSAO)].isdigit()
+            )
+
+            ultima = aplicado
+            for posicao, inicio in enumerate(inicios):
+                caminho = self._caminho(inicio)
+                valido = 0
+                integro = True
+                with open(caminho, 'rb') as arquivo:
+                    for linha in arquivo:
+                        lido = _decodificar(linha)
+                        if lido is None or (lido[0] <= ultima and lido[0] > aplicado):
+                            integro = False
+                            break
+                        seq, registro = lido
+                        if seq > aplicado:
+                            self._pendentes.append((seq, registro))
+                        ultima = max(ultima, seq)
+                        valido += len(linha)
+                self._segmentos.append(inicio)
+                if not integro:
+                    logger.warning('Log %s corrompido a partir do byte %d: fim descartado', caminho, valido)
+                    with open(caminho, 'r+b') as arquivo:
+                        arquivo.truncate(valido)
+                        arquivo.flush()
+                        os.fsync(arquivo.fileno())
+                    for seguinte in inicios[posicao + 1:]:
+                        os.remove(self._caminho(seguinte))
+                    _sincronizar_pasta(self.pasta)
+                    break
+
+            self._proxima = ultima + 1
+            self._duravel = ultima
+            self._abrir_segmento(self._proxima)
+            self._aberto = True
+        threading.Thread(target=self._executar, name='log-escrita', daemon=True).start()
+
+    def _abrir_segmento(self, inicio):
+        if not self._segmentos or self._segmentos[-1] != inicio:
+            self._segmentos.append(inicio)
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._arquivo = open(self._caminho(inicio), 'ab')
+        _sincronizar_pasta(self.pasta)
+
+    # -----------------
+    # Gravação
+    # -----------------
+    def acrescentar(self, registro):
+        """Enfileira o registro para gravação e retorna a sua sequência"""
+        with self._cond:
+            if self._falha is not None:
+                raise LogIndisponivel(str(self._falha))
+            seq = self._proxima
+            self._proxima += 1
+            self._gravando.append(_codificar(seq, registro))
+            self._pendentes.append((seq, registro))
+            self._cond.notify_all()
+            return seq
+
+    def aguardar(self, seq, tempo_limite=None):
+        """Espera o registro `seq` estar em disco; False se o tempo acabou"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._duravel >= seq or self._falha is not None, tempo_limite):
+                return False
+            if self._duravel < seq:
+                raise LogIndisponivel(str(self._falha))
+            return True
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._gravando)
+                grupo, self._gravando = self._gravando, []
+                ultima = self._proxima - 1
+            try:
+                self._arquivo.write(b''.join(grupo))
+                self._arquivo.flush()
+                # fsync fora do hub nos modos eventlet/gevent
+                executar_em_thread_real(os.fsync, self._arquivo.fileno())
+            except OSError as ex:
+                logger.exception('Falha ao gravar o log do motor de saldos')
+                with self._cond:
+                    self._falha = ex
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._duravel = ultima
+                self._grupos += 1
+                self._cond.notify_all()
+                if self._arquivo.tell() >= self.segmento_bytes:
+                    try:
+                        self._abrir_segmento(ultima + 1)
+                    except OSError as ex:
+                        logger.exception('Falha ao abrir um novo segmento do log')
+                        self._falha = ex
+                        self._cond.notify_all()
+                        return
+
+    # -----------------
+    # Aplicação
+    # -----------------
+    def duraveis(self, maximo):
+        """Até `maximo` registros pendentes já em disco, em ordem: [(seq, registro)]"""
+        with self._cond:
+            registros = []
+            for seq, registro in self._pendentes:
+                if seq > self._duravel or len(registros) == maximo:
+                    break
+                registros.append((seq, registro))
+            return registros
+
+    def confirmar(self, seq):
+        """Marca tudo até `seq` como aplicado e apaga os segmentos que não servem mais"""
+        with self._cond:
+            while self._pendentes and self._pendentes[0][0] <= seq:
+                self._pendentes.popleft()
+            removiveis = []
+            while len(self._segmentos) > 1 and self._segmentos[1] - 1 <= seq:
+                removiveis.append(self._segmentos.pop(0))
+        for inicio in removiveis:
+            try:
+                os.remove(self._caminho(inicio))
+            except OSError:
+                logger.warning('Não foi possível apagar o segmento %s', self._caminho(inicio))
+
+    def ultima(self):
+        """Sequência do último registro acrescentado"""
+        with self._cond:
+            return self._proxima - 1
+
+    def pendentes(self):
+        with self._cond:
+            return len(self._pendentes)
+
+    def falhou(self):
+        return self._falha is not None
+
+    def situacao(self):
+        with self._cond:
+            return {
+                'sequencia': self._proxima - 1,
+                'duravel': self._duravel,
+                'pendentes': len(self._pendentes),
+                'grupos': self._grupos,
+                'segmentos': len(self._segmentos),
+            }
@@ -0,0 +1,209 @@
+"""
+Métricas de latência e de recursos no formato texto do Prometheus
+
+Cada requisição HTTP é medida por rota (a regra do Flask, ex.
+/extrato/<int:correntista_id>) e, dentro dela, cada fase do processamento:
+token_required, bcrypt, get_db_connection, execute/callproc e
+emitir_notificacao. As fases herdam a rota da requisição (ou socket:<evento>
+nos handlers do Socket.IO). Medidores como conexões em uso e sockets por
+sala são lidos só na coleta, então não custam nada entre uma coleta e outra.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import has_request_context, request
+
+METRICAS_ATIVAS = os.getenv('METRICAS_ATIVAS', 'true').lower() in ('1', 'true', 'sim', 'yes')
+
+# Limites dos buckets em segundos (de 0,5 ms a 10 s)
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SEM_ROTA = '-'
+
+
+def rota_atual():
+    """Rota da requisição (ou evento do socket) em andamento, para rotular as fases"""
+    if not has_request_context():
+        return SEM_ROTA
+    regra = request.url_rule
+    if regra is not None:
+        return regra.rule
+    # Handlers do Flask-SocketIO rodam em um contexto de requisição com `event`
+    evento = getattr(request, 'event', None)
+    if evento:
+        return f"socket:{evento.get('message')}"
+    return SEM_ROTA
+
+
+class Histograma:
+    __slots__ = ('contagens', 'soma', 'total')
+
+    def __init__(self, buckets):
+        # Contagem por bucket (não cumulativa); o último é o +Inf
+        self.contagens = [0] * (buckets + 1)
+        self.soma = 0.0
+        self.total = 0
+
+
+def _rotulos(pares):
+    if not pares:
+        return ''
+    itens = []
+    for nome, valor in pares:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        itens.append(f'{nome}="{valor}"')
+    return '{' + ','.join(itens) + '}'
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        if valor == float('inf'):
+            return '+Inf'
+        return repr(valor)
+    return str(valor)
+
+
+class _Fase:
+    """Context manager que mede uma fase e conta exceções como erro"""
+    __slots__ = ('_metricas', '_nome', '_inicio')
+
+    def __init__(self, metricas, nome):
+        self._metricas = metricas
+        self._nome = nome
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metricas.observar_fase(self._nome, time.perf_counter() - self._inicio, erro=exc_type is not None)
+        return False
+
+
+class _FaseInativa:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_FASE_INATIVA = _FaseInativa()
+
+
+class Metricas:
+    """Registro das métricas do processo"""
+
+    def __init__(self, limites=LIMITES_PADRAO, ativas=METRICAS_ATIVAS):
+        self.limites = tuple(limites)
+        self.ativas = ativas
+        self._lock = threading.Lock()
+        # (metodo, rota) -> Histograma
+        self._requisicoes = {}
+        # (metodo, rota, status) -> quantidade
+        self._respostas = {}
+        # (rota, fase) -> Histograma
+        self._fases = {}
+        # (rota, fase) -> quantidade de exceções
+        self._erros_fase = {}
+        # [(nome, ajuda, tipo, funcao)]; funcao() -> [(rótulos, valor)]
+        self._medidores = []
+
+    def _observar(self, tabela, chave, duracao):
+        indice = bisect_left(self.limites, duracao)
+        histograma = tabela.get(chave)
+        if histograma is None:
+            histograma = tabela[chave] = Histograma(len(self.limites))
+        histograma.contagens[indice] += 1
+        histograma.soma += duracao
+        histograma.total += 1
+
+    def observar_requisicao(self, metodo, rota, status, duracao):
+        if not self.ativas:
+            return
+        with self._lock:
+            self._observar(self._requisicoes, (metodo, rota), duracao)
+            chave = (metodo, rota, status)
+            self._respostas[chave] = self._respostas.get(chave, 0) + 1
+
+    def observar_fase(self, fase, duracao, erro=False, rota=None):
+        if not self.ativas:
+            return
+        chave = (rota if rota is not None else rota_atual(), fase)
+        with self._lock:
+            self._observar(self._fases, chave, duracao)
+            if erro:
+                self._erros_fase[chave] = self._erros_fase.get(chave, 0) + 1
+
+    def fase(self, nome):
+        """`with metricas.fase('nome'):` mede o bloco como uma fase da rota atual"""
+        if not self.ativas:
+            return _FASE_INATIVA
+        return _Fase(self, nome)
+
+    def medidor(self, nome, ajuda, funcao, tipo='gauge'):
+        """Registra um valor lido na coleta; `funcao()` retorna [(rótulos, valor)]"""
+        self._medidores.append((nome, ajuda, tipo, funcao))
+
+    def _exportar_histogramas(self, linhas, nome, ajuda, tabela, nomes_rotulos):
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} histogram')
+        for chave, histograma in sorted(tabela.items()):
+            pares = list(zip(nomes_rotulos, chave))
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float('inf'),), histograma.contagens):
+                acumulado += contagem
+                linhas.append(f"{nome}_bucket{_rotulos(pares + [('le', _numero(float(limite)))])} {acumulado}")
+            linhas.append(f'{nome}_sum{_rotulos(pares)} {_numero(histograma.soma)}')
+            linhas.append(f'{nome}_count{_rotulos(pares)} {histograma.total}')
+
+    def _exportar_contadores(self, linhas, nome, ajuda, tabela, nomes_rotulos):
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} counter')
+        for chave, valor in sorted(tabela.items()):
+            linhas.append(f'{nome}{_rotulos(list(zip(nomes_rotulos, chave)))} {valor}')
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            requisicoes = {chave: _copiar(h) for chave, h in self._requisicoes.items()}
+            respostas = dict(self._respostas)
+            fases = {chave: _copiar(h) for chave, h in self._fases.items()}
+            erros_fase = dict(self._erros_fase)
+
+        linhas = []
+        self._exportar_histogramas(linhas, 'api_requisicao_duracao_segundos',
+                                   'Duração das requisições HTTP por rota', requisicoes, ('metodo', 'rota'))
+        self._exportar_contadores(linhas, 'api_requisicoes_total',
+                                  'Requisições HTTP por rota e status', respostas, ('metodo', 'rota', 'status'))
+        self._exportar_histogramas(linhas, 'api_fase_duracao_segundos',
+                                   'Duração de cada fase do processamento por rota', fases, ('rota', 'fase'))
+        self._exportar_contadores(linhas, 'api_fase_erros_total',
+                                  'Fases encerradas com exceção por rota', erros_fase, ('rota', 'fase'))
+
+        for nome, ajuda, tipo, funcao in self._medidores:
+            try:
+                valores = funcao()
+            except Exception:
+                # Um medidor com problema não derruba a coleta dos demais
+                continue
+            linhas.append(f'# HELP {nome} {ajuda}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+            for rotulos, valor in valores:
+                linhas.append(f'{nome}{_rotulos(sorted(rotulos.items()))} {_numero(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _copiar(histograma):
+    copia = Histograma(len(histograma.contagens) - 1)
+    copia.contagens = list(histograma.contagens)
+    copia.soma = histograma.soma
+    copia.total = histograma.total
+    return copia
+
+
+metricas = Metricas()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Aplica as migrações versionadas de database/migracoes em ordem
+"""
+import os
+import re
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from pool_conexoes import get_db_connection
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+PASTA_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database')
+PASTA_MIGRACOES = os.path.join(PASTA_DATABASE, 'migracoes')
+ARQUIVO_SCHEMA = os.path.join(PASTA_DATABASE, 'SistemasCorporativos.sql')
+
+
+def _somente_comentarios(instrucao):
+    return all(not linha.strip() or linha.strip().startswith('--') for linha in instrucao.splitlines())
+
+
+def ler_instrucoes(texto):
+    """Divide um script SQL em instruções, respeitando a sintaxe DELIMITER"""
+    delimitador = ';'
+    atual = []
+    instrucoes = []
+    for linha in texto.splitlines():
+        if linha.strip().upper().startswith('DELIMITER '):
+            delimitador = linha.strip().split()[1]
+            continue
+        atual.append(linha)
+        if linha.rstrip().endswith(delimitador):
+            instrucao = '\n'.join(atual).rstrip()[:-len(delimitador)].strip()
+            atual = []
+            if not _somente_comentarios(instrucao):
+                instrucoes.append(instrucao)
+    resto = '\n'.join(atual).strip()
+    if resto and not _somente_comentarios(resto):
+        instrucoes.append(resto)
+    return instrucoes
+
+
+def sem_comentarios_iniciais(instrucao):
+    """Remove as linhas de comentário e em branco antes da instrução"""
+    linhas = instrucao.splitlines()
+    while linhas and (not linhas[0].strip() or linhas[0].strip().startswith('--')):
+        linhas.pop(0)
+    return '\n'.join(linhas)
+
+
+def procedures_do_schema():
+    """Retorna [(nome, CREATE PROCEDURE ...)] definidos em SistemasCorporativos.sql"""
+    with open(ARQUIVO_SCHEMA, encoding='utf-8') as arquivo:
+        instrucoes = [sem_comentarios_iniciais(i) for i in ler_instrucoes(arquivo.read())]
+    return [
+        (re.match(r'CREATE PROCEDURE (\w+)', i).group(1), i)
+        for i in instrucoes if i.startswith('CREATE PROCEDURE')
+    ]
+
+
+def listar_migracoes():
+    """Retorna [(versao, caminho)] ordenado pela versão"""
+    arquivos = sorted(f for f in os.listdir(PASTA_MIGRACOES) if re.match(r'^\d{3}_.+\.sql$', f))
+    return [(f[:-4], os.path.join(PASTA_MIGRACOES, f)) for f in arquivos]
+
+
+def migracoes_aplicadas(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS MigracoesAplicadas (
+            Versao VARCHAR(100) NOT NULL,
+            DataAplicacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT PK_MigracoesAplicadas PRIMARY KEY (Versao)
+        )
+    """)
+    cursor.execute("SELECT Versao FROM MigracoesAplicadas")
+    return {linha[0] for linha in cursor.fetchall()}
+
+
+def aplicar_migracoes():
+    """Aplica as migrações pendentes e retorna as versões aplicadas"""
+    conexao = get_db_connection()
+    cursor = conexao.cursor()
+    aplicadas = []
+    try:
+        ja_aplicadas = migracoes_aplicadas(cursor)
+        for versao, caminho in listar_migracoes():
+            if versao in ja_aplicadas:
+                continue
+            print(f"Aplicando migração {versao}...")
+            with open(caminho, encoding='utf-8') as arquivo:
+                for instrucao in ler_instrucoes(arquivo.read()):
+                    cursor.execute(instrucao)
+            cursor.execute("INSERT INTO MigracoesAplicadas (Versao) VALUES (%s)", (versao,))
+            conexao.commit()
+            aplicadas.append(versao)
+        return aplicadas
+    finally:
+        cursor.close()
+        conexao.close()
+
+
+if __name__ == "__main__":
+    print("=== Migrações do Banco de Dados ===\n")
+    try:
+        aplicadas = aplicar_migracoes()
+    except mysql.connector.Error as e:
+        print(f"\n❌ Erro ao aplicar migrações: {e}")
+        exit(1)
+
+    if aplicadas:
+        print(f"\n✅ {len(aplicadas)} migração(ões) aplicada(s): {', '.join(aplicadas)}")
+    else:
+        print("✅ Banco de dados já está atualizado!")
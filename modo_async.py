@@ -0,0 +1,60 @@
+"""
+Seleção do runtime do servidor: threading, eventlet ou gevent
+
+Nos modos cooperativos (eventlet/gevent) todas as conexões rodam em green
+threads de um único thread do sistema. O que bloqueia sem passar pelo hub
+(extensões C como o bcrypt) precisa ir para um thread real com
+executar_em_thread_real(), e o driver MySQL precisa ser o puro Python, cujo
+socket é substituído pelo monkey patch.
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+MODOS_ASYNC = ('threading', 'eventlet', 'gevent')
+
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading').lower()
+if ASYNC_MODE not in MODOS_ASYNC:
+    raise ValueError(f"SOCKETIO_ASYNC_MODE deve ser um de: {', '.join(MODOS_ASYNC)}")
+
+_aplicado = False
+
+
+def modo_cooperativo():
+    """Indica se o servidor roda em green threads (eventlet ou gevent)"""
+    return ASYNC_MODE != 'threading'
+
+
+def aplicar_monkey_patch():
+    """Troca socket, threading e time pelas versões cooperativas
+
+    Deve ser chamado antes de qualquer outro import no módulo principal.
+    """
+    global _aplicado
+    if _aplicado:
+        return
+    if ASYNC_MODE == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif ASYNC_MODE == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    _aplicado = True
+
+
+def executar_em_thread_real(funcao, *args):
+    """Executa `funcao` em um thread do sistema sem bloquear o hub
+
+    A green thread que chama fica suspensa até o resultado; as demais seguem
+    atendendo requisições e sockets.
+    """
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(funcao, *args)
+    if ASYNC_MODE == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(funcao, args)
+    return funcao(*args)
@@ -0,0 +1,539 @@
+"""
+Motor de saldos em memória com gravação adiada no MySQL (ARMAZENAMENTO_BACKEND=motor)
+
+Os saldos ficam no processo e são a referência: cada operação trava só as
+contas envolvidas (em ordem de ID), valida o saldo aqui mesmo com as regras
+das stored procedures e registra as movimentações no log local
+(log_escrita.py). A resposta sai quando o registro está em disco; um fsync
+confirma todas as operações que chegaram juntas.
+
+Um thread aplica os registros do log no MySQL em lotes (Movimentacoes,
+ExtratoMovimentacoes, Correntistas e SaldosDiarios), e grava no mesmo commit
+a última sequência aplicada em MotorSaldos. Ao iniciar, o que está no log
+acima dessa sequência é reaplicado antes de carregar os saldos: depois de uma
+queda, o banco fica exatamente com as operações confirmadas aos clientes.
+
+Leituras: saldos vêm da memória; o extrato junta o MySQL com as movimentações
+ainda não aplicadas; estatísticas, histórico e exportação esperam o MySQL
+alcançar o que já foi confirmado. O motor precisa ser o único a alterar
+saldos e movimentações e roda em um único processo da API.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import mysql.connector
+
+from armazenamento import ArmazenamentoMySQL, OperacaoRecusada
+from armazenamento_memoria import ProcedimentosMemoria, ROTULOS_TIPO, ZERO, atende_filtros
+from log_escrita import LogEscrita, LogIndisponivel
+from paginacao import mesclar_paginas
+from pool_conexoes import get_db_connection, PoolEsgotadoError
+
+MOTOR_WAL_PASTA = os.getenv('MOTOR_WAL_PASTA', 'wal')
+MOTOR_WAL_SEGMENTO_MB = float(os.getenv('MOTOR_WAL_SEGMENTO_MB', '64'))
+MOTOR_LOTE_MAXIMO = int(os.getenv('MOTOR_LOTE_MAXIMO', '500'))
+MOTOR_APLICACAO_INTERVALO_MS = float(os.getenv('MOTOR_APLICACAO_INTERVALO_MS', '20'))
+MOTOR_PENDENTES_MAXIMO = int(os.getenv('MOTOR_PENDENTES_MAXIMO', '50000'))
+MOTOR_ESPERA_MAXIMA = float(os.getenv('MOTOR_ESPERA_MAXIMA', '10'))
+
+# Linha de MotorSaldos usada por este motor
+MOTOR_ID = 1
+
+CODIGOS_TIPO = {rotulo: codigo for codigo, rotulo in ROTULOS_TIPO.items()}
+
+logger = logging.getLogger(__name__)
+
+
+class MotorIndisponivel(Exception):
+    """O log local falhou ou a aplicação no MySQL está atrasada demais (503)
+
+    Só é levantada quando nada da operação foi aplicado: repetir é seguro.
+    """
+
+
+class OperacaoIncerta(Exception):
+    """A operação entrou no log, mas o fsync não confirmou a tempo
+
+    Ela pode ainda chegar ao MySQL (gravação só atrasada) ou não (log falhou);
+    repetir pode aplicá-la duas vezes. `movimentacoes` ([(UsuarioID, linha)])
+    são as movimentações em jogo.
+    """
+
+    def __init__(self, mensagem, movimentacoes):
+        super().__init__(mensagem)
+        self.movimentacoes = movimentacoes
+
+
+def _serializar(linha, saldo, usuario_id):
+    """Movimentação como gravada no log: Decimal em texto, data em ISO"""
+    return {
+        'MovimentacaoID': linha['MovimentacaoID'],
+        'CorrentistaID': linha['CorrentistaID'],
+        'UsuarioID': usuario_id,
+        'NomeCorrentista': linha['NomeCorrentista'],
+        'TipoOperacao': CODIGOS_TIPO[linha['TipoOperacao']],
+        'ValorOperacao': str(linha['ValorOperacao']),
+        'DataOperacao': linha['DataOperacao'].isoformat(),
+        'Descricao': linha['Descricao'],
+        'BeneficiarioID': linha['BeneficiarioID'],
+        'NomeBeneficiario': linha['NomeBeneficiario'],
+        'Saldo': str(saldo),
+    }
+
+
+class MotorSaldos(ProcedimentosMemoria):
+    """Saldos em memória, log local com group commit e aplicação em lotes no MySQL"""
+
+    nome = 'motor'
+
+    def __init__(self, pasta=MOTOR_WAL_PASTA, segmento_mb=MOTOR_WAL_SEGMENTO_MB, lote_maximo=MOTOR_LOTE_MAXIMO,
+                 intervalo_ms=MOTOR_APLICACAO_INTERVALO_MS, pendentes_maximo=MOTOR_PENDENTES_MAXIMO,
+                 espera_maxima=MOTOR_ESPERA_MAXIMA):
+        self.lote_maximo = lote_maximo
+        self.intervalo = intervalo_ms / 1000
+        self.pendentes_maximo = pendentes_maximo
+        self.espera_maxima = espera_maxima
+        self._mysql = ArmazenamentoMySQL()
+        self._log = LogEscrita(pasta, int(segmento_mb * 1024 * 1024))
+        self._inicio = threading.Lock()
+        self._iniciado = False
+
+        # Protege o dicionário de contas, as travas, o contador de IDs e as não aplicadas
+        self._estrutura = threading.Lock()
+        self._correntistas = {}
+        self._travas = {}
+        self._ultima_movimentacao = 0
+        # CorrentistaID -> {MovimentacaoID: (seq, linha)} ainda não aplicadas no MySQL
+        self._nao_aplicadas = {}
+        # CorrentistaID -> sequência do último registro que alterou o saldo
+        self._ultima_seq = {}
+
+        self._aplicacao = threading.Condition()
+        self._aplicado = 0
+        self._lotes = 0
+
+    # -----------------
+    # Inicialização e recuperação
+    # -----------------
+    def iniciar(self):
+        """Reaplica o log local, carrega os saldos e inicia a aplicação no MySQL (uma vez)"""
+        if self._iniciado:
+            return
+        with self._inicio:
+            if self._iniciado:
+                return
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT Sequencia FROM MotorSaldos WHERE MotorID = %s", (MOTOR_ID,))
+                linha = cursor.fetchone()
+                cursor.close()
+            finally:
+                conn.close()
+            aplicado = linha[0] if linha else 0
+
+            # Reaplica o que foi confirmado aos clientes mas não chegou ao MySQL
+            self._log.abrir(aplicado)
+            with self._aplicacao:
+                self._aplicado = max(self._aplicado, aplicado)
+            while True:
+                registros = self._log.duraveis(self.lote_maximo)
+                if not registros:
+                    break
+                self._aplicar(registros)
+                logger.info('Motor de saldos: %d registros do log reaplicados', len(registros))
+            self._log.confirmar(self._aplicado)
+
+            self._carregar_correntistas()
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COALESCE(MAX(MovimentacaoID), 0) FROM Movimentacoes")
+                self._ultima_movimentacao = cursor.fetchone()[0]
+                cursor.close()
+            finally:
+                conn.close()
+
+            threading.Thread(target=self._executar_aplicacao, name='motor-saldos', daemon=True).start()
+            self._iniciado = True
+
+    def _carregar_correntistas(self, ids=None):
+        """Lê do MySQL os correntistas ainda desconhecidos (todos, se `ids` for None)"""
+        sql = "SELECT CorrentistaID, NomeCorrentista, Saldo, UsuarioID FROM Correntistas"
+        params = ()
+        if ids is not None:
+            ids = sorted({int(i) for i in ids})
+            sql += f" WHERE CorrentistaID IN ({', '.join(['%s'] * len(ids))})"
+            params = tuple(ids)
+        linhas = self._mysql._consultar(sql, params)
+        with self._estrutura:
+            for linha in linhas:
+                conta = linha['CorrentistaID']
+                # Um saldo já em memória é sempre mais novo que o do banco
+                if conta not in self._correntistas:
+                    self._correntistas[conta] = dict(linha)
+                    self._travas[conta] = threading.Lock()
+
+    def _garantir_contas(self, contas):
+        """Inicia o motor e carrega contas criadas no MySQL depois da carga inicial"""
+        self.iniciar()
+        faltantes = [c for c in contas if int(c) not in self._correntistas]
+        if faltantes:
+            self._carregar_correntistas(faltantes)
+
+    # -----------------
+    # Usuários (no MySQL)
+    # -----------------
+    def buscar_usuario_por_email(self, email):
+        return self._mysql.buscar_usuario_por_email(email)
+
+    def buscar_usuario(self, usuario_id):
+        return self._mysql.buscar_usuario(usuario_id)
+
+    def criar_usuario(self, email, senha_hash, nome):
+        return self._mysql.criar_usuario(email, senha_hash, nome)
+
+    # -----------------
+    # Correntistas: quem é dono vem do MySQL, o saldo da memória
+    # -----------------
+    def _aguardar_contas(self, contas):
+        """Espera em disco o último registro que alterou as contas (leitura só do confirmado)"""
+        seq = max((self._ultima_seq.get(c, 0) for c in contas), default=0)
+        if seq:
+            self._aguardar(seq)
+
+    def listar_correntistas(self, usuario_id):
+        linhas = self._mysql.listar_correntistas(usuario_id)
+        contas = [linha['CorrentistaID'] for linha in linhas]
+        self._garantir_contas(contas)
+        self._aguardar_contas(contas)
+        for linha in linhas:
+            linha['Saldo'] = self._correntistas[linha['CorrentistaID']]['Saldo']
+        return linhas
+
+    def ids_correntistas(self, usuario_id):
+        return self._mysql.ids_correntistas(usuario_id)
+
+    def buscar_correntista(self, correntista_id):
+        conta = int(correntista_id)
+        self._garantir_contas([conta])
+        correntista = self._correntistas.get(conta)
+        if correntista is None:
+            return None
+        self._aguardar_contas([conta])
+        return {'CorrentistaID': conta, 'NomeCorrentista': correntista['NomeCorrentista'],
+                'Saldo': correntista['Saldo']}
+
+    # -----------------
+    # Leituras do extrato
+    # -----------------
+    def _nao_aplicadas_de(self, contas, filtros, cursor_pagina):
+        """Movimentações ainda fora do MySQL, mais recentes primeiro, e a maior sequência entre elas"""
+        with self._estrutura:
+            copia = [item for c in contas for item in self._nao_aplicadas.get(int(c), {}).values()]
+        linhas = [linha for _, linha in copia if atende_filtros(linha, filtros, cursor_pagina)]
+        linhas.sort(key=lambda linha: (linha['DataOperacao'], linha['MovimentacaoID']), reverse=True)
+        return linhas, max((seq for seq, _ in copia), default=0)
+
+    def _completar(self, linhas, nao_aplicadas, seq, limite):
+        # A cópia é feita antes da consulta: o que foi aplicado entre uma e outra aparece nas duas
+        no_banco = {linha['MovimentacaoID'] for linha in linhas}
+        nao_aplicadas = [dict(linha) for linha in nao_aplicadas if linha['MovimentacaoID'] not in no_banco]
+        if seq:
+            self._aguardar(seq)
+        if not nao_aplicadas:
+            return linhas
+        if limite is None:
+            return mesclar_paginas([linhas, nao_aplicadas], len(linhas) + len(nao_aplicadas))
+        return mesclar_paginas([linhas, nao_aplicadas], limite)
+
+    def extrato(self, correntista_id, filtros=None, cursor_pagina=None, limite=None):
+        self.iniciar()
+        nao_aplicadas, seq = self._nao_aplicadas_de([correntista_id], filtros, cursor_pagina)
+        linhas = self._mysql.extrato(correntista_id, filtros, cursor_pagina, limite)
+        return self._completar(linhas, nao_aplicadas, seq, limite)
+
+    def movimentacoes_usuario(self, usuario_id, correntistas, filtros=None, cursor_pagina=None, limite=None):
+        self.iniciar()
+        nao_aplicadas, seq = self._nao_aplicadas_de(correntistas, filtros, cursor_pagina)
+        linhas = self._mysql.movimentacoes_usuario(usuario_id, correntistas, filtros, cursor_pagina, limite)
+        return self._completar(linhas, nao_aplicadas, seq, limite)
+
+    def _aguardar_aplicacao(self):
+        """Espera o MySQL conter tudo o que já foi confirmado até agora"""
+        self.iniciar()
+        alvo = self._log.ultima()
+        with self._aplicacao:
+            if not self._aplicacao.wait_for(lambda: self._aplicado >= alvo, self.espera_maxima):
+                raise MotorIndisponivel('Aplicação das operações no MySQL atrasada')
+
+    def abrir_exportacao(self, correntista_id, filtros=None):
+        self._aguardar_aplicacao()
+        return self._mysql.abrir_exportacao(correntista_id, filtros)
+
+    def estatisticas(self, usuario_id, inicio=None, fim=None):
+        self._aguardar_aplicacao()
+        return self._mysql.estatisticas(usuario_id, inicio, fim)
+
+    def historico_saldos(self, correntista_ids, granularidade='dia', inicio=None, fim=None):
+        self._aguardar_aplicacao()
+        return self._mysql.historico_saldos(correntista_ids, granularidade, inicio, fim)
+
+    # -----------------
+    # Operações
+    # -----------------
+    def _proximo_id(self):
+        with self._estrutura:
+            self._ultima_movimentacao += 1
+            return self._ultima_movimentacao
+
+    def _travar(self, contas):
+        """Trava as contas existentes em ordem de ID; retorna as travas para liberar"""
+        travas = [self._travas[c] for c in sorted({int(c) for c in contas}) if c in self._travas]
+        for trava in travas:
+            trava.acquire()
+        return travas
+
+    def _verificar_disponivel(self):
+        if self._log.falhou():
+            raise MotorIndisponivel('Log local do motor de saldos indisponível')
+        if self._log.pendentes() >= self.pendentes_maximo:
+            raise MotorIndisponivel('Aplicação das operações no MySQL atrasada')
+
+    def _serializar(self, linhas):
+        """Movimentações com o saldo logo após a operação, para o log"""
+        movimentacoes = []
+        for linha in linhas:
+            correntista = self._correntistas[linha['CorrentistaID']]
+            movimentacoes.append(_serializar(linha, correntista['Saldo'], correntista['UsuarioID']))
+        return movimentacoes
+
+    def _saldos(self, contas):
+        """Saldos atuais das contas travadas, para desfazer a operação se o log recusar o registro"""
+        return {c: self._correntistas[c]['Saldo'] for c in set(contas) if c in self._correntistas}
+
+    def _registrar_operacao(self, movimentacoes, linhas, saldos_anteriores):
+        """Acrescenta as movimentações ao log (com as contas ainda travadas); retorna a sequência
+
+        Se o log não aceitar o registro, os saldos voltam a `saldos_anteriores`:
+        nada fica na memória sem estar no log.
+        """
+        with self._estrutura:
+            try:
+                seq = self._log.acrescentar({'movimentacoes': movimentacoes})
+            except LogIndisponivel as ex:
+                for conta, saldo in saldos_anteriores.items():
+                    self._correntistas[conta]['Saldo'] = saldo
+                raise MotorIndisponivel(f'Log local do motor de saldos indisponível: {ex}')
+            for linha in linhas:
+                self._nao_aplicadas.setdefault(linha['CorrentistaID'], {})[linha['MovimentacaoID']] = (seq, linha)
+                self._ultima_seq[linha['CorrentistaID']] = seq
+        return seq
+
+    def _aguardar(self, seq):
+        try:
+            duravel = self._log.aguardar(seq, self.espera_maxima)
+        except LogIndisponivel as ex:
+            raise MotorIndisponivel(f'Log local do motor de saldos indisponível: {ex}')
+        if not duravel:
+            raise MotorIndisponivel('Gravação do log local atrasada')
+
+    def _confirmar(self, seq, movimentacoes):
+        """Espera o registro de uma operação já aplicada na memória
+
+        Depois de `_registrar_operacao` não há como desfazer: se o fsync não
+        confirmar, o resultado é incerto. Os saldos em memória não ficam
+        expostos enquanto isso: leituras dessas contas e operações novas
+        também esperam o registro (ou recusam com o log em falha).
+        """
+        try:
+            self._aguardar(seq)
+        except MotorIndisponivel as ex:
+            raise OperacaoIncerta(f'Resultado da operação incerto: {ex}', movimentacoes)
+
+    def executar(self, spec, dados, usuario_id):
+        """Mesmo contrato de ArmazenamentoMySQL.executar; responde depois do fsync do log"""
+        contas = [int(c) for c in spec.contas(dados)]
+        self._garantir_contas(contas)
+        self._verificar_disponivel()
+
+        travas = self._travar(contas)
+        try:
+            if self._dono(contas[0]) != usuario_id:
+                raise OperacaoRecusada(spec.erro_autorizacao, 403)
+            saldos = self._saldos(contas)
+            linhas = self._executar_procedure(spec, dados)
+            seq = self._registrar_operacao(self._serializar(linhas), linhas, saldos)
+            movimentacoes = self._retornar(*linhas)
+        finally:
+            for trava in travas:
+                trava.release()
+
+        self._confirmar(seq, movimentacoes)
+        return movimentacoes
+
+    def executar_bloco(self, bloco, usuario_id, recusar):
+        """Mesmo contrato de ArmazenamentoMySQL.executar_bloco; o bloco vira um único registro do log"""
+        contas = [int(c) for _, spec, item in bloco for c in spec.contas(item)]
+        self._garantir_contas(contas)
+        self._verificar_disponivel()
+
+        concluidos = []
+        movimentacoes = []
+        linhas_bloco = []
+        travas = self._travar(contas)
+        try:
+            donos = {c: self._dono(c) for c in contas}
+            saldos = self._saldos(contas)
+            for indice, spec, item in bloco:
+                if donos.get(int(spec.contas(item)[0])) != usuario_id:
+                    recusar(indice, 403, spec.erro_autorizacao)
+                    continue
+                try:
+                    linhas = self._executar_procedure(spec, item)
+                except OperacaoRecusada as ex:
+                    recusar(indice, ex.status, str(ex))
+                    continue
+                except mysql.connector.Error as ex:
+                    # As validações acontecem antes de alterar a memória: só este item falha
+                    recusar(indice, 500, f"{spec.erro}: {ex}")
+                    continue
+                movimentacoes.extend(self._serializar(linhas))
+                linhas_bloco.extend(linhas)
+                concluidos.append((indice, spec, item, linhas))
+
+            seq = self._registrar_operacao(movimentacoes, linhas_bloco, saldos) if linhas_bloco else 0
+            concluidos = [(indice, spec, item, self._retornar(*linhas)) for indice, spec, item, linhas in concluidos]
+        finally:
+            for trava in travas:
+                trava.release()
+
+        if seq:
+            self._confirmar(seq, [mov for *_, movs in concluidos for mov in movs])
+        return donos, concluidos
+
+    # -----------------
+    # Aplicação no MySQL
+    # -----------------
+    def _executar_aplicacao(self):
+        falhas = 0
+        while True:
+            registros = self._log.duraveis(self.lote_maximo)
+            if not registros:
+                time.sleep(self.intervalo)
+                continue
+            try:
+                self._aplicar(registros)
+                falhas = 0
+            except (mysql.connector.Error, PoolEsgotadoError):
+                # Os registros continuam no log; tenta de novo com espera crescente
+                falhas += 1
+                logger.exception('Falha ao aplicar %d registros do motor de saldos no MySQL', len(registros))
+                time.sleep(min(self.intervalo * 2 ** falhas, 5))
+                continue
+            if len(registros) < self.lote_maximo:
+                # Janela para juntar mais registros no próximo lote
+                time.sleep(self.intervalo)
+
+    def _aplicar(self, registros):
+        """Grava um lote de registros do log no MySQL em uma transação"""
+        movimentacoes = []
+        extrato = []
+        saldos = {}
+        diarios = {}
+        for _, registro in registros:
+            for mov in registro['movimentacoes']:
+                valor = Decimal(mov['ValorOperacao'])
+                data = datetime.fromisoformat(mov['DataOperacao'])
+                credito = mov['TipoOperacao'] == 'C'
+                movimentacoes.append((
+                    mov['MovimentacaoID'], mov['TipoOperacao'], mov['CorrentistaID'], valor, data,
+                    mov['Descricao'], mov['BeneficiarioID']
+                ))
+                extrato.append((
+                    mov['MovimentacaoID'], mov['UsuarioID'], mov['CorrentistaID'], mov['NomeCorrentista'],
+                    mov['TipoOperacao'], valor, valor if credito else -valor, data, mov['Descricao'],
+                    mov['BeneficiarioID'], mov['NomeBeneficiario']
+                ))
+                # Cada movimentação é uma chamada de spAtualizarSaldoDiario na sua conta
+                saldo = Decimal(mov['Saldo'])
+                saldos[mov['CorrentistaID']] = saldo
+                dia = diarios.setdefault((mov['CorrentistaID'], data.date()), [ZERO, ZERO, 0, None])
+                dia[0 if credito else 1] += valor
+                dia[2] += 1
+                dia[3] = saldo
+        ultimo = registros[-1][0]
+
+        conn = get_db_connection()
+        cursor = None
+        try:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO Movimentacoes (MovimentacaoID, TipoOperacao, CorrentistaID, ValorOperacao, "
+                "DataOperacao, Descricao, CorrentistaBeneficiarioID) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                movimentacoes
+            )
+            cursor.executemany(
+                "INSERT INTO ExtratoMovimentacoes (MovimentacaoID, UsuarioID, CorrentistaID, NomeCorrentista, "
+                "TipoOperacao, ValorOperacao, ValorAssinado, DataOperacao, Descricao, BeneficiarioID, "
+                "NomeBeneficiario) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                extrato
+            )
+            cursor.executemany(
+                "UPDATE Correntistas SET Saldo = %s WHERE CorrentistaID = %s",
+                [(saldo, conta) for conta, saldo in sorted(saldos.items())]
+            )
+            cursor.executemany(
+                "INSERT INTO SaldosDiarios (CorrentistaID, Data, TotalCreditos, TotalDebitos, Quantidade, "
+                "SaldoFechamento) VALUES (%s, %s, %s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE "
+                "TotalCreditos = TotalCreditos + VALUES(TotalCreditos), "
+                "TotalDebitos = TotalDebitos + VALUES(TotalDebitos), "
+                "Quantidade = Quantidade + VALUES(Quantidade), "
+                "SaldoFechamento = VALUES(SaldoFechamento)",
+                [(conta, data, *valores) for (conta, data), valores in sorted(diarios.items())]
+            )
+            # Ponto de aplicação no mesmo commit: uma queda não aplica nada duas vezes
+            cursor.execute(
+                "INSERT INTO MotorSaldos (MotorID, Sequencia, DataAtualizacao) VALUES (%s, %s, NOW()) "
+                "ON DUPLICATE KEY UPDATE Sequencia = VALUES(Sequencia), DataAtualizacao = VALUES(DataAtualizacao)",
+                (MOTOR_ID, ultimo)
+            )
+            conn.commit()
+        except mysql.connector.Error:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+        self._log.confirmar(ultimo)
+        with self._estrutura:
+            for _, registro in registros:
+                for mov in registro['movimentacoes']:
+                    pendentes = self._nao_aplicadas.get(mov['CorrentistaID'])
+                    if pendentes is not None:
+                        pendentes.pop(mov['MovimentacaoID'], None)
+                        if not pendentes:
+                            del self._nao_aplicadas[mov['CorrentistaID']]
+        with self._aplicacao:
+            self._aplicado = ultimo
+            self._lotes += 1
+            self._aplicacao.notify_all()
+
+    def situacao(self):
+        """Sequências do log e do MySQL, para as métricas"""
+        situacao = self._log.situacao()
+        with self._aplicacao:
+            situacao['aplicado'] = self._aplicado
+            situacao['lotes'] = self._lotes
+        return situacao
@@ -0,0 +1,173 @@
+"""
+Agrupamento por sala dos eventos enviados via Socket.IO
+
+O primeiro envio para uma sala ociosa sai na hora. Os que chegam dentro da
+janela seguinte são acumulados e enviados juntos em um único frame 'eventos'
+quando a janela termina ou quando o lote atinge o tamanho máximo. Sem novos
+eventos por uma janela inteira, a sala volta a ser ociosa.
+
+Os eventos de uma mesma ação (ex.: a notificação e a nova movimentação de
+uma operação) vão juntos em `enviar_juntos` e contam como um único envio:
+numa sala ociosa, saem todos na hora no mesmo frame.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+
+NOTIFICACAO_JANELA_MS = int(os.getenv('NOTIFICACAO_JANELA_MS', '50'))
+NOTIFICACAO_LOTE_MAXIMO = int(os.getenv('NOTIFICACAO_LOTE_MAXIMO', '200'))
+
+logger = logging.getLogger(__name__)
+
+
+class _Sala:
+    __slots__ = ('ultimo_envio', 'pendentes', 'chaves', 'agendada')
+
+    def __init__(self, agora):
+        self.ultimo_envio = agora
+        self.pendentes = []
+        # chave -> posição em `pendentes`, para substituir em vez de acumular
+        self.chaves = {}
+        self.agendada = False
+
+
+class AgrupadorEventos:
+    """Agrupa os eventos de cada sala em janelas de `janela_ms`
+
+    `emitir(sala, evento, dados)` faz o envio de fato; é chamado fora do lock,
+    pelo thread da requisição (evento imediato ou lote cheio) ou pelo thread
+    do agrupador (fim da janela). Com `janela_ms` 0 todo evento sai na hora.
+    """
+
+    def __init__(self, emitir, janela_ms=NOTIFICACAO_JANELA_MS, lote_maximo=NOTIFICACAO_LOTE_MAXIMO):
+        self._emitir = emitir
+        self.janela = janela_ms / 1000
+        self.lote_maximo = max(1, lote_maximo)
+        self._salas = {}
+        self._prazos = []
+        self._condicao = threading.Condition()
+        self._thread = None
+        self._imediatos = 0
+        self._lotes = 0
+        self._agrupados = 0
+        self._substituidos = 0
+
+    def _agendar(self, sala, estado, prazo):
+        estado.agendada = True
+        heapq.heappush(self._prazos, (prazo, sala))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='agrupador-eventos', daemon=True)
+            self._thread.start()
+        self._condicao.notify()
+
+    def _retirar(self, estado, agora):
+        lote = estado.pendentes
+        estado.pendentes = []
+        estado.chaves = {}
+        estado.ultimo_envio = agora
+        self._lotes += 1
+        self._agrupados += len(lote)
+        return lote
+
+    def _acumular(self, estado, evento, dados, chave):
+        posicao = estado.chaves.get(chave) if chave is not None else None
+        if posicao is not None:
+            estado.pendentes[posicao] = (evento, dados)
+            self._substituidos += 1
+        else:
+            if chave is not None:
+                estado.chaves[chave] = len(estado.pendentes)
+            estado.pendentes.append((evento, dados))
+
+    def enviar(self, sala, evento, dados, chave=None):
+        """Envia agora se a sala está ociosa; senão acumula para o próximo lote
+
+        Eventos pendentes com a mesma `chave` (ex.: o saldo de uma conta) são
+        substituídos pelo mais recente.
+        """
+        self.enviar_juntos(sala, [(evento, dados, chave)])
+
+    def enviar_juntos(self, sala, eventos):
+        """Como `enviar`, para os eventos [(evento, dados, chave)] de uma mesma ação
+
+        Numa sala ociosa, todos saem na hora em um único frame.
+        """
+        if self.janela <= 0:
+            for evento, dados, _ in eventos:
+                self._emitir(sala, evento, dados)
+            return
+
+        agora = time.monotonic()
+        lote = None
+        with self._condicao:
+            estado = self._salas.get(sala)
+            if estado is None or (not estado.pendentes and agora - estado.ultimo_envio >= self.janela):
+                if estado is None:
+                    estado = self._salas[sala] = _Sala(agora)
+                estado.ultimo_envio = agora
+                if not estado.agendada:
+                    # O prazo também serve para descartar o estado da sala ociosa
+                    self._agendar(sala, estado, agora + self.janela)
+                imediatos = _Sala(agora)
+                for evento, dados, chave in eventos:
+                    self._acumular(imediatos, evento, dados, chave)
+                self._imediatos += len(imediatos.pendentes)
+                lote = imediatos.pendentes
+            else:
+                for evento, dados, chave in eventos:
+                    self._acumular(estado, evento, dados, chave)
+                if len(estado.pendentes) >= self.lote_maximo:
+                    lote = self._retirar(estado, agora)
+                elif not estado.agendada:
+                    self._agendar(sala, estado, estado.ultimo_envio + self.janela)
+
+        if lote:
+            self._enviar_lote(sala, lote)
+
+    def _enviar_lote(self, sala, lote):
+        if len(lote) == 1:
+            self._emitir(sala, *lote[0])
+        else:
+            self._emitir(sala, 'eventos', [{'evento': evento, 'dados': dados} for evento, dados in lote])
+
+    def _executar(self):
+        while True:
+            vencidos = []
+            with self._condicao:
+                while not self._prazos or self._prazos[0][0] > time.monotonic():
+                    espera = self._prazos[0][0] - time.monotonic() if self._prazos else None
+                    self._condicao.wait(espera)
+                agora = time.monotonic()
+                while self._prazos and self._prazos[0][0] <= agora:
+                    _, sala = heapq.heappop(self._prazos)
+                    estado = self._salas.get(sala)
+                    if estado is None:
+                        continue
+                    estado.agendada = False
+                    if estado.pendentes:
+                        vencidos.append((sala, self._retirar(estado, agora)))
+                        self._agendar(sala, estado, agora + self.janela)
+                    elif agora - estado.ultimo_envio >= self.janela:
+                        del self._salas[sala]
+                    else:
+                        self._agendar(sala, estado, estado.ultimo_envio + self.janela)
+            for sala, lote in vencidos:
+                try:
+                    self._enviar_lote(sala, lote)
+                except Exception:
+                    logger.exception('Falha ao enviar lote de eventos para %s', sala)
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                'janela_ms': round(self.janela * 1000),
+                'lote_maximo': self.lote_maximo,
+                'salas_ativas': len(self._salas),
+                'pendentes': sum(len(estado.pendentes) for estado in self._salas.values()),
+                'imediatos': self._imediatos,
+                'lotes': self._lotes,
+                'eventos_agrupados': self._agrupados,
+                'substituidos': self._substituidos
+            }
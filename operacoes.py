@@ -0,0 +1,280 @@
+"""
+Executor único das operações bancárias: validação, verificação de propriedade
+e execução no armazenamento configurado (a stored procedure no MySQL, com
+propriedade e commit na mesma transação)
+"""
+import os
+
+import mysql.connector
+
+from armazenamento import armazenamento, OperacaoRecusada
+from estatisticas import cache_estatisticas
+from motor_saldos import MotorIndisponivel, OperacaoIncerta
+from propriedade import indice_proprietarios
+
+LOTE_TAMANHO_BLOCO = int(os.getenv('LOTE_TAMANHO_BLOCO', '100'))
+
+
+class ResultadoOperacao:
+    """Resultado estruturado de uma operação, pronto para virar resposta HTTP"""
+
+    def __init__(self, sucesso, status, mensagem=None, erro=None, notificacao=None, dados=None,
+                 usuario_id=None, movimentacoes=None):
+        self.sucesso = sucesso
+        self.status = status
+        self.mensagem = mensagem
+        self.erro = erro
+        self.notificacao = notificacao
+        self.dados = dados or {}
+        self.usuario_id = usuario_id
+        # [(UsuarioID dono da conta, linha do extrato com o Saldo resultante)]
+        self.movimentacoes = movimentacoes or []
+
+    @classmethod
+    def falha(cls, status, erro):
+        return cls(False, status, erro=erro)
+
+    def corpo(self):
+        if self.sucesso:
+            corpo = {"mensagem": self.mensagem}
+            if self.movimentacoes:
+                # Só as contas do próprio usuário: o saldo do beneficiário não é exposto
+                corpo["movimentacoes"] = [
+                    linha for dono, linha in self.movimentacoes if dono == self.usuario_id
+                ]
+            return corpo
+        return {"erro": self.erro}
+
+
+class TipoOperacao:
+    """Descreve como validar, autorizar e executar um tipo de operação"""
+
+    def __init__(self, nome, procedure, campos, argumentos, contas, efeitos, mensagem,
+                 notificacao, dados_notificacao, erro, erro_autorizacao, validar=None):
+        self.nome = nome
+        self.procedure = procedure
+        self.campos = campos
+        self.argumentos = argumentos
+        self.contas = contas
+        # ((CorrentistaID, valor com sinal), ...) aplicados ao saldo de cada conta
+        self.efeitos = efeitos
+        self.mensagem = mensagem
+        self.notificacao = notificacao
+        self.dados_notificacao = dados_notificacao
+        self.erro = erro
+        self.erro_autorizacao = erro_autorizacao
+        self._validar = validar
+
+    def validar(self, dados):
+        """Retorna a mensagem de erro de validação ou None"""
+        if not all(dados.get(campo) for campo in self.campos):
+            return "Dados incompletos"
+        valor = dados['valor']
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            return "Valor deve ser numérico"
+        if valor <= 0:
+            return "Valor deve ser positivo"
+        try:
+            [int(conta) for conta in self.contas(dados)]
+        except (TypeError, ValueError):
+            return "Identificador de correntista inválido"
+        if self._validar:
+            return self._validar(dados)
+        return None
+
+
+def _validar_transferencia(dados):
+    # validar() já confirmou que os dois convertem para int (ex.: 1 e "1" são a mesma conta)
+    if int(dados['correntista_id_origem']) == int(dados['correntista_id_destino']):
+        return "Não é possível transferir para a mesma conta"
+    return None
+
+
+TIPOS_OPERACAO = {
+    'pagamento': TipoOperacao(
+        nome='pagamento',
+        procedure='spPagar',
+        campos=('correntista_id', 'valor', 'descricao'),
+        argumentos=lambda d: (d['correntista_id'], d['valor'], d['descricao']),
+        contas=lambda d: (d['correntista_id'],),
+        efeitos=lambda d: ((d['correntista_id'], -d['valor']),),
+        mensagem="Pagamento realizado com sucesso",
+        notificacao="Pagamento de R$ {valor:.2f} realizado com sucesso",
+        dados_notificacao=lambda d: {'valor': d['valor'], 'descricao': d['descricao'], 'correntista_id': d['correntista_id']},
+        erro="Erro ao realizar pagamento",
+        erro_autorizacao="Correntista não encontrado ou não autorizado"
+    ),
+    'transferencia': TipoOperacao(
+        nome='transferencia',
+        procedure='spTransferir',
+        campos=('correntista_id_origem', 'correntista_id_destino', 'valor'),
+        # spTransferir(p_CorrentistaID, p_ValorOperacao, p_CorrentistaBeneficiarioID)
+        argumentos=lambda d: (d['correntista_id_origem'], d['valor'], d['correntista_id_destino']),
+        contas=lambda d: (d['correntista_id_origem'], d['correntista_id_destino']),
+        efeitos=lambda d: ((d['correntista_id_origem'], -d['valor']), (d['correntista_id_destino'], d['valor'])),
+        mensagem="Transferência realizada com sucesso",
+        notificacao="Transferência de R$ {valor:.2f} realizada com sucesso",
+        dados_notificacao=lambda d: {'valor': d['valor'], 'origem_id': d['correntista_id_origem'], 'destino_id': d['correntista_id_destino']},
+        erro="Erro ao realizar transferência",
+        erro_autorizacao="Correntista de origem não encontrado ou não autorizado",
+        validar=_validar_transferencia
+    ),
+    'saque': TipoOperacao(
+        nome='saque',
+        procedure='spSacar',
+        campos=('correntista_id', 'valor'),
+        argumentos=lambda d: (d['correntista_id'], d['valor']),
+        contas=lambda d: (d['correntista_id'],),
+        efeitos=lambda d: ((d['correntista_id'], -d['valor']),),
+        mensagem="Saque realizado com sucesso",
+        notificacao="Saque de R$ {valor:.2f} realizado com sucesso",
+        dados_notificacao=lambda d: {'valor': d['valor'], 'correntista_id': d['correntista_id']},
+        erro="Erro ao realizar saque",
+        erro_autorizacao="Correntista não encontrado ou não autorizado"
+    ),
+    'deposito': TipoOperacao(
+        nome='deposito',
+        procedure='spDepositar',
+        campos=('correntista_id', 'valor'),
+        argumentos=lambda d: (d['correntista_id'], d['valor']),
+        contas=lambda d: (d['correntista_id'],),
+        efeitos=lambda d: ((d['correntista_id'], d['valor']),),
+        mensagem="Depósito realizado com sucesso",
+        notificacao="Depósito de R$ {valor:.2f} realizado com sucesso",
+        dados_notificacao=lambda d: {'valor': d['valor'], 'correntista_id': d['correntista_id']},
+        erro="Erro ao realizar depósito",
+        erro_autorizacao="Correntista não encontrado ou não autorizado"
+    ),
+}
+
+
+def executar_operacao(tipo, dados, usuario_id):
+    """Valida, autoriza e executa uma operação em uma única transação"""
+    spec = TIPOS_OPERACAO[tipo]
+
+    erro = spec.validar(dados)
+    if erro:
+        return ResultadoOperacao.falha(400, erro)
+
+    contas = spec.contas(dados)
+    origem = contas[0]
+
+    try:
+        # Rejeição rápida pelo índice em memória, sem ocupar uma conexão
+        if not indice_proprietarios.pertence(origem, usuario_id):
+            return ResultadoOperacao.falha(403, spec.erro_autorizacao)
+
+        movimentacoes = armazenamento.executar(spec, dados, usuario_id)
+    except OperacaoRecusada as ex:
+        if ex.status == 403:
+            indice_proprietarios.invalidar_usuario(usuario_id)
+        return ResultadoOperacao.falha(ex.status, str(ex))
+    except mysql.connector.Error as ex:
+        return ResultadoOperacao.falha(500, f"{spec.erro}: {ex}")
+    except OperacaoIncerta as ex:
+        cache_estatisticas.invalidar_usuarios(*(dono for dono, _ in ex.movimentacoes))
+        raise
+
+    cache_estatisticas.invalidar_usuarios(*(dono for dono, _ in movimentacoes))
+
+    return ResultadoOperacao(
+        True, 201,
+        mensagem=spec.mensagem,
+        notificacao=spec.notificacao.format(valor=dados['valor']),
+        dados=spec.dados_notificacao(dados),
+        usuario_id=usuario_id,
+        movimentacoes=movimentacoes
+    )
+
+
+def _executar_bloco(bloco, usuario_id, resultados, afetados):
+    """Executa um bloco do lote em uma transação, com um savepoint por item"""
+    def recusar(indice, status, erro):
+        resultados[indice] = ResultadoOperacao.falha(status, erro)
+
+    try:
+        donos, concluidos = armazenamento.executar_bloco(bloco, usuario_id, recusar)
+    except (mysql.connector.Error, MotorIndisponivel) as ex:
+        # Nada do bloco foi gravado
+        status = 503 if isinstance(ex, MotorIndisponivel) else 500
+        for indice, spec, item in bloco:
+            if resultados[indice] is None:
+                resultados[indice] = ResultadoOperacao.falha(status, f"{spec.erro}: {ex}")
+        return
+    except OperacaoIncerta as ex:
+        # O bloco pode ter sido gravado: os itens pendentes ficam como incertos
+        cache_estatisticas.invalidar_usuarios(*(dono for dono, _ in ex.movimentacoes))
+        for indice, spec, item in bloco:
+            if resultados[indice] is None:
+                resultados[indice] = ResultadoOperacao.falha(500, f"{ex}. Consulte o extrato antes de repetir")
+        return
+
+    contas_alteradas = set()
+    for indice, spec, item, movimentacoes in concluidos:
+        resultados[indice] = ResultadoOperacao(
+            True, 201,
+            mensagem=spec.mensagem,
+            notificacao=spec.notificacao.format(valor=item['valor']),
+            dados=spec.dados_notificacao(item)
+        )
+        for conta, valor in spec.efeitos(item):
+            conta = int(conta)
+            contas_alteradas.add(conta)
+            resumo = afetados.setdefault(donos.get(conta), {
+                'movimentacoes': 0, 'creditos': 0.0, 'debitos': 0.0, 'correntistas': set(), 'saldos': {}
+            })
+            resumo['movimentacoes'] += 1
+            resumo['correntistas'].add(conta)
+            if valor > 0:
+                resumo['creditos'] += valor
+            else:
+                resumo['debitos'] -= valor
+        # Os itens rodam em ordem na transação: o último saldo lido é o final
+        for dono, linha in movimentacoes:
+            if dono in afetados:
+                afetados[dono]['saldos'][linha['CorrentistaID']] = {
+                    'CorrentistaID': linha['CorrentistaID'],
+                    'NomeCorrentista': linha['NomeCorrentista'],
+                    'Saldo': linha['Saldo']
+                }
+
+    cache_estatisticas.invalidar_usuarios(*(donos.get(conta) for conta in contas_alteradas))
+
+
+def executar_lote(itens, usuario_id, tamanho_bloco=LOTE_TAMANHO_BLOCO):
+    """Executa várias operações em transações de até `tamanho_bloco` itens
+
+    Retorna a lista de ResultadoOperacao (na ordem recebida) e um resumo por
+    usuário afetado, para uma única notificação por usuário, com o saldo
+    final de cada conta alterada.
+    """
+    resultados = [None] * len(itens)
+    validos = []
+
+    # Propriedade de todas as contas de origem resolvida com uma consulta (ou nenhuma, no cache)
+    proprios = indice_proprietarios.correntistas_do_usuario(usuario_id)
+
+    for indice, item in enumerate(itens):
+        tipo = item.get('tipo') if isinstance(item, dict) else None
+        spec = TIPOS_OPERACAO.get(tipo) if isinstance(tipo, str) else None
+        if spec is None:
+            resultados[indice] = ResultadoOperacao.falha(400, "Tipo de operação inválido")
+            continue
+        erro = spec.validar(item)
+        if erro:
+            resultados[indice] = ResultadoOperacao.falha(400, erro)
+            continue
+        if int(spec.contas(item)[0]) not in proprios:
+            resultados[indice] = ResultadoOperacao.falha(403, spec.erro_autorizacao)
+            continue
+        validos.append((indice, spec, item))
+
+    afetados = {}
+    for inicio in range(0, len(validos), tamanho_bloco):
+        _executar_bloco(validos[inicio:inicio + tamanho_bloco], usuario_id, resultados, afetados)
+
+    afetados.pop(None, None)
+    for resumo in afetados.values():
+        resumo['correntistas'] = sorted(resumo['correntistas'])
+        resumo['saldos'] = [resumo['saldos'][c] for c in sorted(resumo['saldos'])]
+    return resultados, afetados
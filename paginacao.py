@@ -0,0 +1,71 @@
+"""
+Paginação por cursor (keyset) para as consultas de extrato
+"""
+import base64
+import heapq
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+PAGINACAO_LIMITE_PADRAO = int(os.getenv('PAGINACAO_LIMITE_PADRAO', '50'))
+PAGINACAO_LIMITE_MAXIMO = int(os.getenv('PAGINACAO_LIMITE_MAXIMO', '500'))
+
+
+def codificar_cursor(data_operacao, movimentacao_id):
+    """Gera um cursor opaco a partir da última linha de uma página"""
+    bruto = json.dumps([data_operacao.isoformat(), movimentacao_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (DataOperacao, MovimentacaoID) ou levanta ValueError"""
+    try:
+        preenchido = cursor + '=' * (-len(cursor) % 4)
+        data_operacao, movimentacao_id = json.loads(base64.urlsafe_b64decode(preenchido))
+        return datetime.fromisoformat(data_operacao), int(movimentacao_id)
+    except (ValueError, TypeError) as ex:
+        raise ValueError('Cursor inválido') from ex
+
+
+def ler_paginacao(args):
+    """Lê `limit` e `cursor` da query string, validando os valores"""
+    try:
+        limite = int(args.get('limit', PAGINACAO_LIMITE_PADRAO))
+    except ValueError:
+        raise ValueError('Parâmetro limit deve ser um número inteiro')
+    if limite < 1 or limite > PAGINACAO_LIMITE_MAXIMO:
+        raise ValueError(f'Parâmetro limit deve estar entre 1 e {PAGINACAO_LIMITE_MAXIMO}')
+
+    cursor = args.get('cursor')
+    return limite, decodificar_cursor(cursor) if cursor else None
+
+
+def filtro_cursor(cursor, prefixo=''):
+    """Trecho de WHERE que continua a partir do cursor (ordem decrescente)"""
+    if cursor is None:
+        return '', ()
+    data_operacao, movimentacao_id = cursor
+    filtro = (
+        f"AND ({prefixo}DataOperacao < %s "
+        f"OR ({prefixo}DataOperacao = %s AND {prefixo}MovimentacaoID < %s))"
+    )
+    return filtro, (data_operacao, data_operacao, movimentacao_id)
+
+
+def mesclar_paginas(paginas, limite):
+    """Intercala páginas já ordenadas (uma por correntista) e mantém `limite + 1` linhas"""
+    mescladas = heapq.merge(
+        *paginas, key=lambda linha: (linha['DataOperacao'], linha['MovimentacaoID']), reverse=True
+    )
+    return list(islice(mescladas, limite + 1))
+
+
+def montar_pagina(linhas, limite):
+    """Monta a resposta a partir de `limite + 1` linhas buscadas"""
+    itens = linhas[:limite]
+    proximo = None
+    if len(linhas) > limite:
+        ultimo = itens[-1]
+        proximo = codificar_cursor(ultimo['DataOperacao'], ultimo['MovimentacaoID'])
+    return {'itens': itens, 'next_cursor': proximo}
@@ -0,0 +1,342 @@
+"""
+Pool de conexões MySQL compartilhado pela API e pelos scripts auxiliares
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from consultas_lentas import consultas_lentas
+from metricas import metricas, rota_atual
+from modo_async import modo_cooperativo
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+# -----------------
+# Configuração do banco de dados MySQL
+# -----------------
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_USER = os.getenv('DB_USER', 'root')
+DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+DB_NAME = os.getenv('DB_NAME', 'SistemasCorporativos')
+
+# -----------------
+# Configuração do pool
+# -----------------
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'sim', 'yes')
+
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão ficou disponível dentro do tempo limite"""
+
+
+class CursorMedido:
+    """Cursor que mede execute/executemany/callproc
+
+    A duração entra nas métricas como fase da rota atual. Acima do limite de
+    consulta lenta, o registro é feito quando o cursor segue para a próxima
+    instrução ou é fechado, para já incluir as linhas lidas.
+    """
+
+    __slots__ = ('_cursor', '_lenta')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._lenta = None
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _medir(self, fase, tipo, metodo, operacao, params, kwargs):
+        self._concluir()
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(operacao, params, **kwargs)
+        except Exception:
+            metricas.observar_fase(fase, time.perf_counter() - inicio, erro=True)
+            raise
+        duracao = time.perf_counter() - inicio
+        metricas.observar_fase(fase, duracao)
+        if consultas_lentas.ativo and duracao >= consultas_lentas.limite:
+            self._lenta = (tipo, operacao, params, duracao, rota_atual())
+        return resultado
+
+    def _concluir(self):
+        if self._lenta is None:
+            return
+        tipo, operacao, params, duracao, rota = self._lenta
+        self._lenta = None
+        try:
+            linhas = self._cursor.rowcount
+        except Exception:
+            linhas = None
+        consultas_lentas.registrar(tipo, operacao, params, duracao, linhas if linhas != -1 else None, rota)
+
+    def execute(self, operacao, params=None, **kwargs):
+        return self._medir('execute', 'execute', self._cursor.execute, operacao, params, kwargs)
+
+    def executemany(self, operacao, seq_params, **kwargs):
+        return self._medir('execute', 'executemany', self._cursor.executemany, operacao, seq_params, kwargs)
+
+    def callproc(self, procedure, args=(), **kwargs):
+        return self._medir('callproc', 'callproc', self._cursor.callproc, procedure, args, kwargs)
+
+    def close(self):
+        self._concluir()
+        return self._cursor.close()
+
+    def __del__(self):
+        try:
+            self._concluir()
+        except Exception:
+            pass
+
+
+class ConexaoPool:
+    """Conexão emprestada do pool; close() devolve ao pool em vez de fechar"""
+
+    def __init__(self, pool, conexao, criada_em):
+        self._pool = pool
+        self._conexao = conexao
+        self._criada_em = criada_em
+
+    def __getattr__(self, nome):
+        conexao = self.__dict__.get('_conexao')
+        if conexao is None:
+            raise mysql.connector.InterfaceError(msg='Conexão já devolvida ao pool')
+        return getattr(conexao, nome)
+
+    def cursor(self, *args, **kwargs):
+        """Cursor da conexão, com execute/callproc medidos (métricas e consultas lentas)"""
+        cursor = self.__getattr__('cursor')(*args, **kwargs)
+        return CursorMedido(cursor) if metricas.ativas or consultas_lentas.ativo else cursor
+
+    def close(self):
+        """Devolve a conexão ao pool (pode ser chamado mais de uma vez)"""
+        conexao = self.__dict__.get('_conexao')
+        if conexao is None:
+            return
+        self._conexao = None
+        self._pool._devolver(conexao, self._criada_em)
+
+    def descartar(self):
+        """Fecha de fato a conexão, sem devolvê-la ao pool"""
+        conexao = self.__dict__.get('_conexao')
+        if conexao is None:
+            return
+        self._conexao = None
+        self._pool._devolver(conexao, self._criada_em, descartar=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Rede de segurança para rotas que retornam erro sem chamar close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PoolConexoes:
+    """Pool de conexões com overflow, pre-ping, reciclagem e estatísticas"""
+
+    def __init__(self, tamanho=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW,
+                 timeout=DB_POOL_TIMEOUT, recycle=DB_POOL_RECYCLE,
+                 pre_ping=DB_POOL_PRE_PING, **params_conexao):
+        self.tamanho = tamanho
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.params_conexao = params_conexao or {
+            'host': DB_HOST,
+            'user': DB_USER,
+            'password': DB_PASSWORD,
+            'database': DB_NAME
+        }
+        if modo_cooperativo():
+            # A extensão C bloqueia o hub; o driver puro usa o socket cooperativo
+            self.params_conexao.setdefault('use_pure', True)
+
+        self._cond = threading.Condition()
+        self._livres = deque()
+        self._abertas = 0
+        self._em_uso = 0
+        self._aguardando = 0
+
+        # Métricas de obtenção
+        self._obtencoes = 0
+        self._timeouts = 0
+        self._recicladas = 0
+        self._latencia_total = 0.0
+        self._latencia_max = 0.0
+
+    @property
+    def capacidade(self):
+        return self.tamanho + self.max_overflow
+
+    def _criar(self):
+        return mysql.connector.connect(**self.params_conexao), time.monotonic()
+
+    def _fechar(self, conexao):
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def _valida(self, conexao, criada_em):
+        """Indica se uma conexão ociosa ainda pode ser reutilizada"""
+        if self.recycle and time.monotonic() - criada_em > self.recycle:
+            return False
+        if self.pre_ping:
+            try:
+                return conexao.is_connected()
+            except Exception:
+                return False
+        return True
+
+    def obter(self, timeout=None):
+        """Empresta uma conexão do pool, aguardando até `timeout` segundos"""
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        limite = inicio + timeout
+
+        with self._cond:
+            self._aguardando += 1
+            try:
+                while True:
+                    if self._livres:
+                        conexao, criada_em = self._livres.pop()
+                        break
+                    if self._abertas < self.capacidade:
+                        self._abertas += 1
+                        conexao, criada_em = None, None
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._timeouts += 1
+                        raise PoolEsgotadoError(
+                            f'Nenhuma conexão disponível após {timeout:.1f}s '
+                            f'({self._em_uso} em uso, capacidade {self.capacidade})'
+                        )
+                    self._cond.wait(restante)
+            finally:
+                self._aguardando -= 1
+            self._em_uso += 1
+
+        # Validação e abertura acontecem fora do lock
+        try:
+            if conexao is not None and not self._valida(conexao, criada_em):
+                self._fechar(conexao)
+                conexao = None
+                with self._cond:
+                    self._recicladas += 1
+            if conexao is None:
+                conexao, criada_em = self._criar()
+        except Exception:
+            with self._cond:
+                self._abertas -= 1
+                self._em_uso -= 1
+                self._cond.notify()
+            raise
+
+        latencia = time.monotonic() - inicio
+        with self._cond:
+            self._obtencoes += 1
+            self._latencia_total += latencia
+            self._latencia_max = max(self._latencia_max, latencia)
+
+        return ConexaoPool(self, conexao, criada_em)
+
+    def _devolver(self, conexao, criada_em, descartar=False):
+        # Desfazer transação pendente para que a próxima requisição
+        # não herde locks nem o snapshot de leitura anterior
+        if not descartar:
+            try:
+                conexao.rollback()
+            except Exception:
+                descartar = True
+
+        with self._cond:
+            self._em_uso -= 1
+            if descartar or len(self._livres) >= self.tamanho:
+                self._abertas -= 1
+                fechar = True
+            else:
+                self._livres.append((conexao, criada_em))
+                fechar = False
+            self._cond.notify()
+
+        if fechar:
+            self._fechar(conexao)
+
+    def estatisticas(self):
+        """Retorna um retrato do estado do pool"""
+        with self._cond:
+            media = self._latencia_total / self._obtencoes if self._obtencoes else 0.0
+            return {
+                'tamanho': self.tamanho,
+                'max_overflow': self.max_overflow,
+                'abertas': self._abertas,
+                'livres': len(self._livres),
+                'em_uso': self._em_uso,
+                'aguardando': self._aguardando,
+                'obtencoes': self._obtencoes,
+                'timeouts': self._timeouts,
+                'recicladas': self._recicladas,
+                'latencia_media_ms': round(media * 1000, 3),
+                'latencia_max_ms': round(self._latencia_max * 1000, 3)
+            }
+
+    def fechar(self):
+        """Fecha todas as conexões ociosas"""
+        with self._cond:
+            livres = list(self._livres)
+            self._livres.clear()
+            self._abertas -= len(livres)
+        for conexao, _ in livres:
+            self._fechar(conexao)
+
+
+# -----------------
+# Pool padrão do processo
+# -----------------
+_pool_padrao = None
+_lock_pool_padrao = threading.Lock()
+
+
+def obter_pool():
+    """Retorna o pool padrão, criando-o na primeira chamada"""
+    global _pool_padrao
+    if _pool_padrao is None:
+        with _lock_pool_padrao:
+            if _pool_padrao is None:
+                _pool_padrao = PoolConexoes()
+    return _pool_padrao
+
+
+def get_db_connection():
+    """Empresta uma conexão do pool padrão; use close() para devolvê-la"""
+    with metricas.fase('get_db_connection'):
+        return obter_pool().obter()
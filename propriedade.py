@@ -0,0 +1,68 @@
+"""
+Índice em memória de quais correntistas pertencem a cada usuário
+"""
+import os
+import threading
+
+from armazenamento import armazenamento
+from cache import CacheLRU, VersoesLimitadas
+
+PROPRIEDADE_CACHE_TAMANHO = int(os.getenv('PROPRIEDADE_CACHE_TAMANHO', '10000'))
+PROPRIEDADE_CACHE_TTL = int(os.getenv('PROPRIEDADE_CACHE_TTL', '600'))
+
+
+class IndiceProprietarios:
+    """Mapeia usuário -> conjunto de CorrentistaIDs, com LRU e TTL"""
+
+    def __init__(self, tamanho_maximo=PROPRIEDADE_CACHE_TAMANHO, ttl=PROPRIEDADE_CACHE_TTL):
+        self._cache = CacheLRU(tamanho_maximo, ttl)
+        self._lock = threading.Lock()
+        self._versoes = VersoesLimitadas(tamanho_maximo)
+        self._ouvintes = []
+
+    def ao_invalidar(self, funcao):
+        """Registra `funcao(usuario_id)`, chamada a cada invalidação de um usuário"""
+        self._ouvintes.append(funcao)
+
+    def correntistas_do_usuario(self, usuario_id):
+        """Retorna os CorrentistaIDs do usuário, consultando o armazenamento só na falha"""
+        ids = self._cache.obter(usuario_id)
+        if ids is not None:
+            return ids
+
+        with self._lock:
+            versao = self._versoes.atual(usuario_id)
+        ids = armazenamento.ids_correntistas(usuario_id)
+
+        # Não armazenar se houve invalidação durante a consulta
+        with self._lock:
+            if self._versoes.atual(usuario_id) == versao:
+                self._cache.definir(usuario_id, ids)
+        return ids
+
+    def pertence(self, correntista_id, usuario_id):
+        """Indica se o correntista pertence ao usuário"""
+        try:
+            correntista_id = int(correntista_id)
+        except (TypeError, ValueError):
+            return False
+        return correntista_id in self.correntistas_do_usuario(usuario_id)
+
+    def invalidar_usuario(self, usuario_id):
+        """Chamar quando um correntista for criado, removido ou mudar de dono"""
+        with self._lock:
+            self._versoes.avancar(usuario_id)
+            self._cache.invalidar(usuario_id)
+        for funcao in self._ouvintes:
+            funcao(usuario_id)
+
+    def limpar(self):
+        with self._lock:
+            self._versoes.limpar()
+            self._cache.limpar()
+
+    def estatisticas(self):
+        return self._cache.estatisticas()
+
+
+indice_proprietarios = IndiceProprietarios()
@@ -1,30 +1,53 @@
 #!/usr/bin/env python3
 """
-Servidor alternativo SEM eventlet - para evitar problemas de compatibilidade
-Use este arquivo se tiver problemas com o api.py
-"""
+Inicia a API com o runtime escolhido: threading, eventlet ou gevent
 
-from flask import Flask, jsonify, request, render_template
-from flask_socketio import SocketIO
-import mysql.connector
-import jwt
-import bcrypt
-from datetime import datetime, timedelta
-from functools import wraps
+    python run_server.py              # SOCKETIO_ASYNC_MODE do .env (padrão: threading)
+    python run_server.py gevent       # modo informado na linha de comando
+
+threading usa o servidor de desenvolvimento do Werkzeug; eventlet e gevent
+usam os servidores WSGI cooperativos de cada biblioteca (modo de produção).
+"""
 import os
+import sys
+
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# O modo precisa estar definido antes do monkey patch e de importar a API
+if len(sys.argv) > 1:
+    os.environ['SOCKETIO_ASYNC_MODE'] = sys.argv[1]
+
+try:
+    from modo_async import aplicar_monkey_patch, ASYNC_MODE, MODOS_ASYNC
+    aplicar_monkey_patch()
+except ValueError as e:
+    print(f"❌ {e}")
+    exit(1)
+except ImportError as e:
+    print(f"❌ Runtime não instalado: {e}")
+    print(f"💡 Instale com: pip install {os.environ.get('SOCKETIO_ASYNC_MODE')}")
+    exit(1)
+
+import mysql.connector
+
+SERVIDOR_HOST = os.getenv('SERVIDOR_HOST', '0.0.0.0')
+SERVIDOR_PORTA = int(os.getenv('SERVIDOR_PORTA', '5000'))
+SERVIDOR_DEBUG = os.getenv('SERVIDOR_DEBUG', 'false').lower() in ('1', 'true', 'sim', 'yes')
+
 print("=" * 80)
 print("🚀 INICIANDO SERVIDOR - API V1")
 print("=" * 80)
+print(f"   Runtime: {ASYNC_MODE}")
 print()
 
 # Importar a aplicação
 try:
     from api import app, socketio
+    from pool_conexoes import get_db_connection, DB_HOST, DB_USER, DB_NAME
+    from armazenamento import ARMAZENAMENTO_BACKEND
     print("✅ API importada com sucesso")
 except Exception as e:
     print(f"❌ Erro ao importar API: {e}")
@@ -33,45 +56,47 @@ except Exception as e:
     exit(1)
 
 # Testar conexão com MySQL antes de iniciar
-print()
-print("🔍 Testando conexão com MySQL...")
-try:
-    DB_HOST = os.getenv('DB_HOST', 'localhost')
-    DB_USER = os.getenv('DB_USER', 'root')
-    DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-    DB_NAME = os.getenv('DB_NAME', 'SistemasCorporativos')
-    
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
-    print(f"✅ MySQL conectado: {DB_USER}@{DB_HOST}/{DB_NAME}")
+if ARMAZENAMENTO_BACKEND == 'memoria':
+    print()
+    print("🧠 Armazenamento em memória: MySQL não utilizado (os dados se perdem ao encerrar)")
+else:
+    print()
+    print("🔍 Testando conexão com MySQL...")
+    try:
+        conn = get_db_connection()
+        print(f"✅ MySQL conectado: {DB_USER}@{DB_HOST}/{DB_NAME}")
     
-    cursor = conn.cursor()
+        cursor = conn.cursor()
     
-    # Verificar se as tabelas existem
-    cursor.execute("SHOW TABLES")
-    tabelas = cursor.fetchall()
-    print(f"✅ {len(tabelas)} tabelas encontradas no banco")
+        # Verificar se as tabelas existem
+        cursor.execute("SHOW TABLES")
+        tabelas = cursor.fetchall()
+        print(f"✅ {len(tabelas)} tabelas encontradas no banco")
     
-    # Verificar usuários
-    cursor.execute("SELECT COUNT(*) FROM Usuarios")
-    count = cursor.fetchone()[0]
-    print(f"✅ {count} usuários cadastrados")
+        # Verificar usuários
+        cursor.execute("SELECT COUNT(*) FROM Usuarios")
+        count = cursor.fetchone()[0]
+        print(f"✅ {count} usuários cadastrados")
     
-    cursor.close()
-    conn.close()
+        cursor.close()
+        conn.close()
+
+        if ARMAZENAMENTO_BACKEND == 'motor':
+            # Reaplica o log local antes de aceitar operações
+            from armazenamento import armazenamento
+            armazenamento.iniciar()
+            situacao = armazenamento.situacao()
+            print(f"✅ Motor de saldos: log na sequência {situacao['sequencia']}, "
+                  f"MySQL na {situacao['aplicado']}")
     
-except mysql.connector.Error as e:
-    print(f"❌ ERRO MySQL: {e}")
-    print()
-    print("💡 SOLUÇÕES:")
-    print("   1. Verifique se o MySQL está rodando no XAMPP")
-    print("   2. Importe o arquivo database/SistemasCorporativos.sql")
-    print("   3. Verifique as credenciais no arquivo .env")
-    exit(1)
+    except mysql.connector.Error as e:
+        print(f"❌ ERRO MySQL: {e}")
+        print()
+        print("💡 SOLUÇÕES:")
+        print("   1. Verifique se o MySQL está rodando no XAMPP")
+        print("   2. Importe o arquivo database/SistemasCorporativos.sql")
+        print("   3. Verifique as credenciais no arquivo .env")
+        exit(1)
 
 print()
 print("=" * 80)
@@ -79,8 +104,8 @@ print("✅ SERVIDOR PRONTO!")
 print("=" * 80)
 print()
 print("🌐 Acesse em seu navegador:")
-print("   • http://localhost:5000")
-print("   • http://127.0.0.1:5000")
+print(f"   • http://localhost:{SERVIDOR_PORTA}")
+print(f"   • http://127.0.0.1:{SERVIDOR_PORTA}")
 print()
 print("⚠️  Para parar o servidor, pressione CTRL+C")
 print()
@@ -88,16 +113,20 @@ print("=" * 80)
 print()
 
 if __name__ == '__main__':
-    # Usar gevent em vez de eventlet (mais compatível)
     try:
+        opcoes = {}
+        if ASYNC_MODE == 'threading':
+            # Servidor de desenvolvimento do Werkzeug; para produção use eventlet ou gevent
+            opcoes['allow_unsafe_werkzeug'] = True
         socketio.run(
-            app, 
-            debug=True, 
-            host='0.0.0.0', 
-            port=5000,
-            allow_unsafe_werkzeug=True  # Para desenvolvimento
+            app,
+            debug=SERVIDOR_DEBUG,
+            use_reloader=False,
+            host=SERVIDOR_HOST,
+            port=SERVIDOR_PORTA,
+            **opcoes
         )
     except Exception as e:
         print(f"\n❌ Erro ao iniciar servidor: {e}")
-        print("\n💡 Tente instalar gevent: pip install gevent")
+        print(f"\n💡 Tente outro runtime: python run_server.py <{'|'.join(MODOS_ASYNC)}>")
         print("   Ou use: python simple_server.py")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Histórico de saldos a partir da consolidação diária (tabela SaldosDiarios)
+
+Executado diretamente, reconstrói a consolidação a partir de Movimentacoes:
+    python saldos_diarios.py            # todos os correntistas
+    python saldos_diarios.py 1 2 3      # apenas os correntistas informados
+"""
+import sys
+from datetime import timedelta
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from filtros import filtro_periodo
+from pool_conexoes import get_db_connection
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+GRANULARIDADES = ('dia', 'mes')
+
+
+def periodo_em_dias(inicio, fim):
+    """Converte o período (fim exclusivo) em datas, incluindo dias parciais"""
+    inicio_dia = inicio.date() if inicio else None
+    fim_dia = (fim - timedelta(microseconds=1)).date() + timedelta(days=1) if fim else None
+    return inicio_dia, fim_dia
+
+
+def _ponto(periodo, creditos, debitos, quantidade, saldo_fechamento):
+    return {
+        'periodo': periodo,
+        'creditos': creditos,
+        'debitos': debitos,
+        'quantidade': quantidade,
+        'saldo_abertura': round(saldo_fechamento - (creditos - debitos), 2),
+        'saldo_fechamento': saldo_fechamento
+    }
+
+
+def _agrupar_por_mes(dias):
+    meses = {}
+    for dia in dias:
+        mes = dia['periodo'][:7]
+        atual = meses.get(mes)
+        if atual is None:
+            meses[mes] = dict(dia, periodo=mes)
+            continue
+        # A abertura do mês é a do primeiro dia; o fechamento, o do último
+        atual['creditos'] = round(atual['creditos'] + dia['creditos'], 2)
+        atual['debitos'] = round(atual['debitos'] + dia['debitos'], 2)
+        atual['quantidade'] += dia['quantidade']
+        atual['saldo_fechamento'] = dia['saldo_fechamento']
+    return list(meses.values())
+
+
+def consulta_historico(correntista_ids, inicio=None, fim=None):
+    """Retorna (sql, params) das linhas de SaldosDiarios dos correntistas no período"""
+    marcadores = ', '.join(['%s'] * len(correntista_ids))
+    filtro, params = filtro_periodo(*periodo_em_dias(inicio, fim), coluna='Data')
+    sql = f"""
+        SELECT CorrentistaID, Data, TotalCreditos, TotalDebitos, Quantidade, SaldoFechamento
+        FROM SaldosDiarios
+        WHERE CorrentistaID IN ({marcadores}) {filtro}
+        ORDER BY CorrentistaID, Data
+    """
+    return sql, (*correntista_ids, *params)
+
+
+def consultar_historico(conn, correntista_ids, granularidade='dia', inicio=None, fim=None):
+    """Retorna {CorrentistaID: [pontos]} só com os dias (ou meses) que tiveram movimentação"""
+    historico = {int(c): [] for c in correntista_ids}
+    if not historico:
+        return historico
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(*consulta_historico(list(historico), inicio, fim))
+    linhas = cursor.fetchall()
+    cursor.close()
+    return montar_historico(historico, linhas, granularidade)
+
+
+def montar_historico(historico, linhas, granularidade='dia'):
+    """Preenche {CorrentistaID: []} com as linhas de SaldosDiarios, em ordem de data"""
+    for linha in linhas:
+        historico[linha['CorrentistaID']].append(_ponto(
+            linha['Data'].isoformat(),
+            float(linha['TotalCreditos']),
+            float(linha['TotalDebitos']),
+            linha['Quantidade'],
+            float(linha['SaldoFechamento'])
+        ))
+
+    if granularidade == 'mes':
+        historico = {c: _agrupar_por_mes(dias) for c, dias in historico.items()}
+    return historico
+
+
+def reconstruir(conn, correntista_id):
+    """Recalcula a consolidação diária de um correntista a partir de Movimentacoes"""
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        # Travar o correntista impede novas movimentações durante a reconstrução
+        cursor.execute(
+            "SELECT Saldo FROM Correntistas WHERE CorrentistaID = %s FOR UPDATE",
+            (correntista_id,)
+        )
+        linha = cursor.fetchone()
+        if linha is None:
+            conn.rollback()
+            return 0
+        saldo = linha[0]
+
+        cursor.execute("""
+            SELECT DATE(DataOperacao) AS Data,
+                   SUM(CASE WHEN TipoOperacao = 'C' THEN ValorOperacao ELSE 0 END),
+                   SUM(CASE WHEN TipoOperacao = 'D' THEN ValorOperacao ELSE 0 END),
+                   COUNT(*)
+            FROM Movimentacoes
+            WHERE CorrentistaID = %s
+            GROUP BY DATE(DataOperacao)
+            ORDER BY Data
+        """, (correntista_id,))
+        dias = cursor.fetchall()
+
+        # O saldo anterior à primeira movimentação é o atual menos todo o líquido
+        fechamento = saldo - sum(creditos - debitos for _, creditos, debitos, _ in dias)
+        linhas = []
+        for data, creditos, debitos, quantidade in dias:
+            fechamento += creditos - debitos
+            linhas.append((correntista_id, data, creditos, debitos, quantidade, fechamento))
+
+        cursor.execute("DELETE FROM SaldosDiarios WHERE CorrentistaID = %s", (correntista_id,))
+        if linhas:
+            cursor.executemany("""
+                INSERT INTO SaldosDiarios
+                    (CorrentistaID, Data, TotalCreditos, TotalDebitos, Quantidade, SaldoFechamento)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, linhas)
+        conn.commit()
+        return len(linhas)
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def reconstruir_todos(correntista_ids=None):
+    """Reconstrói cada correntista em sua própria transação"""
+    conn = get_db_connection()
+    try:
+        if correntista_ids is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT CorrentistaID FROM Correntistas ORDER BY CorrentistaID")
+            correntista_ids = [linha[0] for linha in cursor.fetchall()]
+            cursor.close()
+            conn.commit()
+        for correntista_id in correntista_ids:
+            dias = reconstruir(conn, correntista_id)
+            print(f"  - Correntista {correntista_id}: {dias} dia(s)")
+        return len(correntista_ids)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Reconstrução da Consolidação Diária de Saldos ===\n")
+    try:
+        ids = [int(arg) for arg in sys.argv[1:]] or None
+    except ValueError:
+        print("❌ Informe apenas IDs numéricos de correntistas")
+        exit(1)
+
+    try:
+        total = reconstruir_todos(ids)
+    except mysql.connector.Error as e:
+        print(f"\n❌ Erro ao reconstruir: {e}")
+        exit(1)
+
+    print(f"\n✅ {total} correntista(s) reconstruído(s)!")
@@ -0,0 +1,144 @@
+"""
+Hash e verificação de senhas bcrypt em um executor dedicado e limitado
+
+O bcrypt libera o GIL durante o cálculo, então um pool de threads basta para
+tirar o trabalho pesado das threads de requisição sem o custo de processos.
+Nos modos eventlet/gevent os threads do ThreadPoolExecutor seriam green
+threads, e o bcrypt travaria o hub: o cálculo vai para o pool de threads reais
+do runtime, limitado aos mesmos `trabalhadores`.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeoutError
+
+import bcrypt
+
+from metricas import metricas
+from modo_async import modo_cooperativo, executar_em_thread_real
+
+SENHA_TRABALHADORES = int(os.getenv('SENHA_TRABALHADORES', str(min(4, os.cpu_count() or 1))))
+SENHA_FILA_MAXIMA = int(os.getenv('SENHA_FILA_MAXIMA', '32'))
+SENHA_TIMEOUT = float(os.getenv('SENHA_TIMEOUT', '5'))
+
+
+class SenhaSobrecarregadaError(Exception):
+    """A fila de hash de senhas está cheia ou demorou além do limite"""
+
+
+class ExecutorSenhas:
+    """Executor de tamanho fixo com fila limitada e métricas de latência"""
+
+    def __init__(self, trabalhadores=SENHA_TRABALHADORES, fila_maxima=SENHA_FILA_MAXIMA,
+                 timeout=SENHA_TIMEOUT):
+        self.trabalhadores = trabalhadores
+        self.fila_maxima = fila_maxima
+        self.timeout = timeout
+        self._cooperativo = modo_cooperativo()
+        if self._cooperativo:
+            self._executor = None
+            self._vagas = threading.BoundedSemaphore(trabalhadores)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._em_execucao = 0
+        self._concluidas = 0
+        self._rejeitadas = 0
+        self._timeouts = 0
+        self._espera_total = 0.0
+        self._duracao_total = 0.0
+        self._duracao_max = 0.0
+
+    def _medir(self, enfileirada_em, funcao, args):
+        inicio = time.monotonic()
+        with self._lock:
+            self._em_execucao += 1
+            self._espera_total += inicio - enfileirada_em
+        try:
+            return funcao(*args)
+        finally:
+            duracao = time.monotonic() - inicio
+            with self._lock:
+                self._em_execucao -= 1
+                self._pendentes -= 1
+                self._concluidas += 1
+                self._duracao_total += duracao
+                self._duracao_max = max(self._duracao_max, duracao)
+
+    def executar(self, funcao, *args):
+        """Executa `funcao` no pool; rejeita de imediato se a fila estiver cheia"""
+        with self._lock:
+            if self._pendentes >= self.trabalhadores + self.fila_maxima:
+                self._rejeitadas += 1
+                raise SenhaSobrecarregadaError('Muitas autenticações em andamento')
+            self._pendentes += 1
+
+        if self._cooperativo:
+            return self._executar_cooperativo(funcao, args)
+
+        try:
+            futuro = self._executor.submit(self._medir, time.monotonic(), funcao, args)
+        except RuntimeError:
+            with self._lock:
+                self._pendentes -= 1
+            raise
+
+        try:
+            return futuro.result(timeout=self.timeout)
+        except FuturoTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise SenhaSobrecarregadaError('Tempo limite de autenticação excedido')
+
+    def _executar_cooperativo(self, funcao, args):
+        enfileirada_em = time.monotonic()
+        if not self._vagas.acquire(timeout=self.timeout):
+            with self._lock:
+                self._pendentes -= 1
+                self._timeouts += 1
+            raise SenhaSobrecarregadaError('Tempo limite de autenticação excedido')
+        try:
+            # Métricas e locks ficam na green thread; só o cálculo vai para o thread real
+            return self._medir(enfileirada_em, executar_em_thread_real, (funcao, *args))
+        finally:
+            self._vagas.release()
+
+    def estatisticas(self):
+        with self._lock:
+            concluidas = self._concluidas
+            return {
+                'trabalhadores': self.trabalhadores,
+                'fila_maxima': self.fila_maxima,
+                'em_execucao': self._em_execucao,
+                'na_fila': self._pendentes - self._em_execucao,
+                'concluidas': concluidas,
+                'rejeitadas': self._rejeitadas,
+                'timeouts': self._timeouts,
+                'espera_media_ms': round(self._espera_total / concluidas * 1000, 3) if concluidas else 0.0,
+                'duracao_media_ms': round(self._duracao_total / concluidas * 1000, 3) if concluidas else 0.0,
+                'duracao_max_ms': round(self._duracao_max * 1000, 3)
+            }
+
+
+executor_senhas = ExecutorSenhas()
+
+
+def _hash(senha):
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _verificar(senha, hash_senha):
+    return bcrypt.checkpw(senha.encode('utf-8'), hash_senha.encode('utf-8'))
+
+
+def hash_senha(senha):
+    """Gera hash da senha"""
+    with metricas.fase('bcrypt'):
+        return executor_senhas.executar(_hash, senha)
+
+
+def verificar_senha(senha, hash_senha):
+    """Verifica se a senha confere com o hash"""
+    with metricas.fase('bcrypt'):
+        return executor_senhas.executar(_verificar, senha, hash_senha)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Servidor de produção com vários processos de trabalho atrás de uma só porta
+
+O processo principal:
+- sobe a fila local de mensagens do Socket.IO (se SOCKETIO_MESSAGE_QUEUE for local://);
+- inicia SERVIDOR_TRABALHADORES processos, cada um servindo a API em uma porta interna;
+- encaminha as conexões da porta pública sempre ao mesmo processo para o mesmo IP
+  (sessões fixas, exigidas pelo long-polling do Socket.IO);
+- reinicia processos que terminarem inesperadamente.
+
+Uso:
+    python servidor_producao.py
+"""
+import errno
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+SERVIDOR_HOST = os.getenv('SERVIDOR_HOST', '0.0.0.0')
+SERVIDOR_PORTA = int(os.getenv('SERVIDOR_PORTA', '5000'))
+SERVIDOR_TRABALHADORES = int(os.getenv('SERVIDOR_TRABALHADORES', str(os.cpu_count() or 1)))
+SERVIDOR_PORTA_BASE = int(os.getenv('SERVIDOR_PORTA_BASE', '5101'))
+SERVIDOR_FILA_PADRAO = os.getenv('SERVIDOR_FILA_PADRAO', 'local://127.0.0.1:5099')
+
+# Definida pelo processo principal nos processos de trabalho
+SERVIDOR_TRABALHADOR_PORTA = os.getenv('SERVIDOR_TRABALHADOR_PORTA')
+
+TAMANHO_LEITURA = 65536
+# Tempo máximo para um processo de trabalho aceitar a conexão antes de tentar o seguinte
+TEMPO_CONEXAO = 1.0
+# connect_ex de um socket não bloqueante: conexão em andamento (Linux/macOS e Windows)
+CONEXAO_EM_ANDAMENTO = {0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)}
+
+
+class BalanceadorFixo:
+    """Proxy TCP que associa cada IP de cliente a um processo de trabalho
+
+    Um único thread com selectors copia os bytes nos dois sentidos. Quando o
+    destino não aceita mais dados, a leitura da origem é suspensa até ele
+    drenar, então a memória por conexão fica limitada a um bloco de leitura.
+    A conexão com o processo de trabalho também é não bloqueante: um processo
+    fora do ar ou reiniciando não trava o tráfego dos outros clientes.
+    """
+
+    def __init__(self, host, porta, destinos):
+        self.destinos = destinos
+        self._seletor = selectors.DefaultSelector()
+        self._servidor = socket.create_server((host, porta), backlog=1024)
+        self._servidor.setblocking(False)
+        self._seletor.register(self._servidor, selectors.EVENT_READ)
+        self._par = {}
+        self._pendente = {}
+        # Socket do trabalhador em conexão -> (cliente, índice inicial, deslocamento, prazo)
+        self._conectando = {}
+
+    def _conectar(self, cliente, inicio, deslocamento):
+        """Inicia a conexão com o destino do cliente; se ele recusar, tenta os seguintes
+
+        Mesmo IP, mesmo processo: `inicio` vem do IP e `deslocamento` avança a cada falha.
+        """
+        while deslocamento < len(self.destinos):
+            destino = self.destinos[(inicio + deslocamento) % len(self.destinos)]
+            trabalhador = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            trabalhador.setblocking(False)
+            if trabalhador.connect_ex(destino) in CONEXAO_EM_ANDAMENTO:
+                self._conectando[trabalhador] = (cliente, inicio, deslocamento, time.monotonic() + TEMPO_CONEXAO)
+                self._seletor.register(trabalhador, selectors.EVENT_WRITE)
+                return
+            trabalhador.close()
+            deslocamento += 1
+        cliente.close()
+
+    def _aceitar(self):
+        try:
+            cliente, endereco = self._servidor.accept()
+        except BlockingIOError:
+            return
+        self._conectar(cliente, zlib.crc32(endereco[0].encode('utf-8')) % len(self.destinos), 0)
+
+    def _conectado(self, trabalhador):
+        """Conexão com o trabalhador concluída (ou recusada): forma o par ou tenta o seguinte"""
+        cliente, inicio, deslocamento, _ = self._conectando.pop(trabalhador)
+        self._seletor.unregister(trabalhador)
+        if trabalhador.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+            trabalhador.close()
+            self._conectar(cliente, inicio, deslocamento + 1)
+            return
+        for conexao in (cliente, trabalhador):
+            conexao.setblocking(False)
+            conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._par[cliente] = trabalhador
+        self._par[trabalhador] = cliente
+        self._seletor.register(cliente, selectors.EVENT_READ)
+        self._seletor.register(trabalhador, selectors.EVENT_READ)
+
+    def _expirar_conexoes(self):
+        agora = time.monotonic()
+        for trabalhador, (cliente, inicio, deslocamento, prazo) in list(self._conectando.items()):
+            if prazo <= agora:
+                del self._conectando[trabalhador]
+                self._seletor.unregister(trabalhador)
+                trabalhador.close()
+                self._conectar(cliente, inicio, deslocamento + 1)
+
+    def _atualizar(self, conexao):
+        # Lê só se o par não tem dados pendentes; escreve só se há dados pendentes
+        eventos = 0
+        if self._par[conexao] not in self._pendente:
+            eventos |= selectors.EVENT_READ
+        if conexao in self._pendente:
+            eventos |= selectors.EVENT_WRITE
+        if eventos:
+            try:
+                self._seletor.modify(conexao, eventos)
+            except KeyError:
+                self._seletor.register(conexao, eventos)
+        else:
+            try:
+                self._seletor.unregister(conexao)
+            except KeyError:
+                pass
+
+    def _fechar(self, conexao):
+        par = self._par.pop(conexao, None)
+        for item in (conexao, par):
+            if item is None:
+                continue
+            self._par.pop(item, None)
+            self._pendente.pop(item, None)
+            try:
+                self._seletor.unregister(item)
+            except KeyError:
+                pass
+            item.close()
+
+    def _ler(self, origem):
+        destino = self._par[origem]
+        try:
+            dados = origem.recv(TAMANHO_LEITURA)
+        except BlockingIOError:
+            return
+        except OSError:
+            dados = b''
+        if not dados:
+            self._fechar(origem)
+            return
+        try:
+            enviado = destino.send(dados)
+        except BlockingIOError:
+            enviado = 0
+        except OSError:
+            self._fechar(origem)
+            return
+        if enviado < len(dados):
+            self._pendente[destino] = dados[enviado:]
+            self._atualizar(origem)
+            self._atualizar(destino)
+
+    def _escrever(self, destino):
+        dados = self._pendente[destino]
+        try:
+            enviado = destino.send(dados)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._fechar(destino)
+            return
+        if enviado < len(dados):
+            self._pendente[destino] = dados[enviado:]
+            return
+        del self._pendente[destino]
+        self._atualizar(destino)
+        self._atualizar(self._par[destino])
+
+    def executar(self):
+        while True:
+            # Com conexões em andamento, acorda a tempo de expirar as que não responderem
+            espera = TEMPO_CONEXAO / 4 if self._conectando else None
+            for chave, eventos in self._seletor.select(espera):
+                conexao = chave.fileobj
+                if conexao is self._servidor:
+                    self._aceitar()
+                    continue
+                if conexao in self._conectando:
+                    self._conectado(conexao)
+                    continue
+                if eventos & selectors.EVENT_WRITE and conexao in self._pendente:
+                    self._escrever(conexao)
+                if eventos & selectors.EVENT_READ and conexao in self._par:
+                    self._ler(conexao)
+            if self._conectando:
+                self._expirar_conexoes()
+
+
+def executar_trabalhador(porta):
+    """Serve a API em uma porta interna (processo de trabalho)"""
+    from modo_async import aplicar_monkey_patch, ASYNC_MODE
+    aplicar_monkey_patch()
+
+    from api import app, socketio
+    opcoes = {'allow_unsafe_werkzeug': True} if ASYNC_MODE == 'threading' else {}
+    socketio.run(app, host='127.0.0.1', port=porta, debug=False, use_reloader=False, **opcoes)
+
+
+class Supervisor:
+    """Inicia e reinicia os processos de trabalho"""
+
+    def __init__(self, portas, fila):
+        self.portas = portas
+        self.ambiente = dict(os.environ, SOCKETIO_MESSAGE_QUEUE=fila)
+        self.processos = {}
+        self.encerrando = False
+
+    def _iniciar(self, porta):
+        ambiente = dict(self.ambiente, SERVIDOR_TRABALHADOR_PORTA=str(porta))
+        self.processos[porta] = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=ambiente)
+
+    def iniciar(self):
+        for porta in self.portas:
+            self._iniciar(porta)
+
+    def vigiar(self):
+        while not self.encerrando:
+            for porta, processo in list(self.processos.items()):
+                if processo.poll() is not None and not self.encerrando:
+                    print(f"⚠️  Processo da porta {porta} terminou (código {processo.returncode}); reiniciando")
+                    self._iniciar(porta)
+            time.sleep(1)
+
+    def encerrar(self, *_):
+        self.encerrando = True
+        for processo in self.processos.values():
+            processo.terminate()
+        for processo in self.processos.values():
+            try:
+                processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+
+
+def main():
+    fila = os.getenv('SOCKETIO_MESSAGE_QUEUE') or SERVIDOR_FILA_PADRAO
+    trabalhadores = SERVIDOR_TRABALHADORES
+    backend = os.getenv('ARMAZENAMENTO_BACKEND', 'mysql').lower()
+    if backend in ('memoria', 'motor') and trabalhadores > 1:
+        # Cada processo teria a sua própria cópia dos dados (no motor, dos saldos)
+        print(f"⚠️  ARMAZENAMENTO_BACKEND={backend}: usando um único processo de trabalho")
+        trabalhadores = 1
+    portas = [SERVIDOR_PORTA_BASE + i for i in range(trabalhadores)]
+
+    print("=" * 80)
+    print("🚀 SERVIDOR DE PRODUÇÃO - API V1")
+    print("=" * 80)
+    print(f"   Processos de trabalho: {trabalhadores} (portas {portas[0]}-{portas[-1]})")
+    print(f"   Fila de mensagens:     {fila}")
+    print(f"   Runtime:               {os.getenv('SOCKETIO_ASYNC_MODE', 'threading')}")
+    print(f"   Endereço público:      http://{SERVIDOR_HOST}:{SERVIDOR_PORTA}")
+    print("=" * 80)
+
+    broker = None
+    if fila.startswith('local://'):
+        from fila_mensagens import BrokerLocal
+        broker = BrokerLocal(fila)
+        broker.iniciar()
+
+    supervisor = Supervisor(portas, fila)
+    supervisor.iniciar()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    balanceador = BalanceadorFixo(SERVIDOR_HOST, SERVIDOR_PORTA, [('127.0.0.1', p) for p in portas])
+    threading.Thread(target=balanceador.executar, name='balanceador', daemon=True).start()
+
+    try:
+        supervisor.vigiar()
+    except (KeyboardInterrupt, SystemExit):
+        print("\n🛑 Encerrando processos de trabalho...")
+    finally:
+        supervisor.encerrar()
+        if broker is not None:
+            broker.fechar()
+
+
+if __name__ == '__main__':
+    if SERVIDOR_TRABALHADOR_PORTA:
+        executar_trabalhador(int(SERVIDOR_TRABALHADOR_PORTA))
+    else:
+        main()
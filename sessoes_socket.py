@@ -0,0 +1,133 @@
+"""
+Sessões dos sockets autenticados, mantidas em memória por sid
+
+O evento 'autenticar' verifica o JWT uma vez e guarda o usuário, a expiração
+do token e os CorrentistaIDs do usuário. Os eventos seguintes são autorizados
+pela sessão, sem decodificar o token nem consultar o banco. Quando o token
+expira, `ao_expirar(sid)` é chamado para desconectar o socket.
+"""
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SessaoSocket:
+    __slots__ = ('sid', 'usuario_id', 'email', 'expira_em', 'correntistas', 'assinaturas')
+
+    def __init__(self, sid, usuario_id, email, expira_em, correntistas):
+        self.sid = sid
+        self.usuario_id = usuario_id
+        self.email = email
+        # Epoch (segundos), como o `exp` do JWT
+        self.expira_em = expira_em
+        # None depois de uma invalidação: recarregar do índice de proprietários
+        self.correntistas = correntistas
+        # CorrentistaIDs com saldo assinado (sala saldo_<id>)
+        self.assinaturas = set()
+
+    def expirada(self, agora=None):
+        return (agora if agora is not None else time.time()) >= self.expira_em
+
+
+class RegistroSessoes:
+    """Sessões por sid, com um thread que encerra as de token expirado"""
+
+    def __init__(self, ao_expirar):
+        self._ao_expirar = ao_expirar
+        self._sessoes = {}
+        self._por_usuario = {}
+        self._prazos = []
+        self._condicao = threading.Condition()
+        self._thread = None
+        self._expiradas = 0
+
+    def abrir(self, sid, payload, correntistas):
+        """Cria (ou substitui, em nova autenticação) a sessão do sid
+
+        Renovar o token do mesmo usuário mantém as assinaturas de saldo.
+        """
+        sessao = SessaoSocket(sid, payload['usuario_id'], payload.get('email'),
+                              payload['exp'], frozenset(correntistas) if correntistas is not None else None)
+        with self._condicao:
+            anterior = self._remover(sid)
+            if anterior is not None and anterior.usuario_id == sessao.usuario_id:
+                sessao.assinaturas = anterior.assinaturas
+            self._sessoes[sid] = sessao
+            self._por_usuario.setdefault(sessao.usuario_id, set()).add(sid)
+            heapq.heappush(self._prazos, (sessao.expira_em, sid))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name='sessoes-socket', daemon=True)
+                self._thread.start()
+            self._condicao.notify()
+        return sessao
+
+    def obter(self, sid):
+        """Sessão válida do sid ou None"""
+        sessao = self._sessoes.get(sid)
+        if sessao is None or sessao.expirada():
+            return None
+        return sessao
+
+    def _remover(self, sid):
+        sessao = self._sessoes.pop(sid, None)
+        if sessao is None:
+            return None
+        sids = self._por_usuario.get(sessao.usuario_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._por_usuario[sessao.usuario_id]
+        return sessao
+
+    def fechar(self, sid):
+        with self._condicao:
+            sessao = self._remover(sid)
+            # Prazos de sessões fechadas só saem do heap no vencimento; compactar se acumularem
+            if len(self._prazos) > 2 * len(self._sessoes) + 1024:
+                self._prazos = [(s.expira_em, s.sid) for s in self._sessoes.values()]
+                heapq.heapify(self._prazos)
+            return sessao
+
+    def invalidar_usuario(self, usuario_id):
+        """Descarta os CorrentistaIDs guardados nas sessões do usuário"""
+        with self._condicao:
+            for sid in self._por_usuario.get(usuario_id, ()):
+                self._sessoes[sid].correntistas = None
+
+    def _executar(self):
+        while True:
+            vencidas = []
+            with self._condicao:
+                while not self._prazos or self._prazos[0][0] > time.time():
+                    espera = self._prazos[0][0] - time.time() if self._prazos else None
+                    self._condicao.wait(espera)
+                agora = time.time()
+                while self._prazos and self._prazos[0][0] <= agora:
+                    _, sid = heapq.heappop(self._prazos)
+                    sessao = self._sessoes.get(sid)
+                    # Prazo de uma sessão já fechada ou renovada com outro token
+                    if sessao is None or not sessao.expirada(agora):
+                        continue
+                    self._remover(sid)
+                    self._expiradas += 1
+                    vencidas.append(sid)
+            for sid in vencidas:
+                try:
+                    self._ao_expirar(sid)
+                except Exception:
+                    logger.exception('Falha ao encerrar a sessão expirada %s', sid)
+
+    def __len__(self):
+        return len(self._sessoes)
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                'sessoes': len(self._sessoes),
+                'usuarios': len(self._por_usuario),
+                'assinaturas_saldo': sum(len(s.assinaturas) for s in self._sessoes.values()),
+                'expiradas': self._expiradas
+            }
@@ -6,24 +6,22 @@ Servidor SIMPLES sem WebSocket - Use se tiver problemas com SocketIO
 from flask import Flask, jsonify, request, render_template
 import mysql.connector
 import jwt
-import bcrypt
 from datetime import datetime, timedelta
 from functools import wraps
 import os
 from dotenv import load_dotenv
+from pool_conexoes import get_db_connection
+from erros_http import registrar_sobrecarga
+from senhas import hash_senha, verificar_senha
+from tokens import cache_tokens
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
 app = Flask(__name__)
 
-# -----------------
-# Configuração do banco de dados MySQL
-# -----------------
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER', 'root')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_NAME = os.getenv('DB_NAME', 'SistemasCorporativos')
+# Pool esgotado ou fila de bcrypt cheia: 503 imediato com Retry-After
+registrar_sobrecarga(app)
 
 # -----------------
 # Configuração JWT
@@ -32,15 +30,6 @@ JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'sua_chave_secreta_super_segura_aqu
 JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', '24'))
 
-# Função para conectar ao banco de dados
-def get_db_connection():
-    return mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
-
 # -----------------
 # Funções de Autenticação
 # -----------------
@@ -56,21 +45,18 @@ def gerar_token(usuario_id, email):
 
 def verificar_token(token):
     """Verifica se o token JWT é válido"""
+    # A assinatura só é verificada quando o token não está no cache
+    payload = cache_tokens.obter(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
-
-def hash_senha(senha):
-    """Gera hash da senha"""
-    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verificar_senha(senha, hash_senha):
-    """Verifica se a senha confere com o hash"""
-    return bcrypt.checkpw(senha.encode('utf-8'), hash_senha.encode('utf-8'))
+    cache_tokens.definir(token, payload)
+    return payload
 
 # -----------------
 # Decorador para proteger rotas
@@ -6,6 +6,7 @@ Teste específico para XAMPP rodando
 import mysql.connector
 import os
 from dotenv import load_dotenv
+from pool_conexoes import get_db_connection
 
 load_dotenv()
 
@@ -81,12 +82,7 @@ print()
 # Teste 3: Verificar tabelas
 print("3️⃣  Verificando tabelas...")
 try:
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SHOW TABLES")
     tabelas = cursor.fetchall()
@@ -115,12 +111,7 @@ print()
 # Teste 4: Verificar dados
 print("4️⃣  Verificando dados...")
 try:
-    conn = mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute("SELECT COUNT(*) FROM Usuarios")
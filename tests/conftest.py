@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Os testes usam o backend em memória: nenhum servidor MySQL é necessário
+os.environ.setdefault('ARMAZENAMENTO_BACKEND', 'memoria')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
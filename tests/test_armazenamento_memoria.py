@@ -0,0 +1,26 @@
+from decimal import Decimal
+
+# operacoes importa armazenamento, que cria o backend configurado: precisa vir antes
+from operacoes import TIPOS_OPERACAO
+from armazenamento_memoria import ArmazenamentoMemoria
+
+
+def test_bloco_recusa_so_o_item_com_erro_de_dados():
+    armazenamento = ArmazenamentoMemoria.do_ambiente('')
+    recusados = {}
+
+    def recusar(indice, status, erro):
+        recusados[indice] = (status, erro)
+
+    bloco = [
+        (0, TIPOS_OPERACAO['deposito'], {'correntista_id': 1, 'valor': 10}),
+        # 'Pagamento: ' + 45 caracteres passa do VARCHAR(50) de Descricao
+        (1, TIPOS_OPERACAO['pagamento'], {'correntista_id': 1, 'valor': 5, 'descricao': 'x' * 45}),
+        (2, TIPOS_OPERACAO['saque'], {'correntista_id': 1, 'valor': 0.001}),
+    ]
+    _, concluidos = armazenamento.executar_bloco(bloco, 1, recusar)
+
+    assert [indice for indice, *_ in concluidos] == [0]
+    assert recusados[1][0] == 500 and '1406' in recusados[1][1]
+    assert recusados[2][0] == 500 and '3819' in recusados[2][1]
+    assert armazenamento.buscar_correntista(1)['Saldo'] == Decimal('1010.00')
@@ -0,0 +1,13 @@
+from cache import VersoesLimitadas
+
+
+def test_versoes_descartadas_invalidam_leituras_em_andamento():
+    versoes = VersoesLimitadas(tamanho_maximo=2)
+    lida = versoes.atual('a')
+    versoes.avancar('a')
+    versoes.avancar('b')
+    versoes.avancar('c')
+
+    assert len(versoes) == 2
+    # 'a' foi descartada: a versão lida antes não pode voltar a valer
+    assert versoes.atual('a') != lida
@@ -0,0 +1,18 @@
+from decimal import Decimal
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from filtros import ler_filtros_extrato
+
+
+@pytest.mark.parametrize('valor', ['nan', 'inf', '-inf', 'NaN', 'Infinity', 'abc'])
+def test_valor_nao_finito_e_recusado(valor):
+    with pytest.raises(ValueError, match='valor_min deve ser numérico'):
+        ler_filtros_extrato(MultiDict({'valor_min': valor}))
+
+
+def test_valor_lido_como_decimal():
+    filtros = ler_filtros_extrato(MultiDict({'valor_min': '10.5', 'valor_max': '20'}))
+    assert filtros['valor_min'] == Decimal('10.5')
+    assert filtros['valor_max'] == Decimal('20')
@@ -0,0 +1,13 @@
+from notificacoes import AgrupadorEventos
+
+
+def test_eventos_da_mesma_acao_saem_juntos_na_sala_ociosa():
+    enviados = []
+    agrupador = AgrupadorEventos(lambda sala, evento, dados: enviados.append((sala, evento, dados)), janela_ms=1000)
+
+    agrupador.enviar_juntos('user_1', [('notificacao', {'tipo': 'saque'}, None), ('nova_movimentacao', {'id': 1}, None)])
+
+    assert enviados == [('user_1', 'eventos', [
+        {'evento': 'notificacao', 'dados': {'tipo': 'saque'}},
+        {'evento': 'nova_movimentacao', 'dados': {'id': 1}},
+    ])]
@@ -0,0 +1,29 @@
+from operacoes import TIPOS_OPERACAO
+
+
+def test_transferencia_para_a_mesma_conta_com_tipos_diferentes():
+    transferencia = TIPOS_OPERACAO['transferencia']
+    dados = {'correntista_id_origem': 1, 'correntista_id_destino': '1', 'valor': 10}
+    assert transferencia.validar(dados) == "Não é possível transferir para a mesma conta"
+
+
+def test_lote_separa_bloco_recusado_de_bloco_incerto(monkeypatch):
+    from armazenamento import armazenamento
+    from motor_saldos import MotorIndisponivel, OperacaoIncerta
+    from operacoes import executar_lote
+
+    falhas = iter([
+        MotorIndisponivel('Aplicação das operações no MySQL atrasada'),
+        OperacaoIncerta('Resultado da operação incerto', []),
+    ])
+
+    def executar_bloco(bloco, usuario_id, recusar):
+        raise next(falhas)
+
+    monkeypatch.setattr(armazenamento, 'executar_bloco', executar_bloco)
+    itens = [{'tipo': 'deposito', 'correntista_id': 1, 'valor': 10}] * 2
+    resultados, afetados = executar_lote(itens, 1, tamanho_bloco=1)
+
+    assert [resultado.status for resultado in resultados] == [503, 500]
+    assert 'incerto' in resultados[1].erro
+    assert afetados == {}
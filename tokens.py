@@ -0,0 +1,39 @@
+"""
+Cache de tokens JWT já verificados, compartilhado por HTTP e WebSocket
+"""
+import hashlib
+import os
+import time
+
+from cache import CacheLRU
+
+TOKEN_CACHE_TAMANHO = int(os.getenv('TOKEN_CACHE_TAMANHO', '10000'))
+
+
+class CacheTokens:
+    """Guarda o payload decodificado até o `exp` do token"""
+
+    def __init__(self, tamanho_maximo=TOKEN_CACHE_TAMANHO):
+        self._cache = CacheLRU(tamanho_maximo)
+
+    @staticmethod
+    def _chave(token):
+        # O token em si não fica em memória, apenas o seu hash
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def obter(self, token):
+        return self._cache.obter(self._chave(token))
+
+    def definir(self, token, payload):
+        ttl = payload.get('exp', 0) - time.time()
+        if ttl > 0:
+            self._cache.definir(self._chave(token), payload, ttl=ttl)
+
+    def invalidar(self, token):
+        self._cache.invalidar(self._chave(token))
+
+    def estatisticas(self):
+        return self._cache.estatisticas()
+
+
+cache_tokens = CacheTokens()
@@ -1,24 +1,12 @@
 #!/usr/bin/env python3
-import mysql.connector
 import bcrypt
 from dotenv import load_dotenv
-import os
+from pool_conexoes import get_db_connection
 
 load_dotenv()
 
-# Configurações do banco
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_USER = os.getenv('DB_USER', 'root')
-DB_PASSWORD = os.getenv('DB_PASSWORD', '')
-DB_NAME = os.getenv('DB_NAME', 'SistemasCorporativos')
-
 # Conectar ao banco
-conn = mysql.connector.connect(
-    host=DB_HOST,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    database=DB_NAME
-)
+conn = get_db_connection()
 
 cursor = conn.cursor()
 